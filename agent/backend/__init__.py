@@ -1,6 +1,6 @@
 # Backend package for the math exercises API 
 from agent.backend.routers import router
-from agent.backend.models import Exercise, ExerciseCreate, ExerciseUpdate, ExerciseList, AIConversionResponse, Category
+from agent.backend.models import Exercise, ExerciseCreate, ExerciseUpdate, ExerciseList, ExerciseSummary, ExerciseSummaryList, AIConversionResponse, ConversionJob, JobStatus, Category, SortField, SortOrder
 from agent.backend.main import app
 from agent.backend.services.storage_service import FileStorageService
 from agent.backend.services.ai_service import AIService
@@ -11,8 +11,14 @@ __all__ = [
     'ExerciseCreate', 
     'ExerciseUpdate', 
     'ExerciseList', 
+    'ExerciseSummary', 
+    'ExerciseSummaryList', 
     'AIConversionResponse', 
+    'ConversionJob', 
+    'JobStatus', 
     'Category', 
+    'SortField', 
+    'SortOrder', 
     'app', 
     'FileStorageService', 
     'AIService'
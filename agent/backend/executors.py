@@ -0,0 +1,132 @@
+"""
+Thread pools for blocking work done on behalf of async routes
+
+Storage calls (file and SQLite I/O) run on a bounded pool shared by all
+requests. AI conversions, which block for the duration of several model
+calls, run on their own small pool so they cannot starve storage calls or
+the event loop. Pool sizes are read from the environment:
+    
+    STORAGE_MAX_WORKERS     storage pool size (default 8)
+    AI_MAX_CONCURRENCY      conversions processed at once (default 2)
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from agent.metrics import REGISTRY
+
+DEFAULT_STORAGE_MAX_WORKERS = 8
+DEFAULT_AI_MAX_CONCURRENCY = 2
+
+def _read_pool_size(variable: str, default: int) -> int:
+    """Read a positive pool size from the environment"""
+    value = os.getenv(variable)
+    if not value:
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError(f"{variable} must be an integer, got {value!r}")
+    if size < 1:
+        raise ValueError(f"{variable} must be at least 1, got {size}")
+    return size
+
+_storage_executor: Optional[ThreadPoolExecutor] = None
+_ai_executor: Optional[ThreadPoolExecutor] = None
+
+def get_storage_executor() -> ThreadPoolExecutor:
+    """Get the pool used for blocking storage calls, creating it on first use"""
+    global _storage_executor
+    if _storage_executor is None:
+        _storage_executor = ThreadPoolExecutor(
+            max_workers=_read_pool_size("STORAGE_MAX_WORKERS", DEFAULT_STORAGE_MAX_WORKERS),
+            thread_name_prefix="storage"
+        )
+    return _storage_executor
+
+def get_ai_executor() -> ThreadPoolExecutor:
+    """Get the pool used for AI conversions, creating it on first use"""
+    global _ai_executor
+    if _ai_executor is None:
+        _ai_executor = ThreadPoolExecutor(
+            max_workers=_read_pool_size("AI_MAX_CONCURRENCY", DEFAULT_AI_MAX_CONCURRENCY),
+            thread_name_prefix="ai"
+        )
+    return _ai_executor
+
+def _queue_depth(executor: Optional[ThreadPoolExecutor]) -> int:
+    """Calls submitted to a pool that no worker has picked up yet"""
+    return executor._work_queue.qsize() if executor is not None else 0
+
+EXECUTOR_QUEUE_DEPTH = REGISTRY.gauge(
+    "executor_queue_depth", "Calls waiting for a free worker of a thread pool", ["pool"]
+)
+EXECUTOR_QUEUE_DEPTH.set_function(lambda: _queue_depth(_storage_executor), pool="storage")
+EXECUTOR_QUEUE_DEPTH.set_function(lambda: _queue_depth(_ai_executor), pool="ai")
+
+async def run_storage(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking storage call on the storage pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_storage_executor(), functools.partial(func, *args, **kwargs))
+
+async def run_ai(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking AI call on the AI pool; calls beyond its concurrency wait in line"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_ai_executor(), functools.partial(func, *args, **kwargs))
+
+async def iterate_ai(func: Callable[..., Iterator[Any]], *args, **kwargs) -> AsyncIterator[Any]:
+    """
+    Run a blocking generator on the AI pool, yielding its items as they are produced
+    
+    Items are handed to the event loop one by one, so callers can forward
+    progress while the rest of the work is still running. Exceptions raised
+    by the generator are re-raised here.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    
+    def publish(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop closed, nobody is listening anymore
+            pass
+    
+    def produce() -> None:
+        try:
+            for item in func(*args, **kwargs):
+                publish((item, None))
+        except BaseException as e:
+            publish((done, e))
+        else:
+            publish((done, None))
+    
+    # If the consumer stops early the generator still runs to completion on its worker
+    future = loop.run_in_executor(get_ai_executor(), produce)
+    while True:
+        item, error = await queue.get()
+        if item is done:
+            await future
+            if error is not None:
+                raise error
+            return
+        yield item
+
+def shutdown_executors(wait: bool = True) -> None:
+    """
+    Shut down both pools; they are recreated if used again
+    
+    Conversions still waiting for an AI worker are cancelled rather than
+    run: queued conversion jobs are persisted and resumed on the next start.
+    """
+    global _storage_executor, _ai_executor
+    if _storage_executor is not None:
+        _storage_executor.shutdown(wait=wait)
+    if _ai_executor is not None:
+        _ai_executor.shutdown(wait=wait, cancel_futures=True)
+    _storage_executor = None
+    _ai_executor = None
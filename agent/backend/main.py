@@ -1,20 +1,39 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
+from agent.backend import routers
 from agent.backend.routers import router
+from agent.backend.executors import shutdown_executors
+from agent.backend.request_metrics import RequestMetricsMiddleware
+from agent.metrics import REGISTRY
 
-# Create data directories if they don't exist
-data_dir = Path("data")
-data_dir.mkdir(exist_ok=True)
-(data_dir / "exercises").mkdir(exist_ok=True)
-(data_dir / "images").mkdir(exist_ok=True)
+# Root of all the files the app writes (DATA_DIR, ./data by default)
+data_dir = Path(os.getenv("DATA_DIR", "data"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create data directories if they don't exist
+    (data_dir / "exercises").mkdir(parents=True, exist_ok=True)
+    (data_dir / "images").mkdir(parents=True, exist_ok=True)
+    routers.init_services(str(data_dir))
+    # Drop old finished conversion jobs
+    routers.conversion_jobs.store.purge_expired()
+    # Pick up conversion jobs that were queued or running when the server stopped
+    routers.conversion_jobs.resume()
+    yield
+    # Let in-flight storage writes and conversions finish before exiting
+    shutdown_executors(wait=True)
 
 app = FastAPI(
     title="Math Exercises API",
     description="API for mathematical exercises with AI handwriting recognition",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -26,11 +45,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Time every request, including the ones answered by CORS preflight
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include routers
 app.include_router(router, prefix="/api", tags=["exercises"])
 
 # Mount static files for images
-app.mount("/images", StaticFiles(directory="data/images"), name="images")
+# Checked on first request, once the lifespan handler has created it
+app.mount("/images", StaticFiles(directory=data_dir / "images", check_dir=False), name="images")
 
 @app.get("/")
 async def root():
@@ -40,6 +63,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, storage, executor and AI conversion metrics in the Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -14,6 +14,27 @@ class Category(str, Enum):
     LINEAR_ALGEBRA = "Linear Algebra"
     DIFFERENTIAL_EQUATIONS = "Differential Equations"
 
+class SortField(str, Enum):
+    """Fields exercise listings can be sorted by"""
+    CREATED_AT = "createdAt"
+    TITLE = "title"
+    CONFIDENCE = "confidence"
+    RELEVANCE = "relevance"
+
+class SortOrder(str, Enum):
+    """Sort directions for exercise listings"""
+    ASC = "asc"
+    DESC = "desc"
+
+class ExerciseView(str, Enum):
+    """Projections available for exercise listings"""
+    FULL = "full"
+    SUMMARY = "summary"
+
+# Pagination defaults for exercise listings
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
 class ExerciseBase(BaseModel):
     """Base exercise model without ID and timestamps"""
     title: str = Field(..., min_length=1, max_length=200, description="Exercise title")
@@ -40,7 +61,8 @@ class Exercise(ExerciseBase):
     createdAt: datetime = Field(..., description="Creation timestamp")
     imagePaths: List[str] = Field(default_factory=list, description="Paths to uploaded images")
     confidenceScore: float = Field(..., ge=0.0, le=1.0, description="AI confidence in transcription")
-
+    version: int = Field(default=1, ge=1, description="Incremented by every update; served as the ETag")
+    
     class Config:
         json_schema_extra = {
             "example": {
@@ -53,10 +75,30 @@ class Exercise(ExerciseBase):
                 "status": "finished",
                 "createdAt": "2024-01-15T10:30:00Z",
                 "imagePaths": ["images/exercise_001/original_1.jpg"],
-                "confidenceScore": 0.95
+                "confidenceScore": 0.95,
+                "version": 1
             }
         }
 
+class ExerciseSummary(BaseModel):
+    """Lightweight exercise model for listings, without statement and solution text"""
+    id: str = Field(..., description="Unique exercise identifier")
+    title: str = Field(..., description="Exercise title")
+    category: Category = Field(..., description="Mathematical domain")
+    createdAt: datetime = Field(..., description="Creation timestamp")
+    confidenceScore: float = Field(..., ge=0.0, le=1.0, description="AI confidence in transcription")
+    
+    @classmethod
+    def from_exercise(cls, exercise: Exercise) -> "ExerciseSummary":
+        """Project an already validated exercise without re-validating it"""
+        return cls.model_construct(
+            id=exercise.id,
+            title=exercise.title,
+            category=exercise.category,
+            createdAt=exercise.createdAt,
+            confidenceScore=exercise.confidenceScore
+        )
+
 class ExerciseList(BaseModel):
     """Model for listing exercises with pagination"""
     exercises: List[Exercise]
@@ -64,10 +106,36 @@ class ExerciseList(BaseModel):
     page: int
     size: int
 
+class ExerciseSummaryList(BaseModel):
+    """Model for listing exercise summaries with pagination"""
+    exercises: List[ExerciseSummary]
+    total: int
+    page: int
+    size: int
+
 class AIConversionRequest(BaseModel):
     """Request model for AI image conversion"""
     pass  # Will be handled as multipart form data
 
+class NodeMetrics(BaseModel):
+    """Time and model usage of one analysis workflow node"""
+    wallTime: float
+    runs: int  # Executions, e.g. one per page for analyze_page
+    llmCalls: int
+    retries: int
+    promptTokens: int
+    completionTokens: int
+    imageBytes: int
+    estimatedCost: float
+
+class ConversionMetrics(BaseModel):
+    """Where the time and money of an AI conversion went"""
+    totalTime: float
+    promptTokens: int
+    completionTokens: int
+    estimatedCost: float  # USD, at AI_PROMPT_TOKEN_PRICE and AI_COMPLETION_TOKEN_PRICE
+    nodes: Dict[str, NodeMetrics]
+
 class AIConversionResponse(BaseModel):
     """Response model for AI image conversion"""
     title: str
@@ -75,4 +143,25 @@ class AIConversionResponse(BaseModel):
     solution: str
     category: Category
     confidenceScore: float
-    message: str = "AI conversion completed successfully" 
\ No newline at end of file
+    message: str = "AI conversion completed successfully"
+    metrics: Optional[ConversionMetrics] = None  # None when the result came from the cache
+
+class JobStatus(str, Enum):
+    """Lifecycle of an AI conversion job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class ConversionJob(BaseModel):
+    """Status of an asynchronous AI conversion job"""
+    id: str
+    status: JobStatus
+    currentNode: Optional[str] = None
+    completedNodes: List[str] = Field(default_factory=list)
+    pagesTotal: int
+    pagesCompleted: int = 0
+    result: Optional[AIConversionResponse] = None
+    error: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
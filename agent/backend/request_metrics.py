@@ -0,0 +1,76 @@
+"""
+Request timing middleware
+
+Records the latency and response size of every request, labelled by route
+template (e.g. /api/exercises/{exercise_id}) so ids do not multiply label
+values, and the number of requests in progress. Requests that match no
+route are labelled "unmatched". The metrics are served by /metrics.
+"""
+
+import time
+
+from agent.metrics import REGISTRY
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to complete HTTP requests", ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = REGISTRY.gauge("http_requests_in_progress", "HTTP requests being served", ["method"])
+RESPONSE_SIZE = REGISTRY.histogram(
+    "http_response_size_bytes", "Size of HTTP response bodies", ["method", "route"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+)
+
+def _route_label(scope) -> str:
+    """Template of the route that handled a request"""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if template is None:
+        # Mounted apps (static files) are labelled by their mount path
+        mount = scope.get("root_path", "")[len(scope.get("app_root_path", "")):]
+        return f"{mount}/{{path}}" if mount else "unmatched"
+    
+    # Routes of routers included with a prefix may report their path without it
+    try:
+        concrete = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = scope.get("path", "")
+    if path != concrete and path.endswith(concrete):
+        return path[:-len(concrete)] + template
+    return template
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing HTTP requests (see the module docstring)"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        status = 500
+        size = 0
+        
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+        
+        REQUESTS_IN_PROGRESS.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Streamed responses are timed until their last event was sent
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_PROGRESS.dec(method=method)
+            # The router records the matched route in the scope
+            route = _route_label(scope)
+            REQUEST_DURATION.observe(elapsed, method=method, route=route, status=str(status))
+            RESPONSE_SIZE.observe(size, method=method, route=route)
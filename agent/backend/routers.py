@@ -1,14 +1,19 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Query, Header, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Optional, Union
+import json
 import logging
 
 from agent.backend.models import (
     Exercise, ExerciseCreate, ExerciseUpdate, ExerciseList, 
-    AIConversionResponse, Category
+    AIConversionResponse, ConversionJob, Category, SortField, SortOrder,
+    ExerciseView, ExerciseSummaryList, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 )
-from agent.backend.services.storage_service import FileStorageService
-from agent.backend.services.ai_service import AIService
+from agent.backend.services.storage_service import VersionConflictError, create_storage_service
+from agent.backend.services.ai_service import AIService, IncompleteConversionError
+from agent.backend.services.conversion_cache import create_conversion_cache
+from agent.backend.services.conversion_jobs import ConversionJobQueue, create_conversion_job_store
+from agent.backend.executors import run_storage, run_ai, iterate_ai
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,27 +21,89 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize services
-storage_service = FileStorageService()
-ai_service = AIService()
+# Services, created by init_services() when the app starts so that importing it writes no files
+storage_service = None
+ai_service: Optional[AIService] = None
+conversion_jobs: Optional[ConversionJobQueue] = None
 
-@router.get("/exercises", response_model=ExerciseList)
-async def get_exercises(title: Optional[str] = None, category: Optional[str] = None):
+def init_services(data_dir: str = "data") -> None:
     """
-    Get all exercises with optional filtering
+    Create the services not set up yet (e.g. by tests), with their files under data_dir
+    
+    Args:
+        data_dir: Root of the exercise files, images, job queue and conversion cache
+    """
+    global storage_service, ai_service, conversion_jobs
+    if storage_service is None:
+        storage_service = create_storage_service(data_dir=data_dir)
+    if ai_service is None:
+        ai_service = AIService(cache=create_conversion_cache(data_dir))
+    if conversion_jobs is None:
+        conversion_jobs = ConversionJobQueue(create_conversion_job_store(data_dir), ai_service)
+
+@router.get("/exercises", response_model=Union[ExerciseList, ExerciseSummaryList])
+async def get_exercises(
+    title: Optional[str] = None,
+    category: Optional[str] = None,
+    q: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sort: Optional[SortField] = None,
+    order: SortOrder = SortOrder.DESC,
+    view: ExerciseView = ExerciseView.FULL
+):
+    """
+    Get a page of exercises with optional filtering and sorting
     
     Args:
         title: Optional search term for exercise titles
         category: Optional category filter
+        q: Optional full-text query over title, statement and solution
+        page: 1-based page number
+        size: Number of exercises per page
+        sort: Field to sort by (createdAt, title, confidence or relevance);
+            defaults to relevance when q is given, createdAt otherwise
+        order: Sort direction (asc or desc)
+        view: "summary" to return only id, title, category, createdAt and confidenceScore
     """
+    if sort is None:
+        sort = SortField.RELEVANCE if q else SortField.CREATED_AT
+    
     try:
-        exercises = storage_service.search_exercises(title=title, category=category)
+        if view == ExerciseView.SUMMARY:
+            summaries, total = await run_storage(
+                storage_service.list_exercise_summaries,
+                title=title,
+                category=category,
+                q=q,
+                page=page,
+                size=size,
+                sort=sort,
+                order=order
+            )
+            return ExerciseSummaryList(
+                exercises=summaries,
+                total=total,
+                page=page,
+                size=size
+            )
+        
+        exercises, total = await run_storage(
+            storage_service.list_exercises,
+            title=title,
+            category=category,
+            q=q,
+            page=page,
+            size=size,
+            sort=sort,
+            order=order
+        )
         
         return ExerciseList(
             exercises=exercises,
-            total=len(exercises),
-            page=1,
-            size=len(exercises)
+            total=total,
+            page=page,
+            size=size
         )
     except Exception as e:
         logger.error(f"Error fetching exercises: {e}")
@@ -51,36 +118,58 @@ async def get_categories():
 async def get_exercise_stats():
     """Get exercise statistics"""
     try:
-        total_exercises = storage_service.get_exercise_count()
-        categories = storage_service.get_all_exercises()
-        
-        # Count by category
-        category_counts = {}
-        for exercise in categories:
-            cat = exercise.category.value
-            category_counts[cat] = category_counts.get(cat, 0) + 1
-        
-        return {
-            "total_exercises": total_exercises,
-            "category_distribution": category_counts
-        }
+        return await run_storage(storage_service.get_exercise_stats)
     except Exception as e:
         logger.error(f"Error fetching exercise stats: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch exercise statistics")
 
+def _etag(version: int) -> str:
+    """ETag header value of an exercise version"""
+    return f'"{version}"'
+
+def _expected_version(if_match: Optional[str]) -> Optional[int]:
+    """
+    Exercise version required by an If-Match header, or None if any version will do
+    
+    Raises:
+        HTTPException: 412 if the header names no version this API hands out
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    
+    tag = if_match.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match does not match the exercise version")
+
+def _version_conflict(e: VersionConflictError) -> HTTPException:
+    """412 response carrying the current ETag, so clients can re-fetch and retry"""
+    return HTTPException(
+        status_code=412,
+        detail="Exercise was modified by another request",
+        headers={"ETag": _etag(e.current_version)}
+    )
+
 @router.get("/exercises/{exercise_id}", response_model=Exercise)
-async def get_exercise(exercise_id: str):
+async def get_exercise(exercise_id: str, response: Response):
     """
     Get a single exercise by ID
     
+    The ETag header carries the exercise version, for use in If-Match on
+    updates and deletes.
+    
     Args:
         exercise_id: Unique identifier for the exercise
     """
     try:
-        exercise = storage_service.get_exercise(exercise_id)
+        exercise = await run_storage(storage_service.get_exercise, exercise_id)
         if not exercise:
             raise HTTPException(status_code=404, detail="Exercise not found")
         
+        response.headers["ETag"] = _etag(exercise.version)
         return exercise
     except HTTPException:
         raise
@@ -89,7 +178,7 @@ async def get_exercise(exercise_id: str):
         raise HTTPException(status_code=500, detail="Failed to fetch exercise")
 
 @router.post("/exercises", response_model=Exercise, status_code=201)
-async def create_exercise(exercise_data: ExerciseCreate):
+async def create_exercise(exercise_data: ExerciseCreate, response: Response):
     """
     Create a new exercise
     
@@ -98,12 +187,14 @@ async def create_exercise(exercise_data: ExerciseCreate):
     """
     try:
         # Create exercise with default values
-        exercise = storage_service.create_exercise(
+        exercise = await run_storage(
+            storage_service.create_exercise,
             exercise_data=exercise_data,
             confidence_score=1.0  # Manual creation has full confidence
         )
         
         logger.info(f"Created exercise: {exercise.id}")
+        response.headers["ETag"] = _etag(exercise.version)
         return exercise
     except Exception as e:
         logger.error(f"Error creating exercise: {e}")
@@ -123,21 +214,20 @@ async def convert_image_to_exercise(files: List[UploadFile] = File(...)):
         
         # Validate all uploaded files
         for file in files:
-            if not ai_service.validate_image(file, file.filename):
+            if not await run_storage(ai_service.validate_image, file, file.filename):
                 raise HTTPException(
                     status_code=400, 
                     detail=f"Invalid image file: {file.filename}"
                 )
         
         # Process images with AI
-        exercise_data, confidence_score = ai_service.process_images(files, [f.filename for f in files])
-        
-        # Validate AI output
-        if not exercise_data.get("title") or not exercise_data.get("statement") or not exercise_data.get("solution"):
-            raise HTTPException(
-                status_code=422, 
-                detail="AI processing failed to extract complete exercise data"
+        # Conversions run on the AI pool so the event loop keeps serving other requests
+        try:
+            exercise_data, confidence_score = await run_ai(
+                ai_service.process_images, files, [f.filename for f in files]
             )
+        except IncompleteConversionError as e:
+            raise HTTPException(status_code=422, detail=str(e))
         
         logger.info(f"AI conversion completed with confidence: {confidence_score}")
         
@@ -146,47 +236,193 @@ async def convert_image_to_exercise(files: List[UploadFile] = File(...)):
             statement=exercise_data["statement"],
             solution=exercise_data["solution"],
             category=exercise_data["category"],
-            confidenceScore=confidence_score
+            confidenceScore=confidence_score,
+            metrics=exercise_data.get("metrics")
         )
-        
+    
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error in AI conversion: {e}")
         raise HTTPException(status_code=500, detail="AI conversion failed")
 
+async def _read_validated_uploads(files: List[UploadFile]) -> List[bytes]:
+    """Validate uploaded images and return their contents"""
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    
+    images = []
+    for file in files:
+        if not await run_storage(ai_service.validate_image, file, file.filename):
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Invalid image file: {file.filename}"
+            )
+        await file.seek(0)
+        images.append(await file.read())
+    return images
+
+@router.post("/exercises/ai-conversion/jobs", response_model=ConversionJob, status_code=202)
+async def submit_conversion_job(files: List[UploadFile] = File(...)):
+    """
+    Queue an AI conversion and return its job without waiting for the result
+    
+    Poll GET /exercises/ai-conversion/{job_id} for progress and the result.
+    
+    Args:
+        files: One or more image files to process
+    """
+    try:
+        images = await _read_validated_uploads(files)
+        job = await run_storage(conversion_jobs.submit, images, [f.filename for f in files])
+        
+        logger.info(f"Queued AI conversion job: {job.id}")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queuing AI conversion: {e}")
+        raise HTTPException(status_code=500, detail="Failed to queue AI conversion")
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/exercises/ai-conversion/stream")
+async def stream_conversion(files: List[UploadFile] = File(...)):
+    """
+    Convert uploaded images to exercise data, streaming progress as server-sent events
+    
+    Emits "encoded", then "page_analyzed" and "page_structured" for each page
+    (with its partial title and statement), "combined", and finally
+    "validated" carrying the AIConversionResponse. Failures after the stream
+    started are reported as an "error" event.
+    
+    Args:
+        files: One or more image files to process
+    """
+    images = await _read_validated_uploads(files)
+    filenames = [f.filename for f in files]
+    
+    async def events():
+        try:
+            async for event, data in iterate_ai(ai_service.stream_image_bytes, images, filenames):
+                if event == "validated":
+                    result = AIConversionResponse(
+                        title=data["title"],
+                        statement=data["statement"],
+                        solution=data["solution"],
+                        category=data["category"],
+                        confidenceScore=data["confidenceScore"],
+                        metrics=data.get("metrics")
+                    )
+                    logger.info(f"AI conversion completed with confidence: {result.confidenceScore}")
+                    data = result.model_dump(mode="json")
+                yield _sse_event(event, data)
+        except IncompleteConversionError as e:
+            yield _sse_event("error", {"detail": str(e)})
+        except Exception as e:
+            logger.error(f"Error in streamed AI conversion: {e}")
+            yield _sse_event("error", {"detail": "AI conversion failed"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/exercises/ai-conversion/{job_id}", response_model=ConversionJob)
+async def get_conversion_job(job_id: str):
+    """
+    Get the status, per-node progress and result of an AI conversion job
+    
+    Args:
+        job_id: Identifier returned when the job was submitted
+    """
+    try:
+        job = await run_storage(conversion_jobs.get, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Conversion job not found")
+        
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching conversion job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch conversion job")
+
+@router.post("/exercises/ai-conversion/{job_id}/retry", response_model=ConversionJob, status_code=202)
+async def retry_conversion_job(job_id: str):
+    """
+    Run a failed AI conversion job again
+    
+    Pages analyzed before the failure are reused; only the failed pages and
+    the combine step are redone.
+    
+    Args:
+        job_id: Identifier returned when the job was submitted
+    """
+    try:
+        job = await run_storage(conversion_jobs.retry, job_id)
+        if not job:
+            if not await run_storage(conversion_jobs.get, job_id):
+                raise HTTPException(status_code=404, detail="Conversion job not found")
+            raise HTTPException(status_code=409, detail="Only failed conversion jobs can be retried")
+        
+        logger.info(f"Retrying AI conversion job: {job_id}")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrying conversion job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retry conversion job")
+
 @router.put("/exercises/{exercise_id}", response_model=Exercise)
-async def update_exercise(exercise_id: str,update_data: ExerciseUpdate):
+async def update_exercise(
+    exercise_id: str,
+    update_data: ExerciseUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None)
+):
     """
     Update an existing exercise
     
     Args:
         exercise_id: Unique identifier for the exercise
         update_data: Updated exercise data
+        if_match: ETag of the version the update is based on; answered with
+            412 if the exercise has changed since
     """
     try:
-        exercise = storage_service.update_exercise(exercise_id, update_data)
+        exercise = await run_storage(
+            storage_service.update_exercise, exercise_id, update_data, _expected_version(if_match)
+        )
         if not exercise:
             raise HTTPException(status_code=404, detail="Exercise not found")
         
         logger.info(f"Updated exercise: {exercise_id}")
+        response.headers["ETag"] = _etag(exercise.version)
         return exercise
     except HTTPException:
         raise
+    except VersionConflictError as e:
+        raise _version_conflict(e)
     except Exception as e:
         logger.error(f"Error updating exercise {exercise_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to update exercise")
 
 @router.delete("/exercises/{exercise_id}")
-async def delete_exercise(exercise_id: str):
+async def delete_exercise(exercise_id: str, if_match: Optional[str] = Header(None)):
     """
     Delete an exercise
     
     Args:
         exercise_id: Unique identifier for the exercise
+        if_match: ETag of the version to delete; answered with 412 if the
+            exercise has changed since
     """
     try:
-        success = storage_service.delete_exercise(exercise_id)
+        success = await run_storage(storage_service.delete_exercise, exercise_id, _expected_version(if_match))
         if not success:
             raise HTTPException(status_code=404, detail="Exercise not found")
         
@@ -194,6 +430,8 @@ async def delete_exercise(exercise_id: str):
         return {"message": "Exercise deleted successfully"}
     except HTTPException:
         raise
+    except VersionConflictError as e:
+        raise _version_conflict(e)
     except Exception as e:
         logger.error(f"Error deleting exercise {exercise_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete exercise") 
\ No newline at end of file
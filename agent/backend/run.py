@@ -1,13 +1,28 @@
 #!/usr/bin/env python3
 """
 FastAPI server startup script for Math Exercises Backend
+
+Runs a single auto-reloading process for development by default. With
+--workers N (or WORKERS=N) it runs N worker processes without reload for
+production; the workers share the data directory and keep their caches
+coherent through it.
 """
 
+import argparse
 import uvicorn
 import os
 from pathlib import Path
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WORKERS", 1)),
+        help="Number of worker processes; more than one disables auto-reload (default: WORKERS or 1)"
+    )
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    
     # Set default port
     port = int(os.getenv("PORT", 8000))
     
@@ -17,7 +32,7 @@ if __name__ == "__main__":
     # Change to the script directory to ensure relative paths work
     os.chdir(script_dir)
     
-    print(f"Starting Math Exercises Backend on port {port}")
+    print(f"Starting Math Exercises Backend on port {port} with {args.workers} worker(s)")
     print(f"Working directory: {os.getcwd()}")
     print(f"API documentation: http://localhost:{port}/docs")
     print(f"Health check: http://localhost:{port}/health")
@@ -27,6 +42,8 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=port,
-        reload=True,  # Enable auto-reload during development
+        # Auto-reload is for development and cannot supervise several workers
+        reload=args.workers == 1,
+        workers=args.workers,
         log_level="info"
     ) 
\ No newline at end of file
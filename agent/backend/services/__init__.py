@@ -1,6 +1,13 @@
 """Services package for the math exercises backend"""
 
-from agent.backend.services.storage_service import FileStorageService
+from agent.backend.services.storage_service import FileStorageService, VersionConflictError, create_storage_service
+from agent.backend.services.sqlite_storage_service import SQLiteStorageService
+from agent.backend.services.conversion_cache import ConversionCache, create_conversion_cache
 from agent.backend.services.ai_service import AIService
+from agent.backend.services.conversion_jobs import ConversionJobStore, ConversionJobQueue, create_conversion_job_store
 
-__all__ = ['FileStorageService', 'AIService'] 
\ No newline at end of file
+__all__ = [
+    'FileStorageService', 'SQLiteStorageService', 'VersionConflictError', 'create_storage_service',
+    'ConversionCache', 'create_conversion_cache', 'AIService',
+    'ConversionJobStore', 'ConversionJobQueue', 'create_conversion_job_store'
+]
@@ -1,18 +1,34 @@
 import os
 from pathlib import Path
-from typing import List, Tuple
-import tempfile
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from PIL import Image
 
-from agent.math_agent_v0 import MathExerciseAnalyzer
+from agent.math_agent_v0 import MathExerciseAnalyzer, MathExercise, RESULT_EVENT
+from agent.image_preprocessing import ImagePreprocessingConfig
+from agent.backend.models import AIConversionResponse
+from agent.backend.services.conversion_cache import ConversionCache, cache_key, image_digest
+
+class IncompleteConversionError(ValueError):
+    """The analysis did not produce a title, statement and solution"""
 
 class AIService:
     """Service for AI-powered image processing and exercise extraction"""
     
-    def __init__(self):
-        """Initialize the AI service with the math exercise analyzer"""
+    def __init__(self, cache: Optional[ConversionCache] = None):
+        """
+        Initialize the AI service with the math exercise analyzer
+        
+        Args:
+            cache: Optional cache of conversion results, shared with the analyzer for pages
+        """
+        self.cache = cache
         try:
-            self.analyzer = MathExerciseAnalyzer()
+            # Pages of one upload analyzed in parallel (AI_PAGE_CONCURRENCY, default 4)
+            self.analyzer = MathExerciseAnalyzer(
+                max_concurrency=int(os.getenv("AI_PAGE_CONCURRENCY", "4")),
+                page_cache=cache,
+                preprocessing=ImagePreprocessingConfig.from_env()
+            )
         except Exception as e:
             print(f"Warning: Could not initialize MathExerciseAnalyzer: {e}")
             self.analyzer = None
@@ -24,44 +40,173 @@ class AIService:
         Args:
             image_files: List of uploaded file objects
             filenames: List of corresponding filenames
-            
+        
+        Returns:
+            Tuple of (exercise_data, confidence_score)
+        """
+        images = []
+        for image_file in image_files:
+            image_file.file.seek(0)  # Validation may have consumed the stream
+            images.append(image_file.file.read())
+        
+        return self.process_image_bytes(images, filenames)
+    
+    def process_image_bytes(
+        self,
+        images: List[bytes],
+        filenames: List[str],
+        on_progress: Optional[Callable[[str, Optional[int]], None]] = None,
+        completed_pages: Optional[List[Dict[str, Any]]] = None,
+        on_page_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Tuple[dict, float]:
+        """
+        Process image contents to extract exercise data
+        
+        Args:
+            images: Contents of each image, in page order
+            filenames: List of corresponding filenames
+            on_progress: Optional callback receiving (node_name, page_index) as the analysis advances
+            completed_pages: Page results saved from an earlier, failed run; those pages are not redone
+            on_page_result: Optional callback receiving each page result as it completes
+        
         Returns:
             Tuple of (exercise_data, confidence_score)
+        
+        Raises:
+            IncompleteConversionError: If the title, statement or solution is missing
+            pydantic.ValidationError: If the result is otherwise invalid, e.g. has an unknown category
         """
         if not self.analyzer:
             raise Exception("AI service not properly initialized")
         
-        # Save uploaded files to temporary location for processing
-        temp_image_paths = []
-        try:
-            for image_file, filename in zip(image_files, filenames):
-                # Create temporary file
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=Path(filename).suffix)
-                temp_file.write(image_file.file.read())
-                temp_file.close()
-                temp_image_paths.append(temp_file.name)
-            
-            # Process images with the math agent
-            exercise = self.analyzer.analyze_exercise(temp_image_paths)
-            
-            # Convert to our data format
-            exercise_data = {
-                "title": exercise.title,
-                "statement": exercise.statement,
-                "solution": exercise.response,  # Note: agent uses 'response', we use 'solution'
-                "category": exercise.domain,
-                "confidenceScore": exercise.confidence_score
-            }
-            
-            return exercise_data, exercise.confidence_score
-            
-        finally:
-            # Clean up temporary files
-            for temp_path in temp_image_paths:
-                try:
-                    os.unlink(temp_path)
-                except OSError:
-                    pass
+        key = self._conversion_key(images)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached["exercise_data"], cached["confidence_score"]
+        
+        exercise_data, confidence_score = self._analyze_images(
+            images, filenames, on_progress, completed_pages, on_page_result
+        )
+        # Only accepted results are cached; a rejected one is analyzed again on retry
+        self._check_result(exercise_data, confidence_score)
+        if key is not None:
+            self.cache.put(key, {"exercise_data": self._cacheable(exercise_data), "confidence_score": confidence_score})
+        return exercise_data, confidence_score
+    
+    def _conversion_key(self, images: List[bytes]) -> Optional[str]:
+        """Cache key of a whole upload, or None when caching is disabled"""
+        if self.cache is None:
+            return None
+        # The same upload with the same analyzer settings gives the same result
+        return cache_key("conversion", str(self.analyzer.cache_namespace), [image_digest(image) for image in images])
+    
+    def stream_image_bytes(self, images: List[bytes], filenames: List[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Process image contents, yielding progress events as the analysis advances
+        
+        Events, in order: ("encoded", {"pages"}), then for each page in completion
+        order ("page_analyzed", {"page"}) and ("page_structured", {"page", "title",
+        "statement"}), then ("combined", {"title", "statement"}) and finally
+        ("validated", exercise_data). A cached upload yields "validated" only.
+        
+        Args:
+            images: Contents of each image, in page order
+            filenames: List of corresponding filenames
+        
+        Yields:
+            Tuple of (event_name, data)
+        
+        Raises:
+            IncompleteConversionError, pydantic.ValidationError: As for process_image_bytes,
+                instead of the "validated" event
+        """
+        if not self.analyzer:
+            raise Exception("AI service not properly initialized")
+        
+        key = self._conversion_key(images)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield "validated", cached["exercise_data"]
+                return
+        
+        for node_name, update in self.analyzer.stream_exercise(images, image_names=filenames):
+            if node_name == "encode_images":
+                yield "encoded", {"pages": len(images)}
+            elif node_name == "analyze_page":
+                for page_result in update.get("page_results", []):
+                    page = page_result["page_index"] + 1
+                    analysis = page_result.get("structured_analysis") or {}
+                    # Pages are transcribed and structured in one model call, so both events go out together
+                    yield "page_analyzed", {"page": page}
+                    yield "page_structured", {
+                        "page": page,
+                        "title": analysis.get("title"),
+                        "statement": analysis.get("statement")
+                    }
+            elif node_name == "combine_analyses":
+                combined = update.get("combined_analysis") or {}
+                yield "combined", {"title": combined.get("title"), "statement": combined.get("statement")}
+            elif node_name == RESULT_EVENT:
+                exercise_data = self._exercise_data(update["exercise"])
+                self._check_result(exercise_data, exercise_data["confidenceScore"])
+                if key is not None:
+                    self.cache.put(key, {
+                        "exercise_data": self._cacheable(exercise_data),
+                        "confidence_score": exercise_data["confidenceScore"]
+                    })
+                yield "validated", exercise_data
+    
+    def _exercise_data(self, exercise: MathExercise) -> dict:
+        """Convert an analyzed exercise to our data format"""
+        return {
+            "title": exercise.title,
+            "statement": exercise.statement,
+            "solution": exercise.response,  # Note: agent uses 'response', we use 'solution'
+            "category": exercise.domain,
+            "confidenceScore": exercise.confidence_score,
+            "metrics": exercise.metrics
+        }
+    
+    def _check_result(self, exercise_data: dict, confidence_score: float) -> None:
+        """Raise if a result cannot be returned to clients"""
+        if not exercise_data.get("title") or not exercise_data.get("statement") or not exercise_data.get("solution"):
+            raise IncompleteConversionError("AI processing failed to extract complete exercise data")
+        # Checks the category against the ones exercises can have
+        AIConversionResponse(
+            title=exercise_data["title"],
+            statement=exercise_data["statement"],
+            solution=exercise_data["solution"],
+            category=exercise_data["category"],
+            confidenceScore=confidence_score
+        )
+    
+    def _cacheable(self, exercise_data: dict) -> dict:
+        """Exercise data without the metrics of the run that produced it"""
+        # A cache hit costs nothing; reporting the original run's metrics would double count them
+        return dict(exercise_data, metrics=None)
+    
+    def _analyze_images(
+        self,
+        images: List[bytes],
+        filenames: List[str],
+        on_progress: Optional[Callable[[str, Optional[int]], None]] = None,
+        completed_pages: Optional[List[Dict[str, Any]]] = None,
+        on_page_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Tuple[dict, float]:
+        """Run the analyzer on image contents"""
+        # Images are analyzed from memory; nothing is written to disk
+        exercise = self.analyzer.analyze_exercise(
+            images,
+            on_progress=on_progress,
+            image_names=filenames,
+            completed_pages=completed_pages,
+            on_page_result=on_page_result
+        )
+        
+        exercise_data = self._exercise_data(exercise)
+        return exercise_data, exercise.confidence_score
     
     def process_single_image(self, image_file, filename: str) -> Tuple[dict, float]:
         """
@@ -70,7 +215,7 @@ class AIService:
         Args:
             image_file: Uploaded file object
             filename: Original filename
-            
+        
         Returns:
             Tuple of (exercise_data, confidence_score)
         """
@@ -80,10 +225,13 @@ class AIService:
         """
         Validate uploaded image file
         
+        Only the image header is read: the contents are decoded once, when
+        the analyzer preprocesses them, and a corrupt image fails there.
+        
         Args:
             image_file: Uploaded file object
             filename: Original filename
-            
+        
         Returns:
             True if image is valid, False otherwise
         """
@@ -95,13 +243,12 @@ class AIService:
             if file_ext not in allowed_extensions:
                 return False
             
-            # Try to open image with PIL to validate it's a real image
+            # Identify the format from the header, without reading the rest of the stream
             image_file.file.seek(0)  # Reset file pointer
-            image = Image.open(image_file.file)
-            image.verify()  # Verify image integrity
+            Image.open(image_file.file)
             
             return True
-            
+        
         except Exception:
             return False
     
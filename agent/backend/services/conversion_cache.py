@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_last_used ON cache_entries (last_used);
+"""
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 3600.0
+
+def image_digest(image_bytes: bytes) -> str:
+    """Get the content hash identifying an image"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def cache_key(kind: str, namespace: str, digests: Iterable[str]) -> str:
+    """
+    Build a cache key from image hashes and the settings that shape the result
+    
+    Args:
+        kind: Entry kind, e.g. "conversion" for a whole upload or "page" for one image
+        namespace: Model name, temperature and prompt version of the analyzer
+        digests: image_digest() of each image, in page order
+    """
+    hasher = hashlib.sha256()
+    for part in (kind, namespace, *digests):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0")
+    return f"{kind}:{hasher.hexdigest()}"
+
+class ConversionCache:
+    """Persistent, content-addressed cache of AI conversion results
+    
+    Entries are JSON values stored in a small SQLite database so they
+    survive restarts. Entries older than max_age are ignored and purged;
+    when the cache holds more than max_entries or max_bytes, the least
+    recently used entries are evicted.
+    """
+    
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age: float = DEFAULT_MAX_AGE,
+        clock: Callable[[], float] = time.time
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._clock = clock
+        
+        # A single connection is shared by the AI worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None if it is missing or expired"""
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.max_age:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                return None
+            
+            self._conn.execute("UPDATE cache_entries SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+    
+    def put(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value, evicting old entries as needed"""
+        serialized = json.dumps(value, ensure_ascii=False, default=str)
+        size = len(serialized.encode("utf-8"))
+        if size > self.max_bytes:
+            # Storing it would evict everything else
+            return
+        
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, size, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, serialized, size, now, now)
+                )
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones beyond the limits (caller must hold the lock)"""
+        self._conn.execute("DELETE FROM cache_entries WHERE created_at < ?", (now - self.max_age,))
+        
+        count, total_size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+        
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache_entries ORDER BY last_used, key"):
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total_size -= size
+        self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", evicted)
+    
+    def clear(self) -> None:
+        """Remove every entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries")
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+def create_conversion_cache(data_dir: str = "data") -> Optional[ConversionCache]:
+    """
+    Create the conversion cache configured by the environment
+    
+    AI_CACHE_ENABLED ("true" by default) turns the cache off when false;
+    AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_BYTES and AI_CACHE_MAX_AGE (seconds)
+    override the eviction limits.
+    
+    Returns:
+        The cache, or None when caching is disabled
+    """
+    if os.getenv("AI_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    
+    return ConversionCache(
+        Path(data_dir) / "conversion_cache.db",
+        max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        max_bytes=int(os.getenv("AI_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        max_age=float(os.getenv("AI_CACHE_MAX_AGE", DEFAULT_MAX_AGE))
+    )
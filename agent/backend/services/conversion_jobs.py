@@ -0,0 +1,398 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent.backend.executors import get_ai_executor
+from agent.backend.models import AIConversionResponse, ConversionJob, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# Succeeded and failed jobs are deleted this long after they finished
+DEFAULT_JOB_MAX_AGE = 7 * 24 * 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversion_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    current_node TEXT,
+    completed_nodes TEXT NOT NULL,
+    pages_total INTEGER NOT NULL,
+    pages_completed INTEGER NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    worker_pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_conversion_jobs_status ON conversion_jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS conversion_job_images (
+    job_id TEXT NOT NULL,
+    page_index INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    content BLOB NOT NULL,
+    PRIMARY KEY (job_id, page_index)
+);
+CREATE TABLE IF NOT EXISTS conversion_job_pages (
+    job_id TEXT NOT NULL,
+    page_index INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, page_index)
+);
+"""
+
+def _process_alive(pid: int) -> bool:
+    """Whether a process with this ID exists"""
+    if os.name == "nt":
+        # os.kill would terminate the process; jobs are resumed as with a single worker
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+JOB_COLUMNS = (
+    "id, status, current_node, completed_nodes, pages_total, pages_completed, "
+    "result, error, created_at, updated_at"
+)
+
+class ConversionJobStore:
+    """SQLite-backed persistence for AI conversion jobs
+    
+    Uploaded images and the result of each analyzed page are stored with the
+    job until it succeeds, so jobs that were queued or running when the
+    process stopped, or that failed, can be picked up again without redoing
+    the pages already analyzed.
+    
+    Several worker processes can share the database: a job is run by the
+    worker that claims it, and running jobs record their worker's process
+    ID so that only jobs of workers that are gone are picked up again.
+    
+    Finished jobs are kept for max_age seconds, see purge_expired.
+    """
+    
+    def __init__(self, db_path: str, max_age: float = DEFAULT_JOB_MAX_AGE):
+        self.db_path = Path(db_path)
+        self.max_age = max_age
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # A single connection is shared by request handlers and AI workers
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._ensure_worker_column()
+    
+    def _ensure_worker_column(self) -> None:
+        """Add the worker_pid column to databases created before jobs were claimed"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(conversion_jobs)")}
+        if "worker_pid" not in columns:
+            self._conn.execute("ALTER TABLE conversion_jobs ADD COLUMN worker_pid INTEGER")
+    
+    def _generate_job_id(self) -> str:
+        """Generate a unique job ID"""
+        return f"job_{uuid.uuid4().hex[:12]}"
+    
+    def _row_to_job(self, row: sqlite3.Row) -> ConversionJob:
+        """Convert a database row to a job"""
+        return ConversionJob(
+            id=row["id"],
+            status=row["status"],
+            currentNode=row["current_node"],
+            completedNodes=json.loads(row["completed_nodes"]),
+            pagesTotal=row["pages_total"],
+            pagesCompleted=row["pages_completed"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            createdAt=row["created_at"],
+            updatedAt=row["updated_at"]
+        )
+    
+    def create(self, images: List[bytes], filenames: List[str]) -> ConversionJob:
+        """Persist a new queued job with its images"""
+        job_id = self._generate_job_id()
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"INSERT INTO conversion_jobs ({JOB_COLUMNS}) VALUES (?, ?, NULL, '[]', ?, 0, NULL, NULL, ?, ?)",
+                    (job_id, JobStatus.QUEUED.value, len(images), now, now)
+                )
+                self._conn.executemany(
+                    "INSERT INTO conversion_job_images (job_id, page_index, filename, content) VALUES (?, ?, ?, ?)",
+                    [(job_id, index, filename, image) for index, (image, filename) in enumerate(zip(images, filenames))]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(job_id)
+    
+    def get(self, job_id: str) -> Optional[ConversionJob]:
+        """Get a job by ID"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM conversion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+    
+    def load_images(self, job_id: str) -> Tuple[List[bytes], List[str]]:
+        """Get the images and filenames of a job, in page order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename, content FROM conversion_job_images WHERE job_id = ? ORDER BY page_index",
+                (job_id,)
+            ).fetchall()
+        return [bytes(row["content"]) for row in rows], [row["filename"] for row in rows]
+    
+    def _update(self, job_id: str, assignments: str, parameters: tuple) -> None:
+        """Update a job and its updated_at timestamp"""
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE conversion_jobs SET {assignments}, updated_at = ? WHERE id = ?",
+                (*parameters, datetime.utcnow().isoformat(), job_id)
+            )
+    
+    def mark_running(self, job_id: str) -> bool:
+        """
+        Claim a queued job for this process; only pages already saved count as done
+        
+        Returns:
+            False if the job is not queued, e.g. because another worker claimed it
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE conversion_jobs SET status = ?, worker_pid = ?, current_node = NULL, "
+                "completed_nodes = '[]', error = NULL, updated_at = ?, "
+                "pages_completed = (SELECT COUNT(*) FROM conversion_job_pages WHERE job_id = conversion_jobs.id) "
+                "WHERE id = ? AND status = ?",
+                (JobStatus.RUNNING.value, os.getpid(), datetime.utcnow().isoformat(), job_id, JobStatus.QUEUED.value)
+            )
+        return cursor.rowcount == 1
+    
+    def save_page_result(self, job_id: str, page_result: Dict[str, Any]) -> None:
+        """Keep the result of a successfully analyzed page for retries of the job, counting it as completed"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversion_job_pages (job_id, page_index, result) VALUES (?, ?, ?)",
+                (job_id, page_result["page_index"], json.dumps(page_result, ensure_ascii=False))
+            )
+            self._conn.execute(
+                "UPDATE conversion_jobs SET updated_at = ?, "
+                "pages_completed = (SELECT COUNT(*) FROM conversion_job_pages WHERE job_id = conversion_jobs.id) "
+                "WHERE id = ?",
+                (datetime.utcnow().isoformat(), job_id)
+            )
+    
+    def load_page_results(self, job_id: str) -> List[Dict[str, Any]]:
+        """Get the saved page results of a job, in page order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM conversion_job_pages WHERE job_id = ? ORDER BY page_index", (job_id,)
+            ).fetchall()
+        return [json.loads(row["result"]) for row in rows]
+    
+    def record_progress(self, job_id: str, node_name: str, page_index: Optional[int]) -> None:
+        """Record that a workflow node finished; pages are counted when their result is saved"""
+        self._update(
+            job_id,
+            "current_node = ?, completed_nodes = json_insert(completed_nodes, '$[#]', ?)",
+            (node_name, node_name)
+        )
+    
+    def complete(self, job_id: str, result: AIConversionResponse) -> None:
+        """Mark a job as succeeded with its result and drop its images and pages, which are no longer needed"""
+        with self._lock:
+            # One transaction, so a job is never seen succeeded while it still keeps its pages
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE conversion_jobs SET status = ?, result = ?, current_node = NULL, updated_at = ? WHERE id = ?",
+                    (JobStatus.SUCCEEDED.value, result.model_dump_json(), datetime.utcnow().isoformat(), job_id)
+                )
+                self._conn.execute("DELETE FROM conversion_job_images WHERE job_id = ?", (job_id,))
+                self._conn.execute("DELETE FROM conversion_job_pages WHERE job_id = ?", (job_id,))
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def fail(self, job_id: str, error: str) -> None:
+        """Mark a job as failed, keeping its images and pages for a retry"""
+        self._update(job_id, "status = ?, error = ?, current_node = NULL", (JobStatus.FAILED.value, error))
+    
+    def requeue(self, job_id: str) -> bool:
+        """
+        Queue a failed job again
+        
+        Returns:
+            False if the job does not exist or has not failed
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE conversion_jobs SET status = ?, error = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                (JobStatus.QUEUED.value, datetime.utcnow().isoformat(), job_id, JobStatus.FAILED.value)
+            )
+        return cursor.rowcount == 1
+    
+    def unfinished_job_ids(self) -> List[str]:
+        """
+        Get the jobs that are queued or were left running, oldest first
+        
+        Jobs left running by a worker that no longer exists are queued again.
+        Jobs recorded with this process's ID are from an earlier process
+        that had the same ID, since this one has not resumed any yet.
+        """
+        with self._lock:
+            running = self._conn.execute(
+                "SELECT id, worker_pid FROM conversion_jobs WHERE status = ?", (JobStatus.RUNNING.value,)
+            ).fetchall()
+            for row in running:
+                pid = row["worker_pid"]
+                if pid is None or pid == os.getpid() or not _process_alive(pid):
+                    self._conn.execute(
+                        "UPDATE conversion_jobs SET status = ? WHERE id = ? AND status = ? AND worker_pid IS ?",
+                        (JobStatus.QUEUED.value, row["id"], JobStatus.RUNNING.value, pid)
+                    )
+            rows = self._conn.execute(
+                "SELECT id FROM conversion_jobs WHERE status = ? ORDER BY created_at", (JobStatus.QUEUED.value,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+    
+    def purge_expired(self) -> int:
+        """
+        Delete succeeded and failed jobs that finished more than max_age ago, with their images and pages
+        
+        Returns:
+            Number of jobs deleted
+        """
+        cutoff = (datetime.utcnow() - timedelta(seconds=self.max_age)).isoformat()
+        expired = "SELECT id FROM conversion_jobs WHERE status IN (?, ?) AND updated_at < ?"
+        parameters = (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value, cutoff)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(f"DELETE FROM conversion_job_images WHERE job_id IN ({expired})", parameters)
+                self._conn.execute(f"DELETE FROM conversion_job_pages WHERE job_id IN ({expired})", parameters)
+                cursor = self._conn.execute(f"DELETE FROM conversion_jobs WHERE id IN ({expired})", parameters)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return cursor.rowcount
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+def create_conversion_job_store(data_dir: str = "data") -> ConversionJobStore:
+    """
+    Create the conversion job store configured by the environment
+    
+    CONVERSION_JOB_MAX_AGE (seconds) overrides how long finished jobs are kept.
+    """
+    return ConversionJobStore(
+        Path(data_dir) / "conversion_jobs.db",
+        max_age=float(os.getenv("CONVERSION_JOB_MAX_AGE", DEFAULT_JOB_MAX_AGE))
+    )
+
+class ConversionJobQueue:
+    """Runs AI conversion jobs in the background on the AI executor
+    
+    Jobs are persisted before they are scheduled; concurrency is bounded by
+    the AI pool size (AI_MAX_CONCURRENCY), further jobs wait in its queue.
+    """
+    
+    def __init__(self, store: ConversionJobStore, ai_service):
+        self.store = store
+        self.ai_service = ai_service
+    
+    def submit(self, images: List[bytes], filenames: List[str]) -> ConversionJob:
+        """
+        Queue a conversion and return immediately
+        
+        Args:
+            images: Contents of each uploaded image, in page order
+            filenames: Corresponding filenames
+        
+        Returns:
+            The queued job
+        """
+        job = self.store.create(images, filenames)
+        self._schedule(job.id)
+        return job
+    
+    def get(self, job_id: str) -> Optional[ConversionJob]:
+        """Get the current status of a job"""
+        return self.store.get(job_id)
+    
+    def retry(self, job_id: str) -> Optional[ConversionJob]:
+        """
+        Run a failed job again; pages analyzed by the failed run are not redone
+        
+        Returns:
+            The queued job, or None if there is no failed job with this ID
+        """
+        if not self.store.requeue(job_id):
+            return None
+        self._schedule(job_id)
+        return self.store.get(job_id)
+    
+    def resume(self) -> int:
+        """
+        Re-schedule jobs left unfinished by a previous process
+        
+        With several workers, each one resumes the unfinished jobs at startup;
+        whichever claims a job first runs it.
+        
+        Returns:
+            Number of jobs scheduled
+        """
+        job_ids = self.store.unfinished_job_ids()
+        for job_id in job_ids:
+            self._schedule(job_id)
+        return len(job_ids)
+    
+    def _schedule(self, job_id: str) -> None:
+        get_ai_executor().submit(self._run, job_id)
+    
+    def _run(self, job_id: str) -> None:
+        """Process one job (runs on an AI worker thread)"""
+        try:
+            if not self.store.mark_running(job_id):
+                return
+            images, filenames = self.store.load_images(job_id)
+            
+            exercise_data, confidence_score = self.ai_service.process_image_bytes(
+                images,
+                filenames,
+                on_progress=lambda node_name, page_index: self.store.record_progress(job_id, node_name, page_index),
+                completed_pages=self.store.load_page_results(job_id),
+                on_page_result=lambda page_result: self.store.save_page_result(job_id, page_result)
+            )
+            result = AIConversionResponse(
+                title=exercise_data["title"],
+                statement=exercise_data["statement"],
+                solution=exercise_data["solution"],
+                category=exercise_data["category"],
+                confidenceScore=confidence_score,
+                metrics=exercise_data.get("metrics")
+            )
+        except Exception as e:
+            logger.error(f"AI conversion job {job_id} failed: {e}")
+            self.store.fail(job_id, str(e))
+            return
+        
+        logger.info(f"AI conversion job {job_id} completed with confidence: {confidence_score}")
+        self.store.complete(job_id, result)
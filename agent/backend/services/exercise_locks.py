@@ -0,0 +1,71 @@
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from agent.backend.services.shared_files import SharedFile
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover the threads of this process
+    fcntl = None
+
+DEFAULT_STRIPES = 256
+
+class _LockFile(SharedFile):
+    """Thread locks and record lock file of one lock path in this process"""
+    
+    def __init__(self, path: Path, stripes: int):
+        super().__init__(path)
+        self.stripes = stripes
+        self.thread_locks = [threading.Lock() for _ in range(stripes)]
+        self.file = open(path, "a+b") if fcntl is not None else None
+    
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+
+class ExerciseLocks:
+    """Per-exercise write locks shared by the threads and worker processes of one data directory
+    
+    Exercises are spread over a fixed number of stripes, so the number of
+    locks stays bounded however many exercises there are. A stripe is held
+    with a thread lock, for the threads of this process, and with a POSIX
+    record lock on one byte of a shared lock file, for other processes.
+    Record locks belong to the process, which is why the thread lock is
+    taken first, and why every ExerciseLocks of the same lock file in a
+    process shares one set of thread locks and one open file (see
+    SharedFile); they are released by the OS if the process dies.
+    """
+    
+    def __init__(self, lock_path: Path, stripes: int = DEFAULT_STRIPES):
+        self.lock_path = Path(lock_path)
+        self.stripes = stripes
+        self._shared = _LockFile.acquire(self.lock_path, stripes)
+        if self._shared.stripes != stripes:
+            self._shared.release()
+            raise ValueError(f"{lock_path} is already in use with {self._shared.stripes} stripes")
+    
+    def _stripe(self, exercise_id: str) -> int:
+        # Stable across processes, unlike hash()
+        return zlib.crc32(exercise_id.encode("utf-8")) % self.stripes
+    
+    @contextmanager
+    def hold(self, exercise_id: str) -> Iterator[None]:
+        """Hold the write lock of an exercise"""
+        stripe = self._stripe(exercise_id)
+        with self._shared.thread_locks[stripe]:
+            if self._shared.file is None:
+                yield
+                return
+            fcntl.lockf(self._shared.file, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._shared.file, fcntl.LOCK_UN, 1, stripe)
+    
+    def close(self) -> None:
+        if self._shared is not None:
+            self._shared.release()
+            self._shared = None
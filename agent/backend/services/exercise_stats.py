@@ -0,0 +1,95 @@
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+# Number of equal-width buckets in the confidence histogram
+CONFIDENCE_BUCKET_COUNT = 10
+
+def confidence_bucket(score: float) -> str:
+    """Get the histogram bucket label for a confidence score, e.g. 0.95 -> "0.9-1.0" """
+    index = min(int(score * CONFIDENCE_BUCKET_COUNT), CONFIDENCE_BUCKET_COUNT - 1)
+    return f"{index / CONFIDENCE_BUCKET_COUNT:.1f}-{(index + 1) / CONFIDENCE_BUCKET_COUNT:.1f}"
+
+def creation_day(created_at: datetime) -> str:
+    """Get the per-day bucket label for a creation timestamp"""
+    return created_at.date().isoformat()
+
+def empty_stats() -> dict:
+    """Get the stats of an empty collection"""
+    return {
+        "total_exercises": 0,
+        "category_distribution": {},
+        "confidence_histogram": {},
+        "created_per_day": {},
+    }
+
+def stats_buckets(exercise) -> Dict[str, str]:
+    """Get the bucket an exercise falls in for each aggregated dimension"""
+    return {
+        "category_distribution": exercise.category.value,
+        "confidence_histogram": confidence_bucket(exercise.confidenceScore),
+        "created_per_day": creation_day(exercise.createdAt),
+    }
+
+class ExerciseStats:    
+    """Running aggregates over the exercise collection
+    
+    Tracks the total count, per-category counts, a confidence histogram and
+    per-day creation counts. Each create/update/delete adjusts a handful of
+    counters, so reading the stats never scans the collection.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = 0
+        self._counters: Dict[str, Dict[str, int]] = {
+            "category_distribution": {},
+            "confidence_histogram": {},
+            "created_per_day": {},
+        }
+    
+    def _adjust(self, exercise, delta: int) -> None:
+        """Add delta to every counter the exercise contributes to (caller must hold the lock)"""
+        self._total += delta
+        for dimension, bucket in stats_buckets(exercise).items():
+            counter = self._counters[dimension]
+            count = counter.get(bucket, 0) + delta
+            if count > 0:
+                counter[bucket] = count
+            else:
+                counter.pop(bucket, None)
+    
+    def add(self, exercise) -> None:
+        """Count a new exercise"""
+        with self._lock:
+            self._adjust(exercise, 1)
+    
+    def remove(self, exercise) -> None:
+        """Stop counting a deleted exercise"""
+        with self._lock:
+            self._adjust(exercise, -1)
+    
+    def replace(self, old_exercise: Optional[object], new_exercise: Optional[object]) -> None:
+        """Swap the contribution of an exercise for its updated version"""
+        with self._lock:
+            if old_exercise is not None:
+                self._adjust(old_exercise, -1)
+            if new_exercise is not None:
+                self._adjust(new_exercise, 1)
+    
+    def reset(self, exercises: Iterable = ()) -> None:
+        """Recompute every aggregate from scratch, e.g. to reconcile with storage"""
+        with self._lock:
+            self._total = 0
+            for counter in self._counters.values():
+                counter.clear()
+            for exercise in exercises:
+                self._adjust(exercise, 1)
+    
+    def snapshot(self) -> dict:
+        """Get a copy of the current aggregates, with buckets in sorted order"""
+        with self._lock:
+            return {
+                "total_exercises": self._total,
+                **{dimension: dict(sorted(counter.items())) for dimension, counter in self._counters.items()},
+            }
@@ -0,0 +1,133 @@
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from agent.backend.services.shared_files import SharedFile
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized between the threads of this process
+    fcntl = None
+
+# Number of recent changes kept; readers further behind rebuild their caches instead
+DEFAULT_CAPACITY = 1024
+SLOT_SIZE = 64
+HEADER_SIZE = 8
+
+class _MappedLog(SharedFile):
+    """Mapping, writer lock and open file of one invalidation log in this process"""
+    
+    def __init__(self, path: Path, capacity: int):
+        super().__init__(path)
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        size = HEADER_SIZE + capacity * SLOT_SIZE
+        self.file = open(path, "a+b")
+        with self.locked():
+            # Only ever grown, so a concurrent first start cannot clear a published generation
+            if os.fstat(self.file.fileno()).st_size < size:
+                os.ftruncate(self.file.fileno(), size)
+        self.map = mmap.mmap(self.file.fileno(), size)
+    
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.lockf(self.file, fcntl.LOCK_EX, HEADER_SIZE, 0)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.file, fcntl.LOCK_UN, HEADER_SIZE, 0)
+    
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+class InvalidationLog:
+    """Generation counter and ring of recently changed keys, shared by the worker processes of one data directory
+    
+    Every write bumps the generation and records the key it changed. Each
+    process keeps the generation its caches reflect; comparing it with the
+    shared one is a memory read of a mapped file, so reads stay cheap while
+    nothing changes, and after a change only the changed keys are reloaded.
+    
+    The file holds the generation in its first 8 bytes, followed by
+    `capacity` fixed-size slots; the key of generation g is in slot
+    g % capacity. Writers fill the slot before publishing the generation,
+    and readers re-check the generation after reading slots, so keys that
+    may have been overwritten by later writes are never trusted.
+    
+    Writers are serialized with a record lock, which belongs to the
+    process; every InvalidationLog of the same file in a process therefore
+    shares one mapping and writer lock (see SharedFile).
+    """
+    
+    def __init__(self, path: Path, capacity: int = DEFAULT_CAPACITY):
+        self.path = Path(path)
+        self.capacity = capacity
+        self._shared = _MappedLog.acquire(self.path, capacity)
+        if self._shared.capacity != capacity:
+            self._shared.release()
+            raise ValueError(f"{path} is already in use with capacity {self._shared.capacity}")
+        self._map = self._shared.map
+    
+    def generation(self) -> int:
+        """Current generation, the number of changes published so far"""
+        return int.from_bytes(self._map[:HEADER_SIZE], "little")
+    
+    def _slot(self, generation: int) -> int:
+        return HEADER_SIZE + (generation % self.capacity) * SLOT_SIZE
+    
+    def publish(self, key: str) -> int:
+        """
+        Record a change to key and return the new generation
+        
+        Callers publish after the change is visible to other processes
+        (e.g. after the file was renamed into place).
+        """
+        encoded = key.encode("utf-8")
+        # Keys that do not fit are recorded empty, which makes readers reload everything
+        if len(encoded) > SLOT_SIZE:
+            encoded = b""
+        with self._shared.locked():
+            generation = self.generation() + 1
+            start = self._slot(generation)
+            self._map[start:start + SLOT_SIZE] = encoded.ljust(SLOT_SIZE, b"\0")
+            self._map[:HEADER_SIZE] = generation.to_bytes(HEADER_SIZE, "little")
+        return generation
+    
+    def changes_since(self, generation: int) -> Tuple[int, Optional[List[str]]]:
+        """
+        Keys changed after a generation
+        
+        Returns:
+            The current generation and the changed keys (possibly repeated),
+            or None instead of the keys if they are no longer all known
+        """
+        current = self.generation()
+        if current - generation > self.capacity or current < generation:
+            return current, None
+        
+        keys = []
+        for changed in range(generation + 1, current + 1):
+            start = self._slot(changed)
+            key = self._map[start:start + SLOT_SIZE].rstrip(b"\0")
+            if not key:
+                return current, None
+            keys.append(key.decode("utf-8"))
+        
+        # Slots read while further changes were published may already hold newer keys
+        if self.generation() - generation > self.capacity:
+            return current, None
+        return current, keys
+    
+    def close(self) -> None:
+        if self._shared is not None:
+            self._shared.release()
+            self._shared = None
+            self._map = None
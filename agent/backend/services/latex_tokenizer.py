@@ -0,0 +1,230 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+# Unicode math symbols rewritten to their LaTeX equivalents before lexing
+UNICODE_SYMBOLS = {
+    "∫": r"\int ", "∬": r"\iint ", "∮": r"\oint ", "∑": r"\sum ", "∏": r"\prod ",
+    "√": r"\sqrt ", "∞": r"\infty ", "∂": r"\partial ", "∇": r"\nabla ",
+    "≤": r"\leq ", "≥": r"\geq ", "≠": r"\neq ", "≈": r"\approx ", "→": r"\to ",
+    "∈": r"\in ", "∪": r"\cup ", "∩": r"\cap ", "×": r"\times ", "·": r"\cdot ",
+    "π": r"\pi ", "θ": r"\theta ", "α": r"\alpha ", "β": r"\beta ", "γ": r"\gamma ",
+    "δ": r"\delta ", "Δ": r"\Delta ", "λ": r"\lambda ", "μ": r"\mu ", "σ": r"\sigma ",
+    "φ": r"\phi ", "ω": r"\omega ", "ε": r"\epsilon ",
+    "²": "^2", "³": "^3", "⁴": "^4", "ⁿ": "^n", "₀": "_0", "₁": "_1", "₂": "_2", "ₙ": "_n",
+}
+
+# Commands mapped to the search words they stand for
+COMMAND_TOKENS: Dict[str, Tuple[str, ...]] = {
+    "int": ("integral",), "iint": ("integral",), "iiint": ("integral",), "oint": ("integral",),
+    "frac": ("fraction",), "dfrac": ("fraction",), "tfrac": ("fraction",),
+    "sqrt": ("sqrt", "root"),
+    "sum": ("sum",), "prod": ("product",),
+    "lim": ("limit",), "limsup": ("limit",), "liminf": ("limit",),
+    "infty": ("infinity",),
+    "partial": ("partial", "derivative"),
+    "nabla": ("gradient",),
+    "binom": ("binomial",), "choose": ("binomial",),
+    "vec": ("vector",),
+    "det": ("determinant",),
+    "cup": ("union",), "cap": ("intersection",),
+    "in": ("element",),
+    "to": ("to",), "rightarrow": ("to",), "mapsto": ("to",),
+    "leq": ("leq",), "le": ("leq",), "geq": ("geq",), "ge": ("geq",),
+    "neq": ("neq",), "ne": ("neq",),
+    "varepsilon": ("epsilon",), "varphi": ("phi",), "vartheta": ("theta",),
+    "varrho": ("rho",), "varsigma": ("sigma",),
+}
+
+# Formatting and spacing macros that carry no searchable meaning
+FORMATTING_COMMANDS = {
+    "left", "right", "big", "Big", "bigg", "Bigg", "bigl", "bigr", "Bigl", "Bigr",
+    "displaystyle", "textstyle", "scriptstyle", "limits", "nolimits",
+    "quad", "qquad", "hspace", "vspace", "hline", "newline", "noindent",
+    "text", "textbf", "textit", "textrm", "mathrm", "mathbf", "mathit", "mathsf",
+    "mathtt", "mathcal", "mathbb", "mathfrak", "boldsymbol", "operatorname", "emph",
+    "underline", "overline", "bar", "hat", "tilde", "dot", "ddot", "widehat",
+    "label", "tag", "cdots", "ldots", "dots", "vdots", "ddots",
+    "cdot", "times", "pm", "mp", "approx", "equiv",
+}
+
+# Environments mapped to a search word; others are dropped
+ENVIRONMENT_TOKENS = {
+    "matrix": "matrix", "pmatrix": "matrix", "bmatrix": "matrix", "vmatrix": "matrix",
+    "Bmatrix": "matrix", "Vmatrix": "matrix", "cases": "cases",
+}
+
+LEXER = re.compile(
+    r"(?P<command>\\[A-Za-z]+)"
+    r"|(?P<escaped>\\[^A-Za-z])"
+    r"|(?P<number>\d+)"
+    r"|(?P<word>[^\W\d_]+)"
+    r"|(?P<script>[\^_])"
+    r"|(?P<open>\{)"
+    r"|(?P<close>\})"
+    r"|(?P<other>\S)"
+)
+
+def _strip_accents(word: str) -> str:
+    """Lowercase a word and drop diacritics, e.g. "Équation" -> "equation" """
+    decomposed = unicodedata.normalize("NFKD", word.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+class _LatexLexer:
+    """Single-pass scanner turning LaTeX source into normalized search tokens"""
+    
+    def __init__(self, text: str):
+        for symbol, replacement in UNICODE_SYMBOLS.items():
+            if symbol in text:
+                text = text.replace(symbol, replacement)
+        self.lexemes = [(match.lastgroup, match.group()) for match in LEXER.finditer(text)]
+        self.position = 0
+    
+    def _next(self) -> Optional[Tuple[str, str]]:
+        if self.position >= len(self.lexemes):
+            return None
+        lexeme = self.lexemes[self.position]
+        self.position += 1
+        return lexeme
+    
+    def _read_group_text(self) -> str:
+        """Consume a {...} group and return its raw text (used for environment names)"""
+        if self.position >= len(self.lexemes) or self.lexemes[self.position][0] != "open":
+            return ""
+        self.position += 1
+        parts = []
+        depth = 1
+        while depth:
+            lexeme = self._next()
+            if lexeme is None:
+                break
+            kind, value = lexeme
+            if kind == "open":
+                depth += 1
+            elif kind == "close":
+                depth -= 1
+                if not depth:
+                    break
+            parts.append(value)
+        return "".join(parts)
+    
+    def _peek_kind(self) -> Optional[str]:
+        if self.position >= len(self.lexemes):
+            return None
+        return self.lexemes[self.position][0]
+    
+    def _read_script(self) -> List[str]:
+        """Consume an unbraced argument of ^ or _ and return its tokens"""
+        if self.position >= len(self.lexemes):
+            return []
+        
+        kind, value = self.lexemes[self.position]
+        self.position += 1
+        if kind == "number":
+            # LaTeX only binds the first digit: x^23 is x^2 followed by 3
+            tokens = [value[0]]
+            if len(value) > 1:
+                self.lexemes.insert(self.position, ("number", value[1:]))
+            return tokens
+        if kind == "word":
+            tokens = [_strip_accents(value[0])]
+            if len(value) > 1:
+                self.lexemes.insert(self.position, ("word", value[1:]))
+            return tokens
+        if kind == "command":
+            return self._command_tokens(value[1:])
+        return []
+    
+    def _command_tokens(self, name: str) -> List[str]:
+        """Normalize a LaTeX command to its search tokens"""
+        if name in ("begin", "end"):
+            environment = self._read_group_text().rstrip("*")
+            token = ENVIRONMENT_TOKENS.get(environment)
+            return [token] if token and name == "begin" else []
+        if name in FORMATTING_COMMANDS:
+            return []
+        if name in COMMAND_TOKENS:
+            return list(COMMAND_TOKENS[name])
+        # Greek letters and function names (\Delta, \sin, \log) keep their own name
+        return [name.lower()]
+    
+    @staticmethod
+    def _close_group(tokens: List[str], group: Optional[Tuple[Optional[str], int]]) -> None:
+        """Finish a group; a script argument made of one token also yields the combined token"""
+        if group is None:
+            return
+        prefix, start = group
+        if prefix is not None and len(tokens) - start == 1:
+            tokens.append(f"{prefix}_{tokens[start]}")
+    
+    def tokenize(self) -> List[str]:
+        """Tokenize the whole input"""
+        tokens: List[str] = []
+        # Last simple atom (letter, number, symbol command) a script can attach to
+        base: Optional[str] = None
+        # Open {...} groups: None for a plain group, (combined token prefix, index of its
+        # first token) for the argument of ^ or _. A stack rather than recursion, so that
+        # deeply nested braces in user input cannot exhaust the interpreter stack
+        groups: List[Optional[Tuple[Optional[str], int]]] = []
+        
+        while True:
+            lexeme = self._next()
+            if lexeme is None:
+                # Groups left open end with the input
+                while groups:
+                    self._close_group(tokens, groups.pop())
+                return tokens
+            kind, value = lexeme
+            
+            if kind == "close":
+                if groups:
+                    self._close_group(tokens, groups.pop())
+                base = None
+            elif kind == "command":
+                command_tokens = self._command_tokens(value[1:])
+                tokens.extend(command_tokens)
+                base = command_tokens[0] if len(command_tokens) == 1 else None
+            elif kind == "number":
+                tokens.append(value)
+                base = value
+            elif kind == "word":
+                word = _strip_accents(value)
+                tokens.append(word)
+                base = word if len(word) == 1 else None
+            elif kind == "script":
+                # Canonical form shared by x^2, x^{2} and x²
+                operator = "pow" if value == "^" else "sub"
+                prefix = f"{base}_{operator}" if base is not None else None
+                if self._peek_kind() == "open":
+                    self.position += 1
+                    groups.append((prefix, len(tokens)))
+                else:
+                    script_tokens = self._read_script()
+                    tokens.extend(script_tokens)
+                    if prefix is not None and len(script_tokens) == 1:
+                        tokens.append(f"{prefix}_{script_tokens[0]}")
+                base = None
+            elif kind == "open":
+                groups.append(None)
+                base = None
+            else:
+                base = None
+
+def tokenize_latex(text: str) -> List[str]:
+    """
+    Convert text containing LaTeX into normalized search tokens
+    
+    Commands become words (\\int -> integral, \\alpha -> alpha), formatting
+    macros are dropped, words are lowercased without accents, and simple
+    superscripts/subscripts also yield a canonical combined token
+    (x^{2}, x^2 and x² all give "x", "2", "x_pow_2").
+    
+    Args:
+        text: Plain text and/or LaTeX source
+    
+    Returns:
+        List of tokens made of word characters only
+    """
+    if not text:
+        return []
+    return _LatexLexer(text).tokenize()
@@ -0,0 +1,201 @@
+import bisect
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from agent.backend.services.latex_tokenizer import tokenize_latex
+
+# Bump whenever tokenize() output changes so persisted indexes get rebuilt
+TOKENIZER_VERSION = 2
+
+# Relative weight of a term occurrence in each indexed field
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "statement": 1.0,
+    "solution": 1.0,
+}
+
+def exercise_search_fields(exercise) -> Dict[str, str]:
+    """Get the indexed text fields of an exercise"""
+    return {
+        "title": exercise.title,
+        "statement": exercise.statement,
+        "solution": exercise.solution,
+    }
+
+def tokenize(text: str) -> List[str]:
+    """Split text, including LaTeX notation, into normalized search tokens"""
+    return tokenize_latex(text)
+
+def tokenize_query(query: str) -> List[Tuple[str, bool]]:
+    """
+    Split a search query into (token, is_prefix) pairs
+    
+    Queries go through the same LaTeX-aware tokenizer as documents, so
+    "\\int" and "integral" are equivalent. The last term is always matched
+    as a prefix so partially typed words still hit; other terms are matched
+    as prefixes when they are directly followed by "*".
+    """
+    terms = []
+    segments = query.split("*")
+    for index, segment in enumerate(segments):
+        tokens = tokenize(segment)
+        terms.extend((token, False) for token in tokens)
+        # The last term of a segment directly followed by "*" is a prefix
+        if tokens and index < len(segments) - 1 and not segment[-1:].isspace():
+            terms[-1] = (terms[-1][0], True)
+    
+    if terms:
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+class SearchIndex:
+    """Incrementally maintained inverted index over exercise text with BM25 ranking
+    
+    Each exercise is indexed as a single document whose term frequencies are
+    weighted per field (see FIELD_WEIGHTS). Queries only touch the postings of
+    their terms, so search cost depends on the number of matches rather than
+    on the corpus size.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._doc_fingerprints: Dict[str, int] = {}
+        self._total_length = 0.0
+        self._vocabulary: List[str] = []
+    
+    def _tokenize_fields(self, fields: Dict[str, str]) -> Dict[str, float]:
+        """Compute weighted term frequencies for a document"""
+        term_frequencies: Dict[str, float] = {}
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for token in tokenize(text or ""):
+                term_frequencies[token] = term_frequencies.get(token, 0.0) + weight
+        return term_frequencies
+    
+    def add(self, doc_id: str, fields: Dict[str, str]) -> None:
+        """
+        Index (or re-index) a document
+        
+        Args:
+            doc_id: Exercise identifier
+            fields: Mapping of field name to text, e.g. title/statement/solution
+        """
+        # Token streams are computed once per text version; unchanged text is not re-tokenized
+        fingerprint = hash(tuple(sorted(fields.items())))
+        with self._lock:
+            if self._doc_fingerprints.get(doc_id) == fingerprint:
+                return
+        
+        term_frequencies = self._tokenize_fields(fields)
+        
+        with self._lock:
+            self._remove(doc_id)
+            self._doc_fingerprints[doc_id] = fingerprint
+            
+            for term, frequency in term_frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._vocabulary, term)
+                postings[doc_id] = frequency
+            
+            length = sum(term_frequencies.values())
+            self._doc_terms[doc_id] = term_frequencies
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+    
+    def remove(self, doc_id: str) -> None:
+        """Remove a document from the index"""
+        with self._lock:
+            self._remove(doc_id)
+    
+    def _remove(self, doc_id: str) -> None:
+        """Remove a document (caller must hold the lock)"""
+        self._doc_fingerprints.pop(doc_id, None)
+        term_frequencies = self._doc_terms.pop(doc_id, None)
+        if term_frequencies is None:
+            return
+        
+        for term in term_frequencies:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+        
+        self._total_length -= self._doc_lengths.pop(doc_id)
+    
+    def clear(self) -> None:
+        """Remove every document from the index"""
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._doc_lengths.clear()
+            self._doc_fingerprints.clear()
+            self._vocabulary.clear()
+            self._total_length = 0.0
+    
+    def _expand(self, token: str, is_prefix: bool) -> List[str]:
+        """Get the vocabulary terms a query token matches (caller must hold the lock)"""
+        if not is_prefix:
+            return [token] if token in self._postings else []
+        
+        start = bisect.bisect_left(self._vocabulary, token)
+        end = start
+        while end < len(self._vocabulary) and self._vocabulary[end].startswith(token):
+            end += 1
+        return self._vocabulary[start:end]
+    
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Find documents matching every term of the query, best match first
+        
+        Args:
+            query: Free-text query; the last term and terms ending in "*" match as prefixes
+            limit: Optional maximum number of results
+        
+        Returns:
+            List of (doc_id, score) tuples sorted by descending BM25 score
+        """
+        terms = tokenize_query(query)
+        if not terms:
+            return []
+        
+        with self._lock:
+            doc_count = len(self._doc_terms)
+            if doc_count == 0:
+                return []
+            average_length = self._total_length / doc_count
+            
+            scores: Optional[Dict[str, float]] = None
+            for token, is_prefix in terms:
+                term_scores: Dict[str, float] = {}
+                for term in self._expand(token, is_prefix):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, frequency in postings.items():
+                        if scores is not None and doc_id not in scores:
+                            continue
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / average_length)
+                        score = idf * frequency * (self.k1 + 1) / (frequency + norm)
+                        term_scores[doc_id] = max(term_scores.get(doc_id, 0.0), score)
+                
+                # Every query term must match
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc_id: scores[doc_id] + score for doc_id, score in term_scores.items()}
+                if not scores:
+                    return []
+        
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit is not None else ranked
+    
+    def __len__(self) -> int:
+        return len(self._doc_terms)
@@ -0,0 +1,51 @@
+import os
+import threading
+import weakref
+from abc import ABC, abstractmethod
+
+class SharedFile(ABC):
+    """Open lock or mapped file shared by every user of the same path in this process
+    
+    POSIX record locks belong to the process, not to the descriptor: two
+    descriptors of one file in the same process never block each other,
+    and closing either drops the locks taken through both. Users of a path
+    therefore share one instance, with one set of thread locks, obtained
+    with acquire() and given back with release(); the file is closed when
+    the last user releases it. Instances nobody holds any more are dropped
+    from the registry, and their files closed, when they are collected.
+    """
+    
+    _registry = weakref.WeakValueDictionary()
+    _registry_lock = threading.Lock()
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._users = 0
+        self._key = None
+    
+    @classmethod
+    def acquire(cls, path, *args):
+        """Get the shared instance for a path, opening it on first use"""
+        # Keyed by process too: a forked child must not reuse its parent's thread locks
+        key = (cls, os.getpid(), os.path.realpath(path))
+        with SharedFile._registry_lock:
+            shared = SharedFile._registry.get(key)
+            if shared is None:
+                shared = cls(path, *args)
+                shared._key = key
+                SharedFile._registry[key] = shared
+            shared._users += 1
+            return shared
+    
+    def release(self) -> None:
+        """Give back an instance obtained with acquire(), closing the file after the last user"""
+        with SharedFile._registry_lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            SharedFile._registry.pop(self._key, None)
+        self.close()
+    
+    @abstractmethod
+    def close(self) -> None:
+        """Close the file; called once, after the last user released the instance"""
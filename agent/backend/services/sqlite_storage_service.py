@@ -0,0 +1,639 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+from datetime import datetime
+import uuid
+
+from agent.backend.models import (
+    Category, Exercise, ExerciseCreate, ExerciseUpdate, ExerciseSummary, SortField, SortOrder,
+    DEFAULT_PAGE_SIZE
+)
+from agent.backend.services.exercise_stats import confidence_bucket, empty_stats, stats_buckets
+from agent.backend.services.storage_service import VersionConflictError
+from agent.backend.services.search_index import (
+    TOKENIZER_VERSION, FIELD_WEIGHTS, exercise_search_fields, tokenize, tokenize_query
+)
+from agent.backend.services.title_registry import SUFFIX_PATTERN
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exercises (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    statement TEXT NOT NULL,
+    solution TEXT NOT NULL,
+    category TEXT NOT NULL,
+    level TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    image_paths TEXT NOT NULL,
+    confidence_score REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_exercises_category ON exercises (category, created_at);
+CREATE INDEX IF NOT EXISTS idx_exercises_created_at ON exercises (created_at);
+CREATE INDEX IF NOT EXISTS idx_exercises_title ON exercises (title);
+CREATE INDEX IF NOT EXISTS idx_exercises_title_nocase ON exercises (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_exercises_confidence ON exercises (confidence_score);
+CREATE TABLE IF NOT EXISTS title_suffixes (
+    base TEXT PRIMARY KEY,
+    highest INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exercises_fts_rows (
+    id TEXT PRIMARY KEY,
+    fts_rowid INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exercise_stats (
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, bucket)
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT NOT NULL
+);
+"""
+
+# Holds tokenize() output joined by spaces; "_" is kept inside tokens such as x_pow_2
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS exercises_fts USING fts5 (
+    id UNINDEXED,
+    title,
+    statement,
+    solution,
+    tokenize = "unicode61 tokenchars '_'"
+);
+"""
+
+EXERCISE_COLUMNS = (
+    "id, title, statement, solution, category, level, status, "
+    "created_at, image_paths, confidence_score, version"
+)
+
+# Columns needed for listing summaries; statement and solution are never read
+SUMMARY_COLUMNS = "id, title, category, created_at, confidence_score"
+
+JSON_MIGRATION = "import_json_exercises"
+
+# Rebuilt whenever the tokenizer changes, since the index stores its output
+SEARCH_INDEX_MIGRATION = f"build_search_index_v{TOKENIZER_VERSION}"
+
+# bm25() weights for the exercises_fts columns (id, title, statement, solution)
+BM25_WEIGHTS = ", ".join(
+    str(weight) for weight in (0.0, FIELD_WEIGHTS["title"], FIELD_WEIGHTS["statement"], FIELD_WEIGHTS["solution"])
+)
+
+# Recomputes the running aggregates in exercise_stats from the exercises table
+STATS_RECONCILIATION = """
+DELETE FROM exercise_stats;
+INSERT INTO exercise_stats (dimension, bucket, count)
+    SELECT 'total_exercises', '', COUNT(*) FROM exercises;
+INSERT INTO exercise_stats (dimension, bucket, count)
+    SELECT 'category_distribution', category, COUNT(*) FROM exercises GROUP BY category;
+INSERT INTO exercise_stats (dimension, bucket, count)
+    SELECT 'confidence_histogram', confidence_bucket(confidence_score), COUNT(*)
+    FROM exercises GROUP BY 2;
+INSERT INTO exercise_stats (dimension, bucket, count)
+    SELECT 'created_per_day', substr(created_at, 1, 10), COUNT(*) FROM exercises GROUP BY 2;
+"""
+
+# ORDER BY expressions for each listing order; the id breaks ties so pages are stable
+SORT_COLUMNS = {
+    SortField.CREATED_AT: "created_at",
+    SortField.TITLE: "title COLLATE NOCASE",
+    SortField.CONFIDENCE: "confidence_score",
+}
+
+class SQLiteStorageService:
+    """SQLite-backed storage service for exercises
+    
+    Drop-in replacement for FileStorageService that keeps exercises in an
+    embedded SQLite database (WAL mode) with indexes on category, createdAt
+    and title. Existing JSON exercise files are imported once on first start.
+    """
+    
+    def __init__(self, data_dir: str = "data", db_filename: str = "exercises.db"):
+        self.data_dir = Path(data_dir)
+        self.exercises_dir = self.data_dir / "exercises"
+        self.images_dir = self.data_dir / "images"
+        self.db_path = self.data_dir / db_filename
+        
+        # Ensure directories exist
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        
+        # One connection per thread; WAL lets readers run alongside a writer
+        self._local = threading.local()
+        # Every connection opened, so close() can reach those of other threads
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        self._connect().executescript(SCHEMA + FTS_SCHEMA)
+        self._ensure_version_column()
+        
+        self._ensure_search_index()
+        self.migrate_from_json()
+        self._reconcile_stats()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Get the calling thread's database connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only ever used by its own thread, but close() may run on another one
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function("confidence_bucket", 1, confidence_bucket, deterministic=True)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _transaction(self):
+        """Open a write transaction that takes the database write lock up front"""
+        return _Transaction(self._connect())
+    
+    def _ensure_version_column(self) -> None:
+        """Add the version column to databases created before exercises were versioned"""
+        conn = self._connect()
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(exercises)")}
+        if "version" not in columns:
+            conn.execute("ALTER TABLE exercises ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    
+    def _generate_exercise_id(self) -> str:
+        """Generate a unique exercise ID"""
+        return f"exercise_{str(uuid.uuid4())[:8]}"
+    
+    def _get_title_with_suffix(self, conn: sqlite3.Connection, base_title: str) -> str:
+        """Add suffix number to title if duplicate exists (caller must hold a write transaction)"""
+        exists = conn.execute(
+            "SELECT 1 FROM exercises WHERE title = ? LIMIT 1", (base_title,)
+        ).fetchone()
+        if not exists:
+            return base_title
+        
+        row = conn.execute(
+            "SELECT highest FROM title_suffixes WHERE base = ?", (base_title,)
+        ).fetchone()
+        return f"{base_title} ({(row['highest'] if row else 0) + 1})"
+    
+    def _register_title(self, conn: sqlite3.Connection, title: str) -> None:
+        """Record the suffix of a deduplicated title so it is never handed out again"""
+        match = SUFFIX_PATTERN.match(title)
+        if not match:
+            return
+        
+        conn.execute(
+            "INSERT INTO title_suffixes (base, highest) VALUES (?, ?) "
+            "ON CONFLICT(base) DO UPDATE SET highest = MAX(highest, excluded.highest)",
+            (match.group("base"), int(match.group("suffix")))
+        )
+    
+    def _exercise_to_row(self, exercise: Exercise) -> tuple:
+        """Convert an exercise to a row tuple matching EXERCISE_COLUMNS"""
+        return (
+            exercise.id,
+            exercise.title,
+            exercise.statement,
+            exercise.solution,
+            exercise.category.value,
+            exercise.level,
+            exercise.status,
+            exercise.createdAt.isoformat(timespec="microseconds"),
+            json.dumps(exercise.imagePaths),
+            exercise.confidenceScore,
+            exercise.version
+        )
+    
+    def _row_to_exercise(self, row: sqlite3.Row) -> Exercise:
+        """Convert a database row to an exercise"""
+        return Exercise(
+            id=row["id"],
+            title=row["title"],
+            statement=row["statement"],
+            solution=row["solution"],
+            category=row["category"],
+            level=row["level"],
+            status=row["status"],
+            createdAt=row["created_at"],
+            imagePaths=json.loads(row["image_paths"]),
+            confidenceScore=row["confidence_score"],
+            version=row["version"]
+        )
+    
+    def _insert_exercise(self, conn: sqlite3.Connection, exercise: Exercise, or_ignore: bool = False) -> bool:
+        """Insert an exercise row and register its title, returning whether a row was added"""
+        conflict = "OR IGNORE " if or_ignore else ""
+        cursor = conn.execute(
+            f"INSERT {conflict}INTO exercises ({EXERCISE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._exercise_to_row(exercise)
+        )
+        if cursor.rowcount == 0:
+            return False
+        
+        self._register_title(conn, exercise.title)
+        self._index_search_text(conn, exercise)
+        self._adjust_stats(conn, exercise, 1)
+        return True
+    
+    def _adjust_stats(self, conn: sqlite3.Connection, exercise: Exercise, delta: int) -> None:
+        """Add delta to every aggregate the exercise contributes to (caller must hold a write transaction)"""
+        buckets = [("total_exercises", ""), *stats_buckets(exercise).items()]
+        conn.executemany(
+            "INSERT INTO exercise_stats (dimension, bucket, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(dimension, bucket) DO UPDATE SET count = count + excluded.count",
+            [(dimension, bucket, delta) for dimension, bucket in buckets]
+        )
+        conn.executemany(
+            "DELETE FROM exercise_stats WHERE dimension = ? AND bucket = ? AND count <= 0",
+            buckets[1:]
+        )
+    
+    def _reconcile_stats(self) -> None:
+        """Recompute the running aggregates from the exercises table"""
+        with self._transaction() as conn:
+            for statement in STATS_RECONCILIATION.strip().split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+    
+    def _index_search_text(self, conn: sqlite3.Connection, exercise: Exercise) -> None:
+        """Add or replace the full-text index entry of an exercise"""
+        self._unindex_search_text(conn, exercise.id)
+        
+        fields = exercise_search_fields(exercise)
+        cursor = conn.execute(
+            "INSERT INTO exercises_fts (id, title, statement, solution) VALUES (?, ?, ?, ?)",
+            (exercise.id, *(" ".join(tokenize(fields[name])) for name in ("title", "statement", "solution")))
+        )
+        conn.execute(
+            "INSERT INTO exercises_fts_rows (id, fts_rowid) VALUES (?, ?)",
+            (exercise.id, cursor.lastrowid)
+        )
+    
+    def _unindex_search_text(self, conn: sqlite3.Connection, exercise_id: str) -> None:
+        """Remove the full-text index entry of an exercise"""
+        row = conn.execute(
+            "SELECT fts_rowid FROM exercises_fts_rows WHERE id = ?", (exercise_id,)
+        ).fetchone()
+        if row:
+            conn.execute("DELETE FROM exercises_fts WHERE rowid = ?", (row["fts_rowid"],))
+            conn.execute("DELETE FROM exercises_fts_rows WHERE id = ?", (exercise_id,))
+    
+    def _ensure_search_index(self) -> None:
+        """Rebuild the full-text index if it was built by another tokenizer version"""
+        with self._transaction() as conn:
+            applied = conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (SEARCH_INDEX_MIGRATION,)
+            ).fetchone()
+            if applied:
+                return
+            
+            conn.execute("DROP TABLE IF EXISTS exercises_fts")
+            conn.execute(FTS_SCHEMA)
+            conn.execute("DELETE FROM exercises_fts_rows")
+            for row in conn.execute(f"SELECT {EXERCISE_COLUMNS} FROM exercises").fetchall():
+                self._index_search_text(conn, self._row_to_exercise(row))
+            
+            conn.execute(
+                "INSERT OR REPLACE INTO migrations (name, applied_at) VALUES (?, ?)",
+                (SEARCH_INDEX_MIGRATION, datetime.utcnow().isoformat())
+            )
+    
+    def migrate_from_json(self, exercises_dir: Optional[Path] = None, force: bool = False) -> int:
+        """
+        Import exercises from the one-file-per-exercise JSON layout
+        
+        Runs once per database; later calls are no-ops unless force is set.
+        
+        Args:
+            exercises_dir: Directory holding exercise JSON files (defaults to data/exercises)
+            force: Import again even if the migration was already applied
+        
+        Returns:
+            Number of exercises imported
+        """
+        exercises_dir = Path(exercises_dir) if exercises_dir else self.exercises_dir
+        imported = 0
+        
+        with self._transaction() as conn:
+            applied = conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (JSON_MIGRATION,)
+            ).fetchone()
+            if applied and not force:
+                return 0
+            
+            if exercises_dir.is_dir():
+                for file_path in exercises_dir.glob("*.json"):
+                    try:
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            exercise = Exercise(**json.load(f))
+                    except (json.JSONDecodeError, IOError, ValueError):
+                        continue
+                    if self._insert_exercise(conn, exercise, or_ignore=True):
+                        imported += 1
+            
+            conn.execute(
+                "INSERT OR REPLACE INTO migrations (name, applied_at) VALUES (?, ?)",
+                (JSON_MIGRATION, datetime.utcnow().isoformat())
+            )
+        
+        return imported
+    
+    def create_exercise(self, exercise_data: ExerciseCreate, image_paths: List[str] = None, confidence_score: float = 0.0) -> Exercise:
+        """Create a new exercise"""
+        exercise_id = self._generate_exercise_id()
+        
+        with self._transaction() as conn:
+            # Handle title deduplication inside the write transaction
+            final_title = self._get_title_with_suffix(conn, exercise_data.title)
+            
+            exercise = Exercise(
+                id=exercise_id,
+                title=final_title,
+                statement=exercise_data.statement,
+                solution=exercise_data.solution,
+                category=exercise_data.category,
+                level="advanced",
+                status="finished",
+                createdAt=datetime.utcnow(),
+                imagePaths=image_paths or [],
+                confidenceScore=confidence_score
+            )
+            self._insert_exercise(conn, exercise)
+        
+        return exercise
+    
+    def get_exercise(self, exercise_id: str) -> Optional[Exercise]:
+        """Get an exercise by ID"""
+        row = self._connect().execute(
+            f"SELECT {EXERCISE_COLUMNS} FROM exercises WHERE id = ?", (exercise_id,)
+        ).fetchone()
+        return self._row_to_exercise(row) if row else None
+    
+    def get_all_exercises(self) -> List[Exercise]:
+        """Get all exercises, newest first"""
+        return self.search_exercises()
+    
+    def _build_filters(self, title: Optional[str], category: Optional[str]) -> Tuple[str, list]:
+        """Build the WHERE clause and parameters for title/category filters"""
+        clauses = []
+        params = []
+        
+        if title:
+            clauses.append("title LIKE ? ESCAPE '\\'")
+            escaped = title.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        
+        if category:
+            clauses.append("category = ?")
+            params.append(category)
+        
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+    
+    def search_exercises(self, title: Optional[str] = None, category: Optional[str] = None) -> List[Exercise]:
+        """Search exercises by title and/or category"""
+        where, params = self._build_filters(title, category)
+        rows = self._connect().execute(
+            f"SELECT {EXERCISE_COLUMNS} FROM exercises {where} ORDER BY created_at DESC, id DESC",
+            params
+        ).fetchall()
+        return [self._row_to_exercise(row) for row in rows]
+    
+    def list_exercises(
+        self,
+        title: Optional[str] = None,
+        category: Optional[str] = None,
+        page: int = 1,
+        size: int = DEFAULT_PAGE_SIZE,
+        sort: SortField = SortField.CREATED_AT,
+        order: SortOrder = SortOrder.DESC,
+        q: Optional[str] = None
+    ) -> Tuple[List[Exercise], int]:
+        """
+        Get one page of exercises matching the filters
+        
+        Args:
+            title: Optional search term for exercise titles
+            category: Optional category filter
+            page: 1-based page number
+            size: Number of exercises per page
+            sort: Field to sort by; relevance only applies together with q
+            order: Sort direction
+            q: Optional full-text query over title, statement and solution
+        
+        Returns:
+            Tuple of (exercises on the requested page, total matching exercises)
+        """
+        rows, total = self._select_page(EXERCISE_COLUMNS, title, category, page, size, sort, order, q)
+        return [self._row_to_exercise(row) for row in rows], total
+    
+    def list_exercise_summaries(
+        self,
+        title: Optional[str] = None,
+        category: Optional[str] = None,
+        page: int = 1,
+        size: int = DEFAULT_PAGE_SIZE,
+        sort: SortField = SortField.CREATED_AT,
+        order: SortOrder = SortOrder.DESC,
+        q: Optional[str] = None
+    ) -> Tuple[List[ExerciseSummary], int]:
+        """
+        Get one page of exercise summaries matching the filters
+        
+        Same arguments as list_exercises. Only the summary columns are read.
+        
+        Returns:
+            Tuple of (summaries on the requested page, total matching exercises)
+        """
+        rows, total = self._select_page(SUMMARY_COLUMNS, title, category, page, size, sort, order, q)
+        summaries = [
+            ExerciseSummary.model_construct(
+                id=row["id"],
+                title=row["title"],
+                category=Category(row["category"]),
+                createdAt=datetime.fromisoformat(row["created_at"]),
+                confidenceScore=row["confidence_score"]
+            )
+            for row in rows
+        ]
+        return summaries, total
+    
+    def _select_page(
+        self,
+        columns: str,
+        title: Optional[str],
+        category: Optional[str],
+        page: int,
+        size: int,
+        sort: SortField,
+        order: SortOrder,
+        q: Optional[str] = None
+    ) -> Tuple[List[sqlite3.Row], int]:
+        """Select one page of rows plus the total number of matching rows"""
+        where, params = self._build_filters(title, category)
+        direction = "DESC" if order == SortOrder.DESC else "ASC"
+        source = "exercises"
+        
+        if q:
+            match = self._build_match_expression(q)
+            if not match:
+                return [], 0
+            # Restrict to full-text matches, exposing their BM25 rank for relevance ordering
+            source = (
+                "exercises JOIN (SELECT id AS fts_id, "
+                f"bm25(exercises_fts, {BM25_WEIGHTS}) AS fts_rank "
+                "FROM exercises_fts WHERE exercises_fts MATCH ?) ON fts_id = id"
+            )
+            params = [match] + params
+        
+        if sort == SortField.RELEVANCE and q:
+            # bm25() is lower for better matches
+            order_by = f"fts_rank {'ASC' if order == SortOrder.DESC else 'DESC'}, id {direction}"
+        else:
+            column = SORT_COLUMNS.get(sort, SORT_COLUMNS[SortField.CREATED_AT])
+            order_by = f"{column} {direction}, id {direction}"
+        
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM {source} {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {columns} FROM {source} {where} ORDER BY {order_by} LIMIT ? OFFSET ?",
+            params + [size, (page - 1) * size]
+        ).fetchall()
+        return rows, total
+    
+    def _build_match_expression(self, q: str) -> str:
+        """Translate a search query into an FTS5 MATCH expression requiring every term"""
+        return " ".join(
+            f'"{token}"*' if is_prefix else f'"{token}"'
+            for token, is_prefix in tokenize_query(q)
+        )
+    
+    def update_exercise(
+        self, exercise_id: str, update_data: ExerciseUpdate, expected_version: Optional[int] = None
+    ) -> Optional[Exercise]:
+        """Update an existing exercise, optionally only if it is at expected_version"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT {EXERCISE_COLUMNS} FROM exercises WHERE id = ?", (exercise_id,)
+            ).fetchone()
+            if not row:
+                return None
+            
+            exercise = self._row_to_exercise(row)
+            if expected_version is not None and exercise.version != expected_version:
+                raise VersionConflictError(exercise_id, exercise.version)
+            previous = exercise.model_copy()
+            
+            # Update fields
+            update_dict = update_data.model_dump(exclude_unset=True)
+            for field, value in update_dict.items():
+                if field == "title" and value:
+                    if value == exercise.title:
+                        continue
+                    # Handle title deduplication for updates
+                    value = self._get_title_with_suffix(conn, value)
+                    self._register_title(conn, value)
+                setattr(exercise, field, value)
+            exercise.version += 1
+            
+            conn.execute(
+                "UPDATE exercises SET title = ?, statement = ?, solution = ?, category = ?, version = ? WHERE id = ?",
+                (
+                    exercise.title, exercise.statement, exercise.solution, exercise.category.value,
+                    exercise.version, exercise_id
+                )
+            )
+            self._index_search_text(conn, exercise)
+            if stats_buckets(previous) != stats_buckets(exercise):
+                self._adjust_stats(conn, previous, -1)
+                self._adjust_stats(conn, exercise, 1)
+        
+        return exercise
+    
+    def delete_exercise(self, exercise_id: str, expected_version: Optional[int] = None) -> bool:
+        """Delete an exercise, optionally only if it is at expected_version"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                f"SELECT {EXERCISE_COLUMNS} FROM exercises WHERE id = ?", (exercise_id,)
+            ).fetchone()
+            if not row:
+                return False
+            if expected_version is not None and row["version"] != expected_version:
+                raise VersionConflictError(exercise_id, row["version"])
+            
+            conn.execute("DELETE FROM exercises WHERE id = ?", (exercise_id,))
+            self._unindex_search_text(conn, exercise_id)
+            self._adjust_stats(conn, self._row_to_exercise(row), -1)
+            return True
+    
+    def get_exercise_count(self) -> int:
+        """Get total number of exercises"""
+        return self._connect().execute("SELECT COUNT(*) FROM exercises").fetchone()[0]
+    
+    def get_exercise_stats(self) -> dict:
+        """
+        Get aggregate statistics over all exercises
+        
+        Reads the running aggregates maintained by every write, so the cost
+        does not depend on the number of exercises.
+        
+        Returns:
+            Dict with total_exercises, category_distribution,
+            confidence_histogram and created_per_day
+        """
+        stats = empty_stats()
+        rows = self._connect().execute(
+            "SELECT dimension, bucket, count FROM exercise_stats ORDER BY dimension, bucket"
+        ).fetchall()
+        for row in rows:
+            if row["dimension"] == "total_exercises":
+                stats["total_exercises"] = row["count"]
+            else:
+                stats[row["dimension"]][row["bucket"]] = row["count"]
+        return stats
+    
+    def save_image(self, exercise_id: str, image_file, filename: str) -> str:
+        """Save an uploaded image for an exercise"""
+        exercise_images_dir = self.images_dir / exercise_id
+        exercise_images_dir.mkdir(exist_ok=True)
+        
+        # Generate unique filename
+        file_extension = Path(filename).suffix
+        unique_filename = f"{uuid.uuid4().hex}{file_extension}"
+        file_path = exercise_images_dir / unique_filename
+        
+        # Save the file
+        with open(file_path, "wb") as buffer:
+            buffer.write(image_file.file.read())
+        
+        # Return the relative path for storage in exercise
+        return f"images/{exercise_id}/{unique_filename}"
+    
+    def close(self) -> None:
+        """Close the database connections of all threads"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+class _Transaction:
+    """Context manager running a BEGIN IMMEDIATE ... COMMIT/ROLLBACK block"""
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+    
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
@@ -1,16 +1,97 @@
 import json
 import os
+import threading
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import uuid
+from contextlib import nullcontext
 
-from agent.backend.models import Exercise, ExerciseCreate, ExerciseUpdate
+from agent.backend.models import (
+    Exercise, ExerciseCreate, ExerciseUpdate, ExerciseSummary, SortField, SortOrder,
+    DEFAULT_PAGE_SIZE
+)
+from agent.backend.services.exercise_locks import ExerciseLocks
+from agent.backend.services.exercise_stats import ExerciseStats
+from agent.backend.services.invalidation import InvalidationLog
+from agent.backend.services.search_index import SearchIndex, exercise_search_fields
+from agent.backend.services.title_registry import TitleRegistry
+from agent.metrics import REGISTRY
+
+# Time spent on each file operation: glob (directory scan), read, parse and write
+STORAGE_OPERATION_DURATION = REGISTRY.histogram(
+    "storage_operation_duration_seconds", "Duration of exercise file operations", ["operation"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+# Temporary files of interrupted writes older than this are removed on startup
+STALE_TEMP_FILE_AGE = 3600.0
+
+class VersionConflictError(Exception):
+    """Raised when a write expected another version of the exercise than the stored one"""
+    
+    def __init__(self, exercise_id: str, current_version: int):
+        super().__init__(f"Exercise {exercise_id} is at version {current_version}")
+        self.exercise_id = exercise_id
+        self.current_version = current_version
+
+def write_file_atomically(path: Path, content: str) -> None:
+    """
+    Replace a file's content so readers see either the old or the new file, never a partial one
+    
+    The content is written to a temporary file in the same directory,
+    flushed to disk, and renamed over the target; the directory entry is
+    flushed as well, so the new file survives a crash.
+    """
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    
+    try:
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on Windows; the rename is durable there
+        return
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+# Sort keys for each listing order; the id breaks ties so pages are stable
+SORT_KEYS = {
+    SortField.CREATED_AT: lambda ex: (ex.createdAt, ex.id),
+    SortField.TITLE: lambda ex: (ex.title.lower(), ex.id),
+    SortField.CONFIDENCE: lambda ex: (ex.confidenceScore, ex.id),
+}
 
 class FileStorageService:
-    """File-based storage service for exercises"""
+    """File-based storage service for exercises
+    
+    Parsed exercises are kept in an in-memory index keyed by id. The index is
+    built once on startup, updated in place by create/update/delete, and
+    revalidated against file mtimes so that edits made outside the API are
+    picked up without re-parsing unchanged files.
+    
+    Files are replaced atomically, and updates and deletes of an exercise
+    are serialized by a per-exercise lock that also covers other worker
+    processes using the same data directory. Each write increments the
+    exercise's version, which callers can pass back to detect lost updates.
     
-    def __init__(self, data_dir: str = "data"):
+    Several worker processes can serve the same data directory: every write
+    is published to a shared invalidation log, and each process reloads the
+    exercises other processes changed before serving its next read. Title
+    deduplication is serialized across processes by a separate lock.
+    """
+    
+    def __init__(self, data_dir: str = "data", revalidate_interval: float = 1.0):
         self.data_dir = Path(data_dir)
         self.exercises_dir = self.data_dir / "exercises"
         self.images_dir = self.data_dir / "images"
@@ -18,97 +99,307 @@ class FileStorageService:
         # Ensure directories exist
         self.exercises_dir.mkdir(parents=True, exist_ok=True)
         self.images_dir.mkdir(parents=True, exist_ok=True)
+        
+        # In-memory index state
+        self.revalidate_interval = revalidate_interval
+        self._lock = threading.RLock()
+        # Held for a full rescan, which runs without holding _lock
+        self._rescan_lock = threading.Lock()
+        self._index: Dict[str, Exercise] = {}
+        self._file_stats: Dict[str, Tuple[int, int]] = {}
+        self._sorted_views: Dict[Tuple[SortField, SortOrder], List[Exercise]] = {}
+        self._last_revalidated = 0.0
+        self._titles = TitleRegistry()
+        self._search = SearchIndex()
+        self._stats = ExerciseStats()
+        self._exercise_locks = ExerciseLocks(self.exercises_dir / ".locks")
+        # A single stripe: suffixes depend on every title
+        self._title_lock = ExerciseLocks(self.exercises_dir / ".titles.lock", stripes=1)
+        self._changes = InvalidationLog(self.exercises_dir / ".changes")
+        self._synced_generation = 0
+        
+        self._remove_stale_temp_files()
+        self._load_index()
     
     def _generate_exercise_id(self) -> str:
         """Generate a unique exercise ID"""
         return f"exercise_{str(uuid.uuid4())[:8]}"
     
     def _get_title_with_suffix(self, base_title: str) -> str:
-        """Add suffix number to title if duplicate exists"""
-        existing_titles = self._get_all_titles()
-        
-        if base_title not in existing_titles:
-            return base_title
-        
-        # Find the highest suffix number
-        suffix = 1
-        while f"{base_title} ({suffix})" in existing_titles:
-            suffix += 1
-        
-        return f"{base_title} ({suffix})"
+        """Add suffix number to title if duplicate exists, reserving the result (caller holds the title lock)"""
+        self._refresh_index()
+        return self._titles.reserve(base_title)
     
     def _get_all_titles(self) -> List[str]:
         """Get all existing exercise titles"""
-        titles = []
-        for file_path in self.exercises_dir.glob("*.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    titles.append(data.get('title', ''))
-            except (json.JSONDecodeError, IOError):
-                continue
-        return titles
+        self._refresh_index()
+        with self._lock:
+            return [exercise.title for exercise in self._index.values()]
     
     def _get_exercise_file_path(self, exercise_id: str) -> Path:
         """Get the file path for an exercise"""
         return self.exercises_dir / f"{exercise_id}.json"
     
+    def _read_exercise_file(self, file_path: Path) -> Optional[Exercise]:
+        """Parse a single exercise file, returning None if it is unreadable"""
+        try:
+            with STORAGE_OPERATION_DURATION.time(operation="read"):
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            with STORAGE_OPERATION_DURATION.time(operation="parse"):
+                return Exercise(**json.loads(content))
+        except (json.JSONDecodeError, IOError, ValueError):
+            return None
+    
+    def _write_exercise_file(self, exercise: Exercise) -> None:
+        """Write an exercise to disk, record it in the index and publish the change"""
+        file_path = self._get_exercise_file_path(exercise.id)
+        content = json.dumps(exercise.model_dump(), default=str, indent=2, ensure_ascii=False)
+        with STORAGE_OPERATION_DURATION.time(operation="write"):
+            write_file_atomically(file_path, content)
+        
+        with self._lock:
+            stat = file_path.stat()
+            self._file_stats[exercise.id] = (stat.st_mtime_ns, stat.st_size)
+            self._index_put(exercise)
+        self._publish_change(exercise.id)
+    
+    def _publish_change(self, exercise_id: str) -> None:
+        """Tell other processes that an exercise changed; the own index is already up to date"""
+        generation = self._changes.publish(exercise_id)
+        with self._lock:
+            # Skipping the own change is only safe if no other process published in between
+            if generation == self._synced_generation + 1:
+                self._synced_generation = generation
+    
+    def _remove_stale_temp_files(self) -> None:
+        """Remove temporary files left behind by writes that were interrupted"""
+        # Recent ones may belong to a write in progress in another worker
+        cutoff = time.time() - STALE_TEMP_FILE_AGE
+        for temp_path in self.exercises_dir.glob(".*.json.*.tmp"):
+            try:
+                if temp_path.stat().st_mtime < cutoff:
+                    temp_path.unlink()
+            except OSError:
+                continue
+    
+    def _sync_from_disk(self, exercise_id: str) -> Optional[Exercise]:
+        """
+        Re-read one exercise file into the index, returning a copy of the stored exercise
+        
+        Writers call this while holding the exercise's lock, since another
+        worker may have changed the file since it was indexed.
+        """
+        file_path = self._get_exercise_file_path(exercise_id)
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            stat = None
+        exercise = self._read_exercise_file(file_path) if stat is not None else None
+        
+        with self._lock:
+            previous = self._index_drop(exercise_id)
+            if exercise is None:
+                self._file_stats.pop(exercise_id, None)
+                if previous is not None:
+                    self._titles.remove(previous.title)
+                return None
+            self._file_stats[exercise_id] = (stat.st_mtime_ns, stat.st_size)
+            self._titles.replace(previous.title if previous else None, exercise.title)
+            self._index_put(exercise)
+        return exercise.model_copy()
+    
+    def _index_put(self, exercise: Exercise) -> None:
+        """Add or replace an exercise in the index and its derived views"""
+        with self._lock:
+            previous = self._index.get(exercise.id)
+            self._index[exercise.id] = exercise
+            self._stats.replace(previous, exercise)
+            self._search.add(exercise.id, exercise_search_fields(exercise))
+            self._sorted_views.clear()
+    
+    def _index_drop(self, exercise_id: str) -> Optional[Exercise]:
+        """Remove an exercise from the index and its derived views"""
+        with self._lock:
+            exercise = self._index.pop(exercise_id, None)
+            if exercise is not None:
+                self._search.remove(exercise_id)
+                self._stats.remove(exercise)
+                self._sorted_views.clear()
+            return exercise
+    
+    def _scan_exercise_files(self) -> Dict[str, Tuple[int, int]]:
+        """Stat every exercise file without parsing it"""
+        file_stats = {}
+        with STORAGE_OPERATION_DURATION.time(operation="glob"), os.scandir(self.exercises_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                file_stats[entry.name[:-len(".json")]] = (stat.st_mtime_ns, stat.st_size)
+        return file_stats
+    
+    def _load_index(self) -> None:
+        """Build the in-memory index from scratch"""
+        with self._lock:
+            self._index.clear()
+            self._file_stats.clear()
+            self._titles.clear()
+            self._search.clear()
+            self._stats.reset()
+            self._last_revalidated = 0.0
+        self._refresh_index(force=True)
+    
+    def _refresh_index(self, force: bool = False) -> None:
+        """
+        Bring the index up to date with the exercise files
+        
+        Exercises changed through other processes are reloaded as soon as
+        they are published. Files are revalidated against their mtime and
+        size every revalidate_interval, to pick up edits made outside the
+        API, or whenever the changes published since the last sync are no
+        longer all known.
+        """
+        now = time.monotonic()
+        due = force or now - self._last_revalidated >= self.revalidate_interval
+        if not due and self._changes.generation() == self._synced_generation:
+            return
+        
+        # Read before the files, so changes published meanwhile are reloaded next time
+        generation, changed = self._changes.changes_since(self._synced_generation)
+        if not due and changed is not None:
+            self._sync_published(generation, changed)
+            return
+        
+        # One rescan at a time; a periodic one is skipped while another is running
+        if not self._rescan_lock.acquire(blocking=force or changed is None):
+            if changed is not None:
+                self._sync_published(generation, changed)
+            return
+        try:
+            self._rescan(now, generation, changed)
+        finally:
+            self._rescan_lock.release()
+    
+    def _sync_published(self, generation: int, changed: List[str]) -> None:
+        """Reload the exercises other processes published changes to"""
+        for exercise_id in set(changed):
+            self._sync_from_disk(exercise_id)
+        with self._lock:
+            self._synced_generation = max(self._synced_generation, generation)
+    
+    def _rescan(self, now: float, generation: int, changed: Optional[List[str]]) -> None:
+        """
+        Revalidate every exercise file against the index
+        
+        The directory is scanned and changed files parsed without holding
+        the index lock, so reads keep being served meanwhile; the lock is
+        only taken to apply the result. Exercises written or deleted by
+        this process during the scan are left as they are.
+        """
+        with self._lock:
+            known_stats = dict(self._file_stats)
+        file_stats = self._scan_exercise_files()
+        
+        # Published changes are re-read even if mtime and size look unchanged
+        forced = set(changed or ())
+        parsed = {}
+        for exercise_id, stat_key in file_stats.items():
+            if exercise_id not in forced and known_stats.get(exercise_id) == stat_key:
+                continue
+            parsed[exercise_id] = (stat_key, self._read_exercise_file(self._get_exercise_file_path(exercise_id)))
+        
+        with self._lock:
+            def unchanged_since_scan(exercise_id: str) -> bool:
+                return self._file_stats.get(exercise_id) == known_stats.get(exercise_id)
+            
+            # Drop exercises whose files were removed
+            for exercise_id in list(self._index):
+                if exercise_id not in file_stats and unchanged_since_scan(exercise_id):
+                    self._titles.remove(self._index_drop(exercise_id).title)
+                    self._file_stats.pop(exercise_id, None)
+            
+            # Index new or modified files
+            for exercise_id, (stat_key, exercise) in parsed.items():
+                if not unchanged_since_scan(exercise_id):
+                    continue
+                self._file_stats[exercise_id] = stat_key
+                previous = self._index_drop(exercise_id)
+                if exercise is None:
+                    # Unreadable files are skipped, as with a full directory scan
+                    if previous is not None:
+                        self._titles.remove(previous.title)
+                    continue
+                self._titles.replace(previous.title if previous else None, exercise.title)
+                self._index_put(exercise)
+            
+            self._last_revalidated = now
+            self._synced_generation = generation
+    
     def create_exercise(self, exercise_data: ExerciseCreate, image_paths: List[str] = None, confidence_score: float = 0.0) -> Exercise:
         """Create a new exercise"""
         exercise_id = self._generate_exercise_id()
         
-        # Handle title deduplication
-        final_title = self._get_title_with_suffix(exercise_data.title)
-        
-        exercise = Exercise(
-            id=exercise_id,
-            title=final_title,
-            statement=exercise_data.statement,
-            solution=exercise_data.solution,
-            category=exercise_data.category,
-            level="advanced",
-            status="finished",
-            createdAt=datetime.utcnow(),
-            imagePaths=image_paths or [],
-            confidenceScore=confidence_score
-        )
-        
-        # Save to file
-        file_path = self._get_exercise_file_path(exercise_id)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(exercise.model_dump(), f, default=str, indent=2, ensure_ascii=False)
+        # Held until the file is written, so other processes see the title before reserving theirs
+        with self._title_lock.hold(""):
+            # Handle title deduplication
+            final_title = self._get_title_with_suffix(exercise_data.title)
+            
+            exercise = Exercise(
+                id=exercise_id,
+                title=final_title,
+                statement=exercise_data.statement,
+                solution=exercise_data.solution,
+                category=exercise_data.category,
+                level="advanced",
+                status="finished",
+                createdAt=datetime.utcnow(),
+                imagePaths=image_paths or [],
+                confidenceScore=confidence_score
+            )
+            
+            # Save to file, releasing the reserved title if the write fails
+            try:
+                self._write_exercise_file(exercise)
+            except Exception:
+                self._titles.remove(final_title)
+                raise
         
-        return exercise
+        # Hand out a copy so callers cannot mutate the index
+        return exercise.model_copy()
     
     def get_exercise(self, exercise_id: str) -> Optional[Exercise]:
         """Get an exercise by ID"""
-        file_path = self._get_exercise_file_path(exercise_id)
+        self._refresh_index()
         
-        if not file_path.exists():
-            return None
+        with self._lock:
+            exercise = self._index.get(exercise_id)
         
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return Exercise(**data)
-        except (json.JSONDecodeError, IOError):
-            return None
+        # Hand out a copy so callers cannot mutate the index
+        return exercise.model_copy() if exercise else None
+    
+    def _get_sorted_exercises(self, sort: SortField, order: SortOrder) -> List[Exercise]:
+        """Get the cached ordering of the index for a sort field and direction"""
+        self._refresh_index()
+        
+        with self._lock:
+            view = self._sorted_views.get((sort, order))
+            if view is None:
+                view = sorted(
+                    self._index.values(),
+                    key=SORT_KEYS[sort],
+                    reverse=order == SortOrder.DESC
+                )
+                self._sorted_views[(sort, order)] = view
+            return view
     
     def get_all_exercises(self) -> List[Exercise]:
         """Get all exercises"""
-        exercises = []
-        
-        for file_path in self.exercises_dir.glob("*.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    exercises.append(Exercise(**data))
-            except (json.JSONDecodeError, IOError):
-                continue
-        
         # Sort by creation date (newest first)
-        exercises.sort(key=lambda x: x.createdAt, reverse=True)
-        return exercises
+        return list(self._get_sorted_exercises(SortField.CREATED_AT, SortOrder.DESC))
     
     def search_exercises(self, title: Optional[str] = None, category: Optional[str] = None) -> List[Exercise]:
         """Search exercises by title and/or category"""
@@ -123,43 +414,186 @@ class FileStorageService:
         
         return exercises
     
-    def update_exercise(self, exercise_id: str, update_data: ExerciseUpdate) -> Optional[Exercise]:
-        """Update an existing exercise"""
-        exercise = self.get_exercise(exercise_id)
-        if not exercise:
-            return None
+    def _search_exercises_ranked(self, q: str, sort: SortField, order: SortOrder) -> List[Exercise]:
+        """Get exercises matching a full-text query, ordered by relevance or a sort field"""
+        self._refresh_index()
         
-        # Update fields
-        update_dict = update_data.model_dump(exclude_unset=True)
-        for field, value in update_dict.items():
-            if field == "title" and value:
-                # Handle title deduplication for updates
-                value = self._get_title_with_suffix(value)
-            setattr(exercise, field, value)
+        with self._lock:
+            ranked = self._search.search(q)
+            exercises = [self._index[doc_id] for doc_id, _ in ranked if doc_id in self._index]
         
-        # Save updated exercise
-        file_path = self._get_exercise_file_path(exercise_id)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(exercise.model_dump(), f, default=str, indent=2, ensure_ascii=False)
+        if sort != SortField.RELEVANCE:
+            exercises.sort(key=SORT_KEYS[sort], reverse=order == SortOrder.DESC)
+        elif order == SortOrder.ASC:
+            exercises.reverse()
+        return exercises
+    
+    def list_exercises(
+        self,
+        title: Optional[str] = None,
+        category: Optional[str] = None,
+        page: int = 1,
+        size: int = DEFAULT_PAGE_SIZE,
+        sort: SortField = SortField.CREATED_AT,
+        order: SortOrder = SortOrder.DESC,
+        q: Optional[str] = None
+    ) -> Tuple[List[Exercise], int]:
+        """
+        Get one page of exercises matching the filters
+        
+        Args:
+            title: Optional search term for exercise titles
+            category: Optional category filter
+            page: 1-based page number
+            size: Number of exercises per page
+            sort: Field to sort by; relevance only applies together with q
+            order: Sort direction
+            q: Optional full-text query over title, statement and solution
+        
+        Returns:
+            Tuple of (exercises on the requested page, total matching exercises)
+        """
+        if q:
+            exercises = self._search_exercises_ranked(q, sort, order)
+        else:
+            if sort == SortField.RELEVANCE:
+                sort = SortField.CREATED_AT
+            exercises = self._get_sorted_exercises(sort, order)
+        
+        if title:
+            title_lower = title.lower()
+            exercises = [ex for ex in exercises if title_lower in ex.title.lower()]
+        
+        if category:
+            exercises = [ex for ex in exercises if ex.category.value == category]
         
-        return exercise
+        start = (page - 1) * size
+        return exercises[start:start + size], len(exercises)
     
-    def delete_exercise(self, exercise_id: str) -> bool:
-        """Delete an exercise"""
-        file_path = self._get_exercise_file_path(exercise_id)
+    def list_exercise_summaries(
+        self,
+        title: Optional[str] = None,
+        category: Optional[str] = None,
+        page: int = 1,
+        size: int = DEFAULT_PAGE_SIZE,
+        sort: SortField = SortField.CREATED_AT,
+        order: SortOrder = SortOrder.DESC,
+        q: Optional[str] = None
+    ) -> Tuple[List[ExerciseSummary], int]:
+        """
+        Get one page of exercise summaries matching the filters
         
-        if not file_path.exists():
-            return False
+        Same arguments as list_exercises.
         
-        try:
-            file_path.unlink()
-            return True
-        except IOError:
-            return False
+        Returns:
+            Tuple of (summaries on the requested page, total matching exercises)
+        """
+        exercises, total = self.list_exercises(
+            title=title, category=category, page=page, size=size, sort=sort, order=order, q=q
+        )
+        return [ExerciseSummary.from_exercise(exercise) for exercise in exercises], total
+    
+    def update_exercise(
+        self, exercise_id: str, update_data: ExerciseUpdate, expected_version: Optional[int] = None
+    ) -> Optional[Exercise]:
+        """
+        Update an existing exercise
+        
+        Args:
+            exercise_id: Exercise to update
+            update_data: Fields to change
+            expected_version: Only update if the stored exercise is at this version
+        
+        Returns:
+            The updated exercise, or None if it does not exist
+        
+        Raises:
+            VersionConflictError: If expected_version is not the stored version
+        """
+        with self._exercise_locks.hold(exercise_id):
+            exercise = self._sync_from_disk(exercise_id)
+            if not exercise:
+                return None
+            if expected_version is not None and exercise.version != expected_version:
+                raise VersionConflictError(exercise_id, exercise.version)
+            
+            update_dict = update_data.model_dump(exclude_unset=True)
+            renaming = bool(update_dict.get("title"))
+            with self._title_lock.hold("") if renaming else nullcontext():
+                if renaming:
+                    # Suffixes must account for titles created by other processes
+                    self._refresh_index()
+                
+                # Update fields
+                old_title = exercise.title
+                for field, value in update_dict.items():
+                    if field == "title" and value:
+                        # Handle title deduplication for updates, releasing the old title
+                        value = self._titles.rename(old_title, value)
+                    setattr(exercise, field, value)
+                exercise.version += 1
+                
+                # Save updated exercise, restoring the old title if the write fails
+                try:
+                    self._write_exercise_file(exercise)
+                except Exception:
+                    if exercise.title != old_title:
+                        self._titles.replace(exercise.title, old_title)
+                    raise
+        
+        return exercise.model_copy()
+    
+    def delete_exercise(self, exercise_id: str, expected_version: Optional[int] = None) -> bool:
+        """
+        Delete an exercise
+        
+        Args:
+            exercise_id: Exercise to delete
+            expected_version: Only delete if the stored exercise is at this version
+        
+        Returns:
+            Whether the exercise existed and was deleted
+        
+        Raises:
+            VersionConflictError: If expected_version is not the stored version
+        """
+        file_path = self._get_exercise_file_path(exercise_id)
+        
+        with self._exercise_locks.hold(exercise_id):
+            exercise = self._sync_from_disk(exercise_id)
+            if not exercise:
+                return False
+            if expected_version is not None and exercise.version != expected_version:
+                raise VersionConflictError(exercise_id, exercise.version)
+            
+            try:
+                file_path.unlink()
+            except IOError:
+                return False
+            
+            with self._lock:
+                self._index_drop(exercise_id)
+                self._file_stats.pop(exercise_id, None)
+                self._titles.remove(exercise.title)
+            self._publish_change(exercise_id)
+        return True
     
     def get_exercise_count(self) -> int:
         """Get total number of exercises"""
-        return len(list(self.exercises_dir.glob("*.json")))
+        self._refresh_index()
+        with self._lock:
+            return len(self._index)
+    
+    def get_exercise_stats(self) -> dict:
+        """
+        Get aggregate statistics over all exercises
+        
+        Returns:
+            Dict with total_exercises, category_distribution,
+            confidence_histogram and created_per_day
+        """
+        self._refresh_index()
+        return self._stats.snapshot()
     
     def save_image(self, exercise_id: str, image_file, filename: str) -> str:
         """Save an uploaded image for an exercise"""
@@ -176,4 +610,31 @@ class FileStorageService:
             buffer.write(image_file.file.read())
         
         # Return the relative path for storage in exercise
-        return f"images/{exercise_id}/{unique_filename}" 
\ No newline at end of file
+        return f"images/{exercise_id}/{unique_filename}"
+    
+    def close(self) -> None:
+        """Release the lock and invalidation files"""
+        self._exercise_locks.close()
+        self._title_lock.close()
+        self._changes.close()
+
+def create_storage_service(backend: Optional[str] = None, data_dir: str = "data"):
+    """
+    Create the configured storage backend
+    
+    Args:
+        backend: "file" or "sqlite"; defaults to the STORAGE_BACKEND environment variable
+        data_dir: Root data directory
+    
+    Returns:
+        A storage service exposing the FileStorageService interface
+    """
+    backend = (backend or os.getenv("STORAGE_BACKEND", "file")).lower()
+    
+    if backend == "file":
+        return FileStorageService(data_dir=data_dir)
+    if backend == "sqlite":
+        from agent.backend.services.sqlite_storage_service import SQLiteStorageService
+        return SQLiteStorageService(data_dir=data_dir)
+    
+    raise ValueError(f"Unknown storage backend: {backend}")
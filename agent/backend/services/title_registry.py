@@ -0,0 +1,106 @@
+import re
+import threading
+from typing import Dict, Optional
+
+# Matches titles that already carry a deduplication suffix, e.g. "Limits (3)"
+SUFFIX_PATTERN = re.compile(r"^(?P<base>.*) \((?P<suffix>\d+)\)$")
+
+class TitleRegistry:
+    """In-memory registry of exercise titles for constant-time deduplication
+    
+    Keeps a count of every title in use and, for each base title, the highest
+    numeric suffix ever handed out. A duplicate title therefore gets the next
+    suffix directly instead of probing "(1)", "(2)", ... against every title.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._highest_suffix: Dict[str, int] = {}
+    
+    def _add(self, title: str) -> None:
+        """Register a title (caller must hold the lock)"""
+        self._counts[title] = self._counts.get(title, 0) + 1
+        
+        match = SUFFIX_PATTERN.match(title)
+        if match:
+            base = match.group("base")
+            suffix = int(match.group("suffix"))
+            if suffix > self._highest_suffix.get(base, 0):
+                self._highest_suffix[base] = suffix
+    
+    def _remove(self, title: str) -> None:
+        """Unregister a title (caller must hold the lock)"""
+        count = self._counts.get(title, 0)
+        if count <= 1:
+            self._counts.pop(title, None)
+        else:
+            self._counts[title] = count - 1
+    
+    def _reserve(self, base_title: str) -> str:
+        """Pick and register a unique title (caller must hold the lock)"""
+        if base_title not in self._counts:
+            title = base_title
+        else:
+            title = f"{base_title} ({self._highest_suffix.get(base_title, 0) + 1})"
+        
+        self._add(title)
+        return title
+    
+    def add(self, title: str) -> None:
+        """Register an existing title"""
+        with self._lock:
+            self._add(title)
+    
+    def remove(self, title: str) -> None:
+        """Release a title that is no longer in use"""
+        with self._lock:
+            self._remove(title)
+    
+    def replace(self, old_title: Optional[str], new_title: Optional[str]) -> None:
+        """Swap an existing title for another one, e.g. after an external edit"""
+        with self._lock:
+            if old_title is not None:
+                self._remove(old_title)
+            if new_title is not None:
+                self._add(new_title)
+    
+    def clear(self) -> None:
+        """Forget all registered titles"""
+        with self._lock:
+            self._counts.clear()
+            self._highest_suffix.clear()
+    
+    def reserve(self, base_title: str) -> str:
+        """
+        Atomically pick a unique title for base_title and register it
+        
+        Args:
+            base_title: Requested title
+        
+        Returns:
+            base_title if unused, otherwise base_title with the next free suffix
+        """
+        with self._lock:
+            return self._reserve(base_title)
+    
+    def rename(self, old_title: str, base_title: str) -> str:
+        """
+        Atomically release old_title and reserve a unique title for base_title
+        
+        Args:
+            old_title: Title currently held by the exercise
+            base_title: Requested new title
+        
+        Returns:
+            The unique title that was reserved
+        """
+        with self._lock:
+            self._remove(old_title)
+            return self._reserve(base_title)
+    
+    def __contains__(self, title: str) -> bool:
+        return title in self._counts
+    
+    def __len__(self) -> int:
+        return sum(self._counts.values())
@@ -0,0 +1,6 @@
+"""Benchmarks for the math exercises API: synthetic corpora and a load driver"""
+
+from agent.benchmarks.corpus import generate_corpus, write_corpus
+from agent.benchmarks.harness import BenchmarkConfig, compare, run_http, run_in_process
+
+__all__ = ['generate_corpus', 'write_corpus', 'BenchmarkConfig', 'compare', 'run_http', 'run_in_process']
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Command line for the API benchmarks
+    
+    # Corpus only, e.g. to serve it yourself
+    python -m agent.benchmarks generate --size 10000 --data-dir /tmp/bench/data
+    
+    # In-process (no network), against a fresh corpus in a temporary directory
+    python -m agent.benchmarks run --size 10000 --concurrency 16 --output before.json
+    
+    # Over HTTP, starting uvicorn on the corpus, or against a server you started
+    python -m agent.benchmarks run --mode http --size 10000 --workers 4 --output before.json
+    python -m agent.benchmarks run --mode http --url http://127.0.0.1:8000 --size 10000
+    
+    # Per-scenario p95 and throughput ratios; exits with 1 on a regression
+    python -m agent.benchmarks compare before.json after.json --tolerance 0.1
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from agent.benchmarks.corpus import write_corpus
+from agent.benchmarks.harness import SCENARIOS, BenchmarkConfig, compare, load_report, run_http, run_in_process, serve
+
+def _run(args) -> int:
+    config = BenchmarkConfig(
+        corpus_size=args.size,
+        seed=args.seed,
+        concurrency=args.concurrency,
+        requests=args.requests,
+        warmup=args.warmup,
+        scenarios=args.scenarios or [scenario.name for scenario in SCENARIOS],
+        storage_backend=args.backend,
+        mode=args.mode
+    )
+    
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as workdir:
+        data_dir = str(Path(workdir) / "data")
+        if args.mode == "inprocess":
+            report = run_in_process(config, data_dir)
+        elif args.url:
+            report = run_http(config, args.url)
+        else:
+            write_corpus(data_dir, config.corpus_size, config.seed)
+            with serve(data_dir, args.port, config.storage_backend, args.workers) as base_url:
+                report = run_http(config, base_url)
+            report["meta"]["workers"] = args.workers
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    
+    for name, result in report["results"].items():
+        print(
+            f"{name:<18} {result['throughput']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+            f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}",
+            file=sys.stderr
+        )
+    return 0
+
+def _compare(args) -> int:
+    baseline, current = load_report(args.baseline), load_report(args.current)
+    if baseline["meta"]["config"] != current["meta"]["config"] or baseline["meta"]["target"] != current["meta"]["target"]:
+        print("Warning: the reports were made with different settings", file=sys.stderr)
+    rows = compare(baseline, current, args.tolerance)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['scenario']:<18} p95 {row['p95_ms'][0]:>8.2f} -> {row['p95_ms'][1]:>8.2f} ms ({row['p95_ratio']:.2f}x)  "
+            f"throughput {row['throughput'][0]:>9.1f} -> {row['throughput'][1]:>9.1f} req/s ({row['throughput_ratio']:.2f}x)  {flag}"
+        )
+    return 1 if any(row["regression"] for row in rows) else 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m agent.benchmarks", description="Benchmark the math exercises API")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    generate = commands.add_parser("generate", help="Write a synthetic corpus")
+    generate.add_argument("--size", type=int, default=1000)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--data-dir", required=True, help="Data directory; exercises go to its exercises/ folder")
+    
+    run = commands.add_parser("run", help="Run the benchmark scenarios")
+    run.add_argument("--size", type=int, default=1000, help="Corpus size, e.g. 1000, 10000 or 100000")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    run.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    run.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per scenario")
+    run.add_argument("--scenarios", nargs="+", choices=[scenario.name for scenario in SCENARIOS])
+    run.add_argument("--backend", choices=["file", "sqlite"], default="file", help="Storage backend")
+    run.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    run.add_argument("--url", help="Benchmark this running server instead of starting one (http mode)")
+    run.add_argument("--port", type=int, default=8765, help="Port of the server started in http mode")
+    run.add_argument("--workers", type=int, default=1, help="Worker processes of the server started in http mode")
+    run.add_argument("--output", help="Write the JSON report here instead of stdout")
+    
+    comparison = commands.add_parser("compare", help="Compare two reports")
+    comparison.add_argument("baseline")
+    comparison.add_argument("current")
+    comparison.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown")
+    
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        exercises_dir = write_corpus(args.data_dir, args.size, args.seed)
+        print(f"Wrote {args.size} exercises to {exercises_dir}")
+        return 0
+    if args.command == "run":
+        return _run(args)
+    return _compare(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
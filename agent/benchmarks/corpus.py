@@ -0,0 +1,233 @@
+"""
+Synthetic exercise corpora for benchmarks
+
+Exercises are generated from seeded templates, so a given size and seed
+always give the same corpus. Categories follow a skewed distribution
+(algebra and calculus dominate, as in real uploads), bodies are
+multi-step LaTeX solutions of varying length, and repeated titles get
+the same "(n)" suffixes the storage layer hands out.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Share of each category in a corpus, by Category value. The app is not
+# imported here: importing it creates its data files in the working directory
+CATEGORY_WEIGHTS = {
+    "Algebra": 0.30,
+    "Calculus": 0.22,
+    "Geometry": 0.14,
+    "Statistics": 0.10,
+    "Trigonometry": 0.08,
+    "Linear Algebra": 0.07,
+    "Number Theory": 0.05,
+    "Differential Equations": 0.04,
+}
+
+# Created dates are spread over this period before CORPUS_EPOCH
+CORPUS_EPOCH = datetime(2025, 1, 1)
+CORPUS_SPAN = timedelta(days=730)
+
+def _quadratic(rng: random.Random) -> Tuple[str, str, List[str]]:
+    a, b = rng.randint(1, 9), rng.randint(1, 9)
+    return (
+        "Quadratic Equation Factoring",
+        f"Solve the quadratic equation: $x^2 - {a + b}x + {a * b} = 0$ by factoring.",
+        [
+            f"Factor the quadratic expression\n$x^2 - {a + b}x + {a * b} = (x - {a})(x - {b})$",
+            f"Set each factor equal to zero\n$x - {a} = 0$ or $x - {b} = 0$",
+            f"Solve for x\n$x = {a}$ or $x = {b}$",
+        ]
+    )
+
+def _linear_system(rng: random.Random) -> Tuple[str, str, List[str]]:
+    x, y = rng.randint(-5, 9), rng.randint(-5, 9)
+    a, b = rng.randint(1, 5), rng.randint(1, 5)
+    return (
+        "System of Linear Equations",
+        f"Solve the system $\\begin{{cases}} x + y = {x + y} \\\\ {a}x - {b}y = {a * x - b * y} \\end{{cases}}$",
+        [
+            f"From the first equation, $y = {x + y} - x$",
+            f"Substitute: ${a}x - {b}({x + y} - x) = {a * x - b * y}$, so ${a + b}x = {a * x - b * y + b * (x + y)}$",
+            f"Hence $x = {x}$ and $y = {y}$",
+        ]
+    )
+
+def _integral(rng: random.Random) -> Tuple[str, str, List[str]]:
+    n, k = rng.randint(2, 6), rng.randint(1, 4)
+    return (
+        "Integration by Parts",
+        f"Compute $\\int_0^{{{k}}} x^{{{n}}} e^{{x}} \\, dx$.",
+        [
+            "Let $u = x^{%d}$ and $dv = e^{x} \\, dx$, so $du = %d x^{%d} \\, dx$ and $v = e^{x}$" % (n, n, n - 1),
+            "Apply $\\int u \\, dv = uv - \\int v \\, du$ repeatedly until the power of $x$ vanishes",
+            f"Evaluate the bracket between $0$ and ${k}$ to conclude",
+        ]
+    )
+
+def _limit(rng: random.Random) -> Tuple[str, str, List[str]]:
+    a = rng.randint(1, 9)
+    return (
+        "Evaluating Limits",
+        f"Find $\\lim_{{x \\to 0}} \\frac{{\\sin({a}x)}}{{x}}$.",
+        [
+            f"Rewrite $\\frac{{\\sin({a}x)}}{{x}} = {a} \\cdot \\frac{{\\sin({a}x)}}{{{a}x}}$",
+            "Use $\\lim_{t \\to 0} \\frac{\\sin t}{t} = 1$",
+            f"The limit is ${a}$",
+        ]
+    )
+
+def _circle(rng: random.Random) -> Tuple[str, str, List[str]]:
+    r = rng.randint(2, 12)
+    return (
+        "Geometry Problem with Circles",
+        f"A circle has radius $r = {r}$. Find its area $A$ and circumference $C$.",
+        [
+            f"$A = \\pi r^2 = {r * r}\\pi$",
+            f"$C = 2\\pi r = {2 * r}\\pi$",
+        ]
+    )
+
+def _triangle(rng: random.Random) -> Tuple[str, str, List[str]]:
+    a, b = rng.randint(3, 12), rng.randint(3, 12)
+    return (
+        "Right Triangle Hypotenuse",
+        f"The legs of a right triangle are ${a}$ and ${b}$. Find the hypotenuse $c$.",
+        [
+            f"By Pythagoras, $c^2 = {a}^2 + {b}^2 = {a * a + b * b}$",
+            f"So $c = \\sqrt{{{a * a + b * b}}}$",
+        ]
+    )
+
+def _mean_variance(rng: random.Random) -> Tuple[str, str, List[str]]:
+    values = [rng.randint(1, 20) for _ in range(rng.randint(4, 8))]
+    mean = sum(values) / len(values)
+    return (
+        "Mean and Variance of a Sample",
+        f"Compute the mean $\\bar{{x}}$ and variance $s^2$ of the sample ${', '.join(map(str, values))}$.",
+        [
+            f"$\\bar{{x}} = \\frac{{1}}{{{len(values)}}} \\sum_{{i=1}}^{{{len(values)}}} x_i = {mean:.2f}$",
+            f"$s^2 = \\frac{{1}}{{{len(values) - 1}}} \\sum_{{i=1}}^{{{len(values)}}} (x_i - \\bar{{x}})^2$",
+            "Substitute the values and simplify",
+        ]
+    )
+
+def _trig_identity(rng: random.Random) -> Tuple[str, str, List[str]]:
+    k = rng.randint(2, 5)
+    return (
+        "Trigonometric Identity",
+        f"Prove that $\\sin^2({k}\\theta) + \\cos^2({k}\\theta) = 1$ and solve $\\sin({k}\\theta) = \\frac{{1}}{{2}}$.",
+        [
+            f"Let $t = {k}\\theta$; the identity follows from the unit circle",
+            "$\\sin t = \\frac{1}{2}$ gives $t = \\frac{\\pi}{6} + 2k\\pi$ or $t = \\frac{5\\pi}{6} + 2k\\pi$",
+            f"Divide by ${k}$ to get $\\theta$",
+        ]
+    )
+
+def _determinant(rng: random.Random) -> Tuple[str, str, List[str]]:
+    a, b, c, d = (rng.randint(-6, 9) for _ in range(4))
+    return (
+        "Matrix Determinant and Inverse",
+        f"Let $A = \\begin{{pmatrix}} {a} & {b} \\\\ {c} & {d} \\end{{pmatrix}}$. Compute $\\det A$ and $A^{{-1}}$.",
+        [
+            f"$\\det A = ({a})({d}) - ({b})({c}) = {a * d - b * c}$",
+            f"$A^{{-1}} = \\frac{{1}}{{\\det A}} \\begin{{pmatrix}} {d} & {-b} \\\\ {-c} & {a} \\end{{pmatrix}}$ when $\\det A \\neq 0$",
+        ]
+    )
+
+def _gcd(rng: random.Random) -> Tuple[str, str, List[str]]:
+    g = rng.randint(2, 15)
+    a, b = g * rng.randint(2, 20), g * rng.randint(2, 20)
+    return (
+        "Greatest Common Divisor",
+        f"Find $\\gcd({a}, {b})$ using the Euclidean algorithm.",
+        [
+            f"Divide ${max(a, b)}$ by ${min(a, b)}$ and keep the remainder",
+            "Repeat with the divisor and the remainder until the remainder is $0$",
+            "The last non-zero remainder divides both numbers",
+        ]
+    )
+
+def _ode(rng: random.Random) -> Tuple[str, str, List[str]]:
+    k, y0 = rng.randint(1, 5), rng.randint(1, 10)
+    return (
+        "First Order Linear ODE",
+        f"Solve $y' = {k}y$ with $y(0) = {y0}$.",
+        [
+            f"Separate variables: $\\frac{{dy}}{{y}} = {k} \\, dt$",
+            f"Integrate: $\\ln|y| = {k}t + C$",
+            f"Apply the initial condition: $y(t) = {y0} e^{{{k}t}}$",
+        ]
+    )
+
+TEMPLATES: Dict[str, List[Callable[[random.Random], Tuple[str, str, List[str]]]]] = {
+    "Algebra": [_quadratic, _linear_system],
+    "Calculus": [_integral, _limit],
+    "Geometry": [_circle, _triangle],
+    "Statistics": [_mean_variance],
+    "Trigonometry": [_trig_identity],
+    "Linear Algebra": [_determinant],
+    "Number Theory": [_gcd],
+    "Differential Equations": [_ode],
+}
+
+def generate_exercise_body(rng: random.Random, category: Optional[str] = None) -> Dict[str, Any]:
+    """Title, statement, solution and category of one synthetic exercise (the ExerciseCreate fields)"""
+    if category is None:
+        category = rng.choices(list(CATEGORY_WEIGHTS), weights=list(CATEGORY_WEIGHTS.values()))[0]
+    title, statement, steps = rng.choice(TEMPLATES[category])(rng)
+    # Solutions range from a couple of lines to long, repetitive write-ups
+    steps = steps * rng.choice([1, 1, 1, 2, 3])
+    solution = "\n\n".join(f"Step {number}: {step}" for number, step in enumerate(steps, start=1))
+    return {"title": title, "statement": statement, "solution": solution, "category": category}
+
+def generate_corpus(size: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Generate exercises in the stored JSON format
+    
+    Args:
+        size: Number of exercises
+        seed: Seed making the corpus reproducible
+    
+    Yields:
+        Exercise dicts, as found in data/exercises/*.json
+    """
+    rng = random.Random(seed)
+    title_counts: Dict[str, int] = {}
+    for index in range(size):
+        exercise = generate_exercise_body(rng)
+        # Same suffixes as TitleRegistry hands out for duplicate titles
+        count = title_counts.get(exercise["title"], 0)
+        title_counts[exercise["title"]] = count + 1
+        if count:
+            exercise["title"] = f"{exercise['title']} ({count})"
+        
+        exercise.update(
+            id=f"exercise_{index:08x}",
+            level="advanced",
+            status="finished",
+            createdAt=(CORPUS_EPOCH - CORPUS_SPAN * rng.random()).isoformat(),
+            imagePaths=[],
+            confidenceScore=round(rng.betavariate(8, 2), 3)
+        )
+        yield exercise
+
+def write_corpus(data_dir: str, size: int, seed: int = 0) -> Path:
+    """
+    Write a synthetic corpus to data_dir/exercises, one JSON file per exercise
+    
+    Both storage backends read this layout (the SQLite backend imports it on
+    first start).
+    
+    Returns:
+        The exercises directory
+    """
+    exercises_dir = Path(data_dir) / "exercises"
+    exercises_dir.mkdir(parents=True, exist_ok=True)
+    for exercise in generate_corpus(size, seed):
+        with open(exercises_dir / f"{exercise['id']}.json", "w", encoding="utf-8") as f:
+            json.dump(exercise, f, indent=2, ensure_ascii=False)
+    return exercises_dir
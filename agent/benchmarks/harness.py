@@ -0,0 +1,319 @@
+"""
+API benchmark driver
+
+Each scenario (list, search, stats, get, create, update, ...) is run on
+its own: a number of concurrent clients send requests until the
+scenario's request count is reached, and the latency percentiles and
+throughput of that phase are reported. Requests go through httpx, either
+to the app in-process (ASGI transport, no network) or to a server over
+HTTP. Request parameters are drawn from seeded generators, so two runs
+of the same configuration send the same requests.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+from agent.benchmarks.corpus import CATEGORY_WEIGHTS, generate_corpus, generate_exercise_body, write_corpus
+
+# Terms of the synthetic corpus worth searching for, from common to rare
+SEARCH_TERMS = ["equation", "factor", "integral", "limit", "circle", "variance", "determinant", "gcd", "theta", "euclidean"]
+
+# A request: method, path, query parameters, JSON body
+Request = Tuple[str, str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+@dataclass
+class Scenario:
+    """One benchmarked endpoint usage"""
+    name: str
+    make_request: Callable[[random.Random, List[str]], Request]
+
+def _list_page(rng: random.Random, ids: List[str]) -> Request:
+    pages = max(1, len(ids) // 20)
+    return "GET", "/api/exercises", {"page": rng.randint(1, min(pages, 50)), "size": 20}, None
+
+def _list_summary(rng: random.Random, ids: List[str]) -> Request:
+    method, path, params, body = _list_page(rng, ids)
+    return method, path, dict(params, view="summary"), body
+
+def _list_sorted(rng: random.Random, ids: List[str]) -> Request:
+    method, path, params, body = _list_page(rng, ids)
+    return method, path, dict(params, sort="title", order="asc"), body
+
+def _filter_category(rng: random.Random, ids: List[str]) -> Request:
+    category = rng.choices(list(CATEGORY_WEIGHTS), weights=list(CATEGORY_WEIGHTS.values()))[0]
+    return "GET", "/api/exercises", {"category": category, "size": 20}, None
+
+def _search(rng: random.Random, ids: List[str]) -> Request:
+    return "GET", "/api/exercises", {"q": rng.choice(SEARCH_TERMS), "size": 20}, None
+
+def _stats(rng: random.Random, ids: List[str]) -> Request:
+    return "GET", "/api/exercises/stats", None, None
+
+def _get(rng: random.Random, ids: List[str]) -> Request:
+    return "GET", f"/api/exercises/{rng.choice(ids)}", None, None
+
+def _create(rng: random.Random, ids: List[str]) -> Request:
+    return "POST", "/api/exercises", None, generate_exercise_body(rng)
+
+def _update(rng: random.Random, ids: List[str]) -> Request:
+    body = generate_exercise_body(rng, rng.choice(list(CATEGORY_WEIGHTS)))
+    return "PUT", f"/api/exercises/{rng.choice(ids)}", None, {"statement": body["statement"], "solution": body["solution"]}
+
+# Reads first, so writes do not change the corpus the reads are measured on
+SCENARIOS = [
+    Scenario("list", _list_page),
+    Scenario("list_summary", _list_summary),
+    Scenario("list_sorted_title", _list_sorted),
+    Scenario("filter_category", _filter_category),
+    Scenario("search", _search),
+    Scenario("stats", _stats),
+    Scenario("get", _get),
+    Scenario("create", _create),
+    Scenario("update", _update),
+]
+
+@dataclass
+class BenchmarkConfig:
+    """What to run and how hard"""
+    corpus_size: int = 1000
+    seed: int = 0
+    concurrency: int = 8
+    requests: int = 200  # Measured requests per scenario
+    warmup: int = 10  # Unmeasured requests per scenario, sent first
+    scenarios: Sequence[str] = field(default_factory=lambda: [scenario.name for scenario in SCENARIOS])
+    storage_backend: str = "file"
+    mode: str = "inprocess"  # "inprocess" or "http"
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Linearly interpolated percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Latency percentiles (milliseconds) and throughput of one scenario"""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput": count / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": sum(latencies) / count * 1000 if count else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if count else 0.0,
+    }
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, ids: List[str], config: BenchmarkConfig
+) -> Dict[str, Any]:
+    """Send a scenario's requests from concurrent clients and summarize them"""
+    remaining = config.warmup + config.requests
+    latencies: List[float] = []
+    errors = 0
+    started = None
+    
+    async def worker(worker_index: int) -> None:
+        nonlocal remaining, errors, started
+        rng = random.Random(f"{config.seed}:{scenario.name}:{worker_index}")
+        while remaining > 0:
+            remaining -= 1
+            measured = remaining < config.requests
+            if measured and started is None:
+                started = time.perf_counter()
+            method, path, params, body = scenario.make_request(rng, ids)
+            request_started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if not measured:
+                continue
+            if failed:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - request_started)
+    
+    await asyncio.gather(*(worker(index) for index in range(config.concurrency)))
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    return summarize(latencies, errors, elapsed)
+
+async def run_scenarios(client: httpx.AsyncClient, ids: List[str], config: BenchmarkConfig) -> Dict[str, Any]:
+    """Run the configured scenarios in order"""
+    results = {}
+    for scenario in SCENARIOS:
+        if scenario.name in config.scenarios:
+            results[scenario.name] = await run_scenario(client, scenario, ids, config)
+    return results
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _report(config: BenchmarkConfig, results: Dict[str, Any], target: str) -> Dict[str, Any]:
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "target": target,
+            "config": asdict(config),
+        },
+        "results": results,
+    }
+
+@contextmanager
+def in_process_app(data_dir: str, storage_backend: str = "file") -> Iterator[Any]:
+    """
+    The FastAPI app serving the corpus in data_dir, restored to its own storage afterwards
+    
+    The app's lifespan handler does not run, so no other services are created.
+    """
+    from agent.backend import routers
+    from agent.backend.main import app
+    from agent.backend.services.storage_service import create_storage_service
+    
+    original_storage_service = routers.storage_service
+    routers.storage_service = create_storage_service(storage_backend, data_dir=data_dir)
+    try:
+        yield app
+    finally:
+        close = getattr(routers.storage_service, "close", None)
+        if close is not None:
+            close()
+        routers.storage_service = original_storage_service
+
+def run_in_process(config: BenchmarkConfig, data_dir: str) -> Dict[str, Any]:
+    """
+    Benchmark the app in this process against a freshly written corpus
+    
+    Args:
+        config: Benchmark settings
+        data_dir: Empty directory the corpus is written to
+    
+    Returns:
+        The report: {"meta": {...}, "results": {scenario: summary}}
+    """
+    write_corpus(data_dir, config.corpus_size, config.seed)
+    ids = [exercise["id"] for exercise in generate_corpus(config.corpus_size, config.seed)]
+    
+    async def run() -> Dict[str, Any]:
+        with in_process_app(data_dir, config.storage_backend) as app:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                return await run_scenarios(client, ids, config)
+    
+    return _report(config, asyncio.run(run()), "inprocess")
+
+def run_http(config: BenchmarkConfig, base_url: str, ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Benchmark a running server, which must serve the corpus of config.corpus_size and config.seed
+    
+    Args:
+        config: Benchmark settings
+        base_url: Server address, e.g. http://127.0.0.1:8000
+        ids: Exercise ids to request (defaults to the ids of the configured corpus)
+    """
+    if ids is None:
+        ids = [exercise["id"] for exercise in generate_corpus(config.corpus_size, config.seed)]
+    
+    async def run() -> Dict[str, Any]:
+        limits = httpx.Limits(max_connections=config.concurrency, max_keepalive_connections=config.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+            return await run_scenarios(client, ids, config)
+    
+    return _report(config, asyncio.run(run()), base_url)
+
+@contextmanager
+def serve(data_dir: str, port: int, storage_backend: str = "file", workers: int = 1) -> Iterator[str]:
+    """
+    Start uvicorn serving the app on data_dir
+    
+    Yields:
+        The server's base URL, once /health answers
+    """
+    env = dict(os.environ, STORAGE_BACKEND=storage_backend, DATA_DIR=str(Path(data_dir).resolve()))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).resolve().parents[2]), env.get("PYTHONPATH")]))
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "agent.backend.main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"
+        ],
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {process.returncode}")
+            try:
+                if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server did not start within 60 seconds")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    Compare two reports scenario by scenario
+    
+    Args:
+        baseline: Report of the reference commit
+        current: Report of the commit under test
+        tolerance: Relative p95 increase or throughput drop counted as a regression
+    
+    Returns:
+        One row per scenario present in both reports, with the p95 and
+        throughput ratios (current / baseline) and a regression flag
+    """
+    rows = []
+    for name, before in baseline["results"].items():
+        after = current["results"].get(name)
+        if after is None:
+            continue
+        p95_ratio = after["p95_ms"] / before["p95_ms"] if before["p95_ms"] else float("inf")
+        throughput_ratio = after["throughput"] / before["throughput"] if before["throughput"] else float("inf")
+        rows.append({
+            "scenario": name,
+            "p95_ms": (before["p95_ms"], after["p95_ms"]),
+            "throughput": (before["throughput"], after["throughput"]),
+            "p95_ratio": p95_ratio,
+            "throughput_ratio": throughput_ratio,
+            "regression": p95_ratio > 1 + tolerance or throughput_ratio < 1 - tolerance,
+        })
+    return rows
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
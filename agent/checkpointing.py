@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+DEFAULT_MAX_THREADS = 100
+DEFAULT_THREAD_TTL = 3600.0
+
+class BoundedMemorySaver(InMemorySaver):
+    """In-memory checkpointer that only keeps recently used threads
+    
+    Each workflow run is a thread; all of its checkpoints (which include the
+    encoded page images) are dropped together once the thread has not been
+    used for ttl seconds, or when more than max_threads threads are held,
+    least recently used first.
+    """
+    
+    def __init__(
+        self,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        ttl: float = DEFAULT_THREAD_TTL,
+        clock: Callable[[], float] = time.monotonic,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        if max_threads < 1:
+            raise ValueError("max_threads must be at least 1")
+        self.max_threads = max_threads
+        self.ttl = ttl
+        self._clock = clock
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.RLock()
+    
+    def _touch(self, thread_id: str) -> None:
+        """Mark a thread as used and evict the threads beyond the limits"""
+        with self._lock:
+            now = self._clock()
+            self._last_used[thread_id] = now
+            self._last_used.move_to_end(thread_id)
+            while self._last_used:
+                oldest, last_used = next(iter(self._last_used.items()))
+                if len(self._last_used) <= self.max_threads and now - last_used <= self.ttl:
+                    break
+                self._last_used.popitem(last=False)
+                super().delete_thread(oldest)
+    
+    def thread_count(self) -> int:
+        """Number of threads currently held"""
+        with self._lock:
+            return len(self._last_used)
+    
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            last_used = self._last_used.get(thread_id)
+            if last_used is not None and self._clock() - last_used > self.ttl:
+                self._last_used.pop(thread_id)
+                super().delete_thread(thread_id)
+            result = super().get_tuple(config)
+            if result is None:
+                # Looking up an unknown thread leaves an empty entry behind
+                self.storage.pop(thread_id, None)
+            else:
+                self._touch(thread_id)
+            return result
+    
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._touch(config["configurable"]["thread_id"])
+            return result
+    
+    def put_writes(self, config, writes, task_id, task_path=""):
+        # Page branches write concurrently
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._touch(config["configurable"]["thread_id"])
+    
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._last_used.pop(thread_id, None)
+            super().delete_thread(thread_id)
+
+def create_checkpointer(policy: Optional[str] = None, data_dir: str = "data") -> Optional[BaseCheckpointSaver]:
+    """
+    Create the checkpointer configured by the environment
+    
+    Args:
+        policy: "none" (no checkpoints, for one-shot conversions), "memory" (bounded
+            by AI_CHECKPOINT_MAX_THREADS and AI_CHECKPOINT_TTL seconds) or "sqlite"
+            (on disk at AI_CHECKPOINT_DB, needs the sqlite-checkpoints extra);
+            defaults to the AI_CHECKPOINTS environment variable, then "none"
+        data_dir: Directory of the default SQLite database
+    
+    Returns:
+        The checkpointer, or None when checkpointing is off
+    """
+    policy = (policy or os.getenv("AI_CHECKPOINTS", "none")).lower()
+    
+    if policy == "none":
+        return None
+    if policy == "memory":
+        return BoundedMemorySaver(
+            max_threads=int(os.getenv("AI_CHECKPOINT_MAX_THREADS", DEFAULT_MAX_THREADS)),
+            ttl=float(os.getenv("AI_CHECKPOINT_TTL", DEFAULT_THREAD_TTL))
+        )
+    if policy == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            raise ImportError(
+                "AI_CHECKPOINTS=sqlite needs the langgraph-checkpoint-sqlite package; "
+                "install it with `pip install langgraph-checkpoint-sqlite` (the sqlite-checkpoints extra)"
+            ) from e
+        
+        db_path = Path(os.getenv("AI_CHECKPOINT_DB", Path(data_dir) / "checkpoints.db"))
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Page branches run on several threads and share the connection
+        return SqliteSaver(sqlite3.connect(db_path, check_same_thread=False))
+    
+    raise ValueError(f"Unknown checkpoint policy: {policy}")
@@ -69,11 +69,9 @@ def demonstrate_workflow():
     
     print("\nWorkflow edges:")
     # This would require accessing the graph structure
-    print("  - encode_images → analyze_current_image")
-    print("  - analyze_current_image → structure_current_analysis")
-    print("  - structure_current_analysis → check_more_images")
-    print("  - check_more_images → analyze_current_image (if more images)")
-    print("  - check_more_images → combine_analyses (if all done)")
+    print("  - encode_images → analyze_page (one parallel branch per image)")
+    print("  - analyze_page → gather_pages (results back in page order)")
+    print("  - gather_pages → combine_analyses")
     print("  - combine_analyses → validate_results")
     print("  - validate_results → END")
 
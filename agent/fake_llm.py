@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Type
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from pydantic import BaseModel, PrivateAttr
+
+# Latency distributions; latency is the mean (uniform, fixed) or median (lognormal) in seconds
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+# Words the fake transcriptions are made of, roughly one token each
+VOCABULARY = (
+    "x", "y", "=", "+", "-", "\\frac{1}{2}", "\\sqrt{x}", "f(x)", "\\int", "dx", "\\sum", "n",
+    "\\pi", "2", "3", "\\cdot", "therefore", "let", "solve", "for", "the", "equation", "so", "we", "get"
+)
+
+# Domains the backend accepts as exercise categories, and the levels the prompts ask for
+DOMAINS = (
+    "Algebra", "Geometry", "Calculus", "Statistics", "Number Theory", "Trigonometry",
+    "Linear Algebra", "Differential Equations"
+)
+LEVELS = ("Elementary", "Middle School", "High School", "College", "Advanced")
+
+class FakeLLMError(RuntimeError):
+    """Simulated model API failure"""
+    status_code = 503
+
+@dataclass(frozen=True)
+class FakeLLMConfig:
+    """Behaviour of the offline stand-in chat model"""
+    latency: float = 0.0
+    latency_spread: float = 0.0  # Half-width (uniform) or sigma of log-latency (lognormal)
+    latency_distribution: str = "fixed"
+    error_rate: float = 0.0  # Probability that a call raises FakeLLMError
+    output_tokens: int = 200  # Length of each generated transcription
+    image_tokens: int = 765  # Input tokens reported per image, as for a high-detail 1024px image
+    seed: Optional[int] = None  # Seeds latency and error draws; responses are always deterministic
+    
+    def __post_init__(self):
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported latency distribution: {self.latency_distribution}")
+        if self.latency < 0 or self.latency_spread < 0:
+            raise ValueError("latency and latency_spread must not be negative")
+        if not 0.0 <= self.error_rate <= 1.0:
+            raise ValueError("error_rate must be between 0 and 1")
+    
+    @classmethod
+    def from_env(cls) -> "FakeLLMConfig":
+        """
+        Read settings from the environment
+        
+        AI_FAKE_LATENCY, AI_FAKE_LATENCY_SPREAD, AI_FAKE_LATENCY_DISTRIBUTION
+        (fixed, uniform or lognormal), AI_FAKE_ERROR_RATE, AI_FAKE_OUTPUT_TOKENS,
+        AI_FAKE_IMAGE_TOKENS and AI_FAKE_SEED override the defaults.
+        """
+        defaults = cls()
+        seed = os.getenv("AI_FAKE_SEED")
+        return cls(
+            latency=float(os.getenv("AI_FAKE_LATENCY", defaults.latency)),
+            latency_spread=float(os.getenv("AI_FAKE_LATENCY_SPREAD", defaults.latency_spread)),
+            latency_distribution=os.getenv("AI_FAKE_LATENCY_DISTRIBUTION", defaults.latency_distribution).lower(),
+            error_rate=float(os.getenv("AI_FAKE_ERROR_RATE", defaults.error_rate)),
+            output_tokens=int(os.getenv("AI_FAKE_OUTPUT_TOKENS", defaults.output_tokens)),
+            image_tokens=int(os.getenv("AI_FAKE_IMAGE_TOKENS", defaults.image_tokens)),
+            seed=int(seed) if seed else None
+        )
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with deterministic, schema-valid answers
+    
+    Stands in for ChatOpenAI when load testing: each call sleeps for a
+    latency drawn from the configured distribution, fails with the
+    configured probability, and otherwise answers based on a hash of the
+    prompt, so the same pages always give the same exercise. JSON prompts
+    get a JSON exercise, vision prompts a transcription, and
+    with_structured_output() returns instances of the requested schema.
+    """
+    
+    config: FakeLLMConfig = FakeLLMConfig()
+    timeout: Optional[float] = None  # Calls slower than this raise TimeoutError after waiting this long
+    
+    _rng: random.Random = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.config.seed)
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+    
+    def _simulate_call(self) -> None:
+        """Wait for a simulated response time and maybe fail"""
+        config = self.config
+        with self._lock:
+            if config.latency_distribution == "uniform":
+                delay = self._rng.uniform(config.latency - config.latency_spread, config.latency + config.latency_spread)
+            elif config.latency_distribution == "lognormal" and config.latency > 0:
+                delay = self._rng.lognormvariate(0.0, config.latency_spread) * config.latency
+            else:
+                delay = config.latency
+            failed = self._rng.random() < config.error_rate
+        
+        if self.timeout is not None and delay > self.timeout:
+            time.sleep(self.timeout)
+            raise TimeoutError("Simulated request timeout")
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise FakeLLMError("Simulated model API error")
+    
+    def _prompt_digest(self, messages: List[BaseMessage]) -> bytes:
+        hasher = hashlib.sha256()
+        for message in messages:
+            hasher.update(json.dumps(message.content, sort_keys=True, default=str).encode("utf-8"))
+        return hasher.digest()
+    
+    def _text(self, digest: bytes, words: int) -> str:
+        rng = random.Random(digest)
+        return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+    
+    def _fields(self, schema: Type[BaseModel], digest: bytes) -> Dict[str, Any]:
+        """Deterministic values for every field of a schema"""
+        rng = random.Random(digest)
+        fields = {}
+        for name, field in schema.model_fields.items():
+            if field.annotation is bool:
+                fields[name] = False
+            elif field.annotation is float:
+                fields[name] = round(rng.uniform(0.6, 0.99), 2)
+            elif field.annotation is int:
+                fields[name] = rng.randint(1, 10)
+            elif name == "title":
+                fields[name] = f"Exercise {digest.hex()[:8]}"
+            elif name == "domain":
+                fields[name] = DOMAINS[digest[0] % len(DOMAINS)]
+            elif name == "level":
+                fields[name] = LEVELS[digest[1] % len(LEVELS)]
+            else:
+                fields[name] = self._text(digest + name.encode("utf-8"), max(self.config.output_tokens // 4, 1))
+        return fields
+    
+    def _usage(self, messages: List[BaseMessage], output: str) -> Dict[str, int]:
+        """Token counts estimated at four characters per token, plus a fixed cost per image"""
+        input_tokens = 0
+        for message in messages:
+            parts = message.content if isinstance(message.content, list) else [message.content]
+            for part in parts:
+                if isinstance(part, dict) and part.get("type") == "image_url":
+                    input_tokens += self.config.image_tokens
+                else:
+                    input_tokens += len(str(part.get("text", "") if isinstance(part, dict) else part)) // 4
+        output_tokens = len(output) // 4
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        self._simulate_call()
+        
+        digest = self._prompt_digest(messages)
+        prompt = "\n".join(str(message.content) for message in messages)
+        if "JSON" in prompt:
+            # Structuring and combining prompts expect a PageAnalysis-shaped object
+            from agent.math_agent_v0 import PageAnalysis
+            content = json.dumps(self._fields(PageAnalysis, digest), ensure_ascii=False)
+        else:
+            content = self._text(digest, self.config.output_tokens)
+        
+        message = AIMessage(content=content, usage_metadata=self._usage(messages, content))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def with_structured_output(self, schema: Type[BaseModel], **kwargs) -> Runnable:
+        """Return instances of schema instead of messages"""
+        def extract(prompt) -> BaseModel:
+            messages = self._convert_input(prompt).to_messages()
+            # A regular call, so latency, failures and token usage are reported as for any other
+            self.invoke(messages)
+            return schema.model_validate(self._fields(schema, self._prompt_digest(messages)))
+        
+        return RunnableLambda(extract)
@@ -0,0 +1,145 @@
+import io
+import os
+from dataclasses import dataclass
+from typing import Tuple
+
+from PIL import Image, ImageOps
+
+# Output formats supported by the vision API, with their MIME types
+OUTPUT_FORMATS = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+# Formats the vision API accepts as uploaded, when preprocessing is off
+PASSTHROUGH_FORMATS = ("JPEG", "PNG", "GIF", "WEBP")
+
+@dataclass(frozen=True)
+class ImagePreprocessingConfig:
+    """Settings for preparing page images before they are sent to the vision model"""
+    enabled: bool = True
+    max_edge: int = 1600  # Longest side in pixels; the API downsamples larger images anyway
+    grayscale: bool = True
+    crop: bool = True
+    crop_threshold: int = 40  # Pixels at least this much darker than white count as content
+    crop_margin: float = 0.02  # Margin kept around the content, as a fraction of the image size
+    output_format: str = "JPEG"
+    quality: int = 85
+    
+    def __post_init__(self):
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {self.output_format}")
+        if self.max_edge < 1:
+            raise ValueError("max_edge must be at least 1")
+    
+    @property
+    def fingerprint(self) -> str:
+        """Compact description of the settings, used in cache keys"""
+        if not self.enabled:
+            return "raw"
+        return (
+            f"{self.max_edge}:{int(self.grayscale)}:{int(self.crop)}:{self.crop_threshold}:"
+            f"{self.crop_margin}:{self.output_format}:{self.quality}"
+        )
+    
+    @classmethod
+    def from_env(cls) -> "ImagePreprocessingConfig":
+        """
+        Read settings from the environment
+        
+        AI_IMAGE_PREPROCESSING ("true" by default), AI_IMAGE_MAX_EDGE,
+        AI_IMAGE_GRAYSCALE, AI_IMAGE_CROP, AI_IMAGE_FORMAT (JPEG or WEBP)
+        and AI_IMAGE_QUALITY override the defaults.
+        """
+        def flag(variable: str, default: bool) -> bool:
+            value = os.getenv(variable)
+            if value is None:
+                return default
+            return value.lower() not in ("0", "false", "no")
+        
+        defaults = cls()
+        return cls(
+            enabled=flag("AI_IMAGE_PREPROCESSING", defaults.enabled),
+            max_edge=int(os.getenv("AI_IMAGE_MAX_EDGE", defaults.max_edge)),
+            grayscale=flag("AI_IMAGE_GRAYSCALE", defaults.grayscale),
+            crop=flag("AI_IMAGE_CROP", defaults.crop),
+            output_format=os.getenv("AI_IMAGE_FORMAT", defaults.output_format).upper(),
+            quality=int(os.getenv("AI_IMAGE_QUALITY", defaults.quality))
+        )
+
+def _content_box(image: Image.Image, threshold: int, margin: float) -> Tuple[int, int, int, int]:
+    """Find the bounding box of the non-background content, with a margin"""
+    gray = image if image.mode == "L" else image.convert("L")
+    # Ink becomes bright and paper dark, so getbbox() finds the written area
+    mask = ImageOps.invert(gray).point(lambda value: 255 if value >= threshold else 0)
+    box = mask.getbbox()
+    if box is None:
+        return (0, 0, image.width, image.height)
+    
+    pad_x = int(image.width * margin)
+    pad_y = int(image.height * margin)
+    left, top, right, bottom = box
+    return (
+        max(left - pad_x, 0),
+        max(top - pad_y, 0),
+        min(right + pad_x, image.width),
+        min(bottom + pad_y, image.height),
+    )
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Composite transparent images onto white paper"""
+    if image.mode not in ("RGBA", "LA", "PA") and "transparency" not in image.info:
+        return image
+    # Converting directly would turn transparent areas black, hiding dark ink and defeating the crop
+    rgba = image.convert("RGBA")
+    background = Image.new("RGBA", rgba.size, "white")
+    return Image.alpha_composite(background, rgba).convert("RGB")
+
+def preprocess_image(image_bytes: bytes, config: ImagePreprocessingConfig = ImagePreprocessingConfig()) -> Tuple[bytes, str]:
+    """
+    Prepare an image for the vision model
+    
+    Applies the EXIF orientation, flattens transparency onto white,
+    converts to grayscale, crops to the written content, downscales so the
+    longest side is at most max_edge, and re-encodes to the configured
+    format. When preprocessing is disabled, images are passed through
+    unchanged unless the vision API does not accept their format (e.g.
+    TIFF or BMP), in which case they are re-encoded as JPEG.
+    
+    Args:
+        image_bytes: Original image file contents (any format Pillow reads)
+        config: Preprocessing settings
+    
+    Returns:
+        Tuple of (encoded image bytes, MIME type)
+    """
+    with Image.open(io.BytesIO(image_bytes)) as original:
+        if not config.enabled:
+            if original.format in PASSTHROUGH_FORMATS:
+                return image_bytes, Image.MIME[original.format]
+            output = io.BytesIO()
+            image = _flatten(original)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(output, format="JPEG", quality=config.quality)
+            return output.getvalue(), OUTPUT_FORMATS["JPEG"]
+        
+        image = _flatten(ImageOps.exif_transpose(original))
+        
+        if config.grayscale:
+            image = image.convert("L")
+        elif image.mode not in ("RGB", "L"):
+            # Drop alpha and palettes, which JPEG cannot store
+            image = image.convert("RGB")
+        
+        if config.crop:
+            box = _content_box(image, config.crop_threshold, config.crop_margin)
+            if box != (0, 0, image.width, image.height):
+                image = image.crop(box)
+        
+        if max(image.size) > config.max_edge:
+            image.thumbnail((config.max_edge, config.max_edge), Image.Resampling.LANCZOS)
+        
+        output = io.BytesIO()
+        image.save(output, format=config.output_format, quality=config.quality, optimize=True)
+        return output.getvalue(), OUTPUT_FORMATS[config.output_format]
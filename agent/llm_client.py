@@ -0,0 +1,295 @@
+"""
+Shared client layer for model API calls
+
+Every model call of every conversion goes through one LLMClient, which
+spaces requests with a token bucket, retries transient failures (429,
+5xx, timeouts, connection errors) with jittered exponential backoff that
+honors Retry-After, and stops calling a provider that keeps failing until
+it had time to recover. Settings are read from the environment:
+    
+    AI_LLM_RATE                 requests per second across the process (default: unlimited)
+    AI_LLM_BURST                requests allowed at once after idling (default: max(1, rate))
+    AI_LLM_MAX_ATTEMPTS         attempts per call, including the first (default 4)
+    AI_LLM_BACKOFF_BASE         first backoff in seconds, doubled per attempt (default 0.5)
+    AI_LLM_BACKOFF_MAX          longest backoff in seconds (default 30)
+    AI_LLM_TIMEOUT              timeout of one request in seconds (default 60)
+    AI_LLM_BREAKER_THRESHOLD    consecutive failures that open the circuit (default 5)
+    AI_LLM_BREAKER_RESET        seconds the circuit stays open (default 30)
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from agent.metrics import record_llm_call, record_retry, record_tokens
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+class LLMUnavailableError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+@dataclass(frozen=True)
+class LLMClientConfig:
+    """Rate limiting, retry and circuit breaker settings"""
+    rate: Optional[float] = None  # Requests per second; None for no limit
+    burst: Optional[int] = None  # Bucket capacity; defaults to max(1, rate)
+    max_attempts: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0  # Longest wait between attempts, also caps the provider's Retry-After
+    timeout: float = 60.0
+    breaker_threshold: int = 5
+    breaker_reset: float = 30.0
+    
+    def __post_init__(self):
+        if self.rate is not None and self.rate <= 0:
+            raise ValueError("rate must be positive")
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if self.breaker_threshold < 1:
+            raise ValueError("breaker_threshold must be at least 1")
+    
+    @classmethod
+    def from_env(cls) -> "LLMClientConfig":
+        """Read settings from the AI_LLM_* environment variables"""
+        defaults = cls()
+        rate = os.getenv("AI_LLM_RATE")
+        burst = os.getenv("AI_LLM_BURST")
+        return cls(
+            rate=float(rate) if rate else None,
+            burst=int(burst) if burst else None,
+            max_attempts=int(os.getenv("AI_LLM_MAX_ATTEMPTS", defaults.max_attempts)),
+            backoff_base=float(os.getenv("AI_LLM_BACKOFF_BASE", defaults.backoff_base)),
+            backoff_max=float(os.getenv("AI_LLM_BACKOFF_MAX", defaults.backoff_max)),
+            timeout=float(os.getenv("AI_LLM_TIMEOUT", defaults.timeout)),
+            breaker_threshold=int(os.getenv("AI_LLM_BREAKER_THRESHOLD", defaults.breaker_threshold)),
+            breaker_reset=float(os.getenv("AI_LLM_BREAKER_RESET", defaults.breaker_reset))
+        )
+
+class TokenBucket:
+    """Thread-safe token bucket spacing requests to a steady rate"""
+    
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Take one token, waiting until one is available"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            self._sleep(wait)
+    
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for a while, e.g. after the provider asked to retry later"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+class CircuitBreaker:
+    """Fails fast after repeated provider failures, then lets one trial call through"""
+    
+    def __init__(self, threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half-open"""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self._clock() - self._opened_at >= self.reset_timeout else "open"
+    
+    def before_call(self) -> bool:
+        """
+        Raise LLMUnavailableError unless a call may go through
+        
+        Returns:
+            Whether the call is the trial call of a half-open breaker; the
+            caller must then call release_trial once it is done
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if self._clock() - self._opened_at < self.reset_timeout or self._trial_running:
+                raise LLMUnavailableError("Model provider unavailable, not calling it for now")
+            self._trial_running = True
+            return True
+    
+    def release_trial(self) -> None:
+        """Free the trial slot, whatever the outcome of the trial call was"""
+        with self._lock:
+            self._trial_running = False
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is a transient provider failure"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    # Connection errors and timeouts carry no status
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError", "ConnectTimeout", "ReadTimeout"
+    )
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked to wait, from the Retry-After headers of the error's response"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        # HTTP dates are rare for model APIs; fall back to backoff
+        return None
+    return None
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Adds the token usage of every model response to the metrics of the running node"""
+    
+    def on_llm_end(self, response, **kwargs) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    record_tokens(usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+class LLMClient:
+    """Shared gateway for model calls (see the module docstring)"""
+    
+    def __init__(
+        self,
+        config: LLMClientConfig = LLMClientConfig(),
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        rng: Optional[random.Random] = None
+    ):
+        self.config = config
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self.bucket = None
+        if config.rate is not None:
+            burst = config.burst or max(1, int(config.rate))
+            self.bucket = TokenBucket(config.rate, burst, clock=clock, sleep=sleep)
+        self.breaker = CircuitBreaker(config.breaker_threshold, config.breaker_reset, clock=clock)
+    
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number attempt (1-based)"""
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * 2 ** (attempt - 1))
+        return self._rng.uniform(0, ceiling)
+    
+    def invoke(self, runnable: Any, input: Any) -> Any:
+        """
+        Invoke a model, prompt chain or other runnable with rate limiting and retries
+        
+        Raises:
+            LLMUnavailableError: If the circuit breaker is open
+            Exception: The last error once retries are exhausted, or any
+                non-transient error (e.g. invalid output) right away
+        """
+        # Token usage is reported through callbacks, also by the models inside chains
+        config = {"callbacks": [UsageCallbackHandler()]}
+        for attempt in range(1, self.config.max_attempts + 1):
+            trial = self.breaker.before_call()
+            try:
+                if self.bucket is not None:
+                    self.bucket.acquire()
+                
+                record_llm_call()
+                try:
+                    result = runnable.invoke(input, config=config)
+                except Exception as e:
+                    if not is_retryable(e):
+                        # The provider answered; the problem is the request or the output
+                        self.breaker.record_success()
+                        raise
+                    
+                    throttled = _status_code(e) == 429
+                    # A throttled trial re-opens the breaker, giving the provider the full reset timeout
+                    if not throttled or trial:
+                        self.breaker.record_failure()
+                    if attempt == self.config.max_attempts:
+                        raise
+                    
+                    delay = retry_after(e)
+                    if delay is None:
+                        delay = self._backoff(attempt)
+                    else:
+                        # Capped so a huge Retry-After cannot park a worker thread indefinitely
+                        delay = min(delay, self.config.backoff_max)
+                        if throttled and self.bucket is not None:
+                            # Every caller waits, not just this one
+                            self.bucket.pause(delay)
+                    logger.warning(f"Model call failed ({e}), retry {attempt} of {self.config.max_attempts - 1} in {delay:.2f}s")
+                    record_retry()
+                    self._sleep(delay)
+                    continue
+                
+                self.breaker.record_success()
+                return result
+            finally:
+                if trial:
+                    self.breaker.release_trial()
+
+_llm_client: Optional[LLMClient] = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client() -> LLMClient:
+    """Get the process-wide client shared by all analyzers, creating it on first use"""
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            _llm_client = LLMClient(LLMClientConfig.from_env())
+        return _llm_client
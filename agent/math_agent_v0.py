@@ -1,5 +1,8 @@
 import os
-from typing import Dict, Any, Optional, TypedDict, List
+import json
+import hashlib
+import logging
+from typing import Annotated, BinaryIO, Callable, Dict, Any, Iterator, Optional, Tuple, TypedDict, List, Union
 from dataclasses import dataclass
 import base64
 
@@ -7,13 +10,32 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, Field, ValidationError
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Send
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from dotenv import load_dotenv
 
+from agent.image_preprocessing import ImagePreprocessingConfig, preprocess_image
+from agent.checkpointing import create_checkpointer
+from agent.llm_client import LLMClient, get_llm_client
+from agent.metrics import ConversionMetrics, node_scope, record_image_bytes
+
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever a prompt or the PageAnalysis schema changes so cached results are not reused
+PROMPT_VERSION = "2"
+
+# Last item yielded by MathExerciseAnalyzer.stream_exercise, carrying the final exercise
+RESULT_EVENT = "result"
+
+# An image given to the analyzer: a file path, its contents, or a readable binary file object
+ImageSource = Union[str, os.PathLike, bytes, BinaryIO]
+
 @dataclass
 class MathExercise:
     """Data class to represent a mathematical exercise"""
@@ -24,110 +46,236 @@ class MathExercise:
     level: str
     confidence_score: float
     image_paths: List[str]  # Changed from single image_path to list of image_paths
+    metrics: Optional[Dict[str, Any]] = None  # Time, tokens and cost per workflow node (ConversionMetrics.snapshot())
+
+class PageAnalysis(BaseModel):
+    """Structured analysis of a single page, returned directly by the vision model"""
+    title: str = Field(description="Descriptive title for the exercise")
+    statement: str = Field(description="Problem statement, transcribed exactly, with LaTeX notation")
+    response: str = Field(description="Handwritten solution or answer, transcribed exactly, with LaTeX notation")
+    domain: str = Field(description="Mathematical domain, e.g. Algebra, Calculus, Geometry")
+    level: str = Field(description="Difficulty level: Elementary, Middle School, High School, College or Advanced")
+    confidence_score: float = Field(description="Confidence in the transcription, between 0 and 1")
+    is_continuation: bool = Field(description="Whether this page continues an exercise from a previous page")
+
+def create_chat_model(
+    backend: Optional[str] = None,
+    model_name: str = "gpt-4o",
+    temperature: float = 0.0,
+    timeout: Optional[float] = None
+):
+    """
+    Create the chat model used for the analysis
+    
+    Args:
+        backend: "openai" or "fake" (offline stand-in for load tests, configured by
+            FakeLLMConfig.from_env()); defaults to the AI_LLM_BACKEND environment variable
+        model_name: OpenAI model to use
+        temperature: Temperature for model responses
+        timeout: Timeout of one request in seconds
+    """
+    backend = (backend or os.getenv("AI_LLM_BACKEND", "openai")).lower()
+    
+    if backend == "openai":
+        return ChatOpenAI(
+            model=model_name,
+            temperature=temperature,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=timeout,
+            max_retries=0  # Retries are done by LLMClient
+        )
+    if backend == "fake":
+        from agent.fake_llm import FakeChatModel, FakeLLMConfig
+        return FakeChatModel(config=FakeLLMConfig.from_env(), timeout=timeout)
+    
+    raise ValueError(f"Unknown LLM backend: {backend}")
+
+def merge_page_results(existing: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reducer for page results: one entry per page, the latest result for a page wins"""
+    merged = {result["page_index"]: result for result in existing or []}
+    merged.update((result["page_index"], result) for result in new or [])
+    return [merged[index] for index in sorted(merged)]
 
 class AnalysisState(TypedDict):
     """State for the analysis workflow"""
     image_paths: List[str]  # Changed from single image_path to list
+    image_bytes: List[Optional[bytes]]  # Contents of in-memory images; None for images read from image_paths
     base64_images: List[str]  # Changed from single base64_image to list
+    image_digests: List[str]  # SHA-256 of each image's bytes, used as page cache keys
+    image_mime_types: List[str]  # MIME type of each encoded image
     raw_analyses: List[str]  # Changed from single raw_analysis to list
     structured_analyses: List[Dict[str, Any]]  # Changed from single structured_analysis to list
     combined_analysis: Optional[Dict[str, Any]]  # New field for combined analysis
     exercise: Optional[MathExercise]
     error: Optional[str]
-    current_image_index: int  # New field to track current image being processed
+    page_results: Annotated[List[Dict[str, Any]], merge_page_results]  # Per-page results from the parallel branches
+
+class PageTask(TypedDict):
+    """Input of one parallel page-analysis branch"""
+    page_index: int
+    page_count: int
+    base64_image: str
+    image_digest: str
+    mime_type: str
 
 class MathExerciseAnalyzer:
     """Agent for analyzing handwritten mathematical exercises using LangGraph"""
     
-    def __init__(self, model_name: str = "gpt-4o", temperature: float = 0.0):
+    def __init__(
+        self,
+        model_name: str = "gpt-4o",
+        temperature: float = 0.0,
+        max_concurrency: int = 4,
+        structured_output: bool = True,
+        page_cache: Optional[Any] = None,
+        preprocessing: Optional[ImagePreprocessingConfig] = None,
+        llm_backend: Optional[str] = None,
+        checkpointer: Union[str, BaseCheckpointSaver, None] = None,
+        llm_client: Optional[LLMClient] = None
+    ):
         """
         Initialize the MathExerciseAnalyzer
         
         Args:
             model_name: OpenAI model to use for analysis
             temperature: Temperature for model responses
+            max_concurrency: Maximum number of pages analyzed at the same time
+            structured_output: Have the vision call return PageAnalysis directly (one call
+                per page), falling back to analyze + structure when its output is invalid
+            page_cache: Optional cache with get(key)/put(key, value) reusing the analysis
+                of pages already seen with the same model, temperature and prompts
+            preprocessing: How images are oriented, cropped, downscaled and re-encoded
+                before the vision call (defaults to ImagePreprocessingConfig())
+            llm_backend: "openai" or "fake", see create_chat_model (defaults to AI_LLM_BACKEND)
+            checkpointer: Checkpointer for workflow state, or a policy name for
+                create_checkpointer ("none", "memory" or "sqlite"; defaults to
+                AI_CHECKPOINTS, which is "none" when unset)
+            llm_client: Rate limiting and retry layer for model calls (defaults to the
+                process-wide get_llm_client(), shared by all conversions)
         """
-        self.llm = ChatOpenAI(
-            model=model_name,
-            temperature=temperature,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.structured_output = structured_output
+        self.page_cache = page_cache
+        self.preprocessing = preprocessing or ImagePreprocessingConfig()
+        self.model_name = model_name
+        self.temperature = temperature
+        
+        self.llm_backend = (llm_backend or os.getenv("AI_LLM_BACKEND", "openai")).lower()
+        self.llm_client = llm_client or get_llm_client()
+        self.llm = create_chat_model(self.llm_backend, model_name, temperature, timeout=self.llm_client.config.timeout)
         
-        # Initialize memory saver for state management
-        self.memory = MemorySaver()
+        # One-shot conversions need no checkpoints; kept ones are bounded or on disk
+        if checkpointer is None or isinstance(checkpointer, str):
+            checkpointer = create_checkpointer(checkpointer)
+        self.checkpointer = checkpointer
         
         # Create the workflow graph
         self.workflow = self._create_workflow()
-        
+    
     def _create_workflow(self) -> StateGraph:
         """Create the LangGraph workflow for mathematical exercise analysis"""
         
         # Define the workflow nodes
         workflow = StateGraph(AnalysisState)
         
-        # Add nodes
-        workflow.add_node("encode_images", self._encode_images_node)
-        workflow.add_node("analyze_current_image", self._analyze_current_image_node)
-        workflow.add_node("structure_current_analysis", self._structure_current_analysis_node)
-        workflow.add_node("check_more_images", self._check_more_images_node)
-        workflow.add_node("combine_analyses", self._combine_analyses_node)
-        workflow.add_node("validate_results", self._validate_results_node)
+        # Add nodes; each one is timed and charged for the model calls it makes
+        workflow.add_node("encode_images", self._instrumented("encode_images", self._encode_images_node))
+        workflow.add_node("analyze_page", self._instrumented("analyze_page", self._analyze_page_node), input_schema=PageTask)
+        workflow.add_node("gather_pages", self._instrumented("gather_pages", self._gather_pages_node))
+        workflow.add_node("combine_analyses", self._instrumented("combine_analyses", self._combine_analyses_node))
+        workflow.add_node("validate_results", self._instrumented("validate_results", self._validate_results_node))
         
         # Define the workflow edges
         workflow.set_entry_point("encode_images")
-        workflow.add_edge("encode_images", "analyze_current_image")
-        workflow.add_edge("analyze_current_image", "structure_current_analysis")
-        workflow.add_edge("structure_current_analysis", "check_more_images")
-        workflow.add_conditional_edges(
-            "check_more_images",
-            self._route_after_check,
-            {
-                "continue": "analyze_current_image",
-                "combine": "combine_analyses"
-            }
-        )
-        workflow.add_edge("combine_analyses", "validate_results")
+        # Every page is analyzed in its own branch; branches run concurrently
+        workflow.add_conditional_edges("encode_images", self._fan_out_pages, ["analyze_page", "gather_pages", END])
+        workflow.add_edge("analyze_page", "gather_pages")
+        # A failed step ends the run instead of passing through the remaining nodes
+        workflow.add_conditional_edges("gather_pages", self._unless_failed("combine_analyses"), ["combine_analyses", END])
+        workflow.add_conditional_edges("combine_analyses", self._unless_failed("validate_results"), ["validate_results", END])
         workflow.add_edge("validate_results", END)
         
-        return workflow.compile(checkpointer=self.memory)
+        return workflow.compile(checkpointer=self.checkpointer)
+    
+    def _instrumented(self, node_name: str, node: Callable[[Any], Any]) -> Callable[[Any, RunnableConfig], Any]:
+        """Run a node inside a metrics scope, adding to the run's ConversionMetrics"""
+        def run(state, config: RunnableConfig):
+            conversion = config.get("configurable", {}).get("conversion_metrics")
+            with node_scope(node_name, conversion):
+                return node(state)
+        return run
+    
+    def _unless_failed(self, next_node: str) -> Callable[[AnalysisState], str]:
+        """Route to next_node, or to END once the state holds an error"""
+        def route(state: AnalysisState) -> str:
+            return END if state["error"] is not None else next_node
+        return route
     
     def _encode_images_node(self, state: AnalysisState) -> AnalysisState:
-        """Encode all images to base64 for API transmission"""
+        """Preprocess all images and encode them to base64 for API transmission"""
         try:
             base64_images = []
-            for image_path in state["image_paths"]:
-                with open(image_path, "rb") as image_file:
-                    base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-                    base64_images.append(base64_image)
+            image_digests = []
+            image_mime_types = []
+            for image_path, image_bytes in zip(state["image_paths"], state["image_bytes"]):
+                if image_bytes is None:
+                    with open(image_path, "rb") as image_file:
+                        image_bytes = image_file.read()
+                # Cache keys use the original bytes; preprocessing settings are part of the namespace
+                image_digests.append(hashlib.sha256(image_bytes).hexdigest())
+                encoded_bytes, mime_type = preprocess_image(image_bytes, self.preprocessing)
+                base64_images.append(base64.b64encode(encoded_bytes).decode('utf-8'))
+                image_mime_types.append(mime_type)
             
             state["base64_images"] = base64_images
-            state["current_image_index"] = 0
+            state["image_digests"] = image_digests
+            state["image_mime_types"] = image_mime_types
             state["raw_analyses"] = []
             state["structured_analyses"] = []
-            
+        
         except Exception as e:
             state["error"] = f"Failed to encode images: {str(e)}"
         
         return state
     
-    def _analyze_current_image_node(self, state: AnalysisState) -> AnalysisState:
-        """Analyze the current image using OpenAI vision capabilities"""
+    def _fan_out_pages(self, state: AnalysisState) -> Union[str, List[Send]]:
+        """Start one analysis branch per encoded page that has no result yet"""
         if state["error"] is not None:
-            return state
-            
-        current_index = state["current_image_index"]
-        base64_image = state["base64_images"][current_index]
+            return END
+        if not state.get("base64_images"):
+            return "gather_pages"
         
+        # Pages completed by an earlier, failed run are reused as they are
+        completed = {result["page_index"] for result in state.get("page_results", []) if result["error"] is None}
+        page_count = len(state["base64_images"])
+        sends = [
+            Send("analyze_page", {
+                "page_index": index,
+                "page_count": page_count,
+                "base64_image": base64_image,
+                "image_digest": state["image_digests"][index],
+                "mime_type": state["image_mime_types"][index]
+            })
+            for index, base64_image in enumerate(state["base64_images"])
+            if index not in completed
+        ]
+        return sends or "gather_pages"
+    
+    def _page_messages(self, task: PageTask) -> list:
+        """Build the vision prompt for one page image"""
+        record_image_bytes(len(task["base64_image"]))
         system_prompt = """You are an expert mathematical exercise analyzer with OCR capabilities. Your task is to transcribe EXACTLY what you see in the handwritten mathematical exercise, converting mathematical notation to LaTeX format.
-
+            
             Extract the following information:
-
+            
             1. **Title**: A descriptive title for the exercise (e.g., "Solving Quadratic Equations", "Integration by Parts", "Geometry Problem with Circles")
             2. **Statement**: The mathematical problem or question being asked (transcribe exactly as written)
             3. **Response**: The handwritten solution or answer provided (transcribe exactly as written)
             4. **Domain**: The mathematical domain (Algebra, Calculus, Geometry, Trigonometry, Statistics, etc.)
             5. **Level**: The difficulty level (Elementary, Middle School, High School, College, Advanced)
-
+            
             CRITICAL GUIDELINES:
             - **OCR-like Transcription**: Transcribe ONLY what is visible in the image, exactly as written
             - **LaTeX Integration**: Convert ALL mathematical notation to proper LaTeX format
@@ -135,43 +283,49 @@ class MathExerciseAnalyzer:
             - **Maintain Structure**: Keep the original layout and flow of the exercise
             - **Confidence Assessment**: Provide confidence scores based on clarity of handwriting
             - **Page Continuity**: Note if this appears to be a continuation from a previous page
-
+            
             Return your analysis in a clear, structured format with proper LaTeX notation."""
-
-        try:
-            message = HumanMessage(
-                content=[
-                    {
-                        "type": "text",
-                        "text": f"Please analyze this handwritten mathematical exercise (page {current_index + 1} of {len(state['base64_images'])}). Extract the statement, response, domain, and level."
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
+        
+        message = HumanMessage(
+            content=[
+                {
+                    "type": "text",
+                    "text": f"Please analyze this handwritten mathematical exercise (page {task['page_index'] + 1} of {task['page_count']}). Extract the statement, response, domain, and level."
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{task['mime_type']};base64,{task['base64_image']}"
                     }
-                ]
-            )
-            
-            response = self.llm.invoke([SystemMessage(content=system_prompt), message])
-            state["raw_analyses"].append(response.content)
-            
-        except Exception as e:
-            state["error"] = f"Failed to analyze image {current_index + 1}: {str(e)}"
+                }
+            ]
+        )
         
-        return state
+        return [SystemMessage(content=system_prompt), message]
     
-    def _structure_current_analysis_node(self, state: AnalysisState) -> AnalysisState:
-        """Structure the raw analysis of the current image into a structured format"""
-        if state["error"] is not None or "raw_analyses" not in state:
-            return state
-            
-        current_index = state["current_image_index"]
-        raw_analysis = state["raw_analyses"][current_index]
+    def _analyze_image(self, task: PageTask) -> str:
+        """Analyze one page image using OpenAI vision capabilities"""
+        response = self.llm_client.invoke(self.llm, self._page_messages(task))
+        return response.content
+    
+    def _extract_page_analysis(self, task: PageTask) -> Dict[str, Any]:
+        """Analyze one page image straight into the PageAnalysis schema with a single call"""
+        structured_llm = self.llm.with_structured_output(PageAnalysis)
+        analysis = self.llm_client.invoke(structured_llm, self._page_messages(task))
+        if analysis is None:
+            raise ValueError("model returned no structured output")
         
+        analysis = PageAnalysis.model_validate(analysis)
+        if not analysis.statement.strip():
+            raise ValueError("statement is empty")
+        if not 0.0 <= analysis.confidence_score <= 1.0:
+            raise ValueError(f"confidence_score {analysis.confidence_score} is outside [0, 1]")
+        return analysis.model_dump()
+    
+    def _structure_analysis(self, raw_analysis: str) -> Dict[str, Any]:
+        """Structure the raw analysis of one page into a structured format"""
         structure_prompt = """Extract the following information from the analysis and return it as JSON with proper LaTeX notation:
-
+        
         {{
             "title": "descriptive title for the exercise",
             "statement": "extracted problem statement with LaTeX notation",
@@ -181,52 +335,98 @@ class MathExerciseAnalyzer:
             "confidence_score": score between 0 and 1,
             "is_continuation": boolean indicating if this is a continuation from previous page
         }}
-
+        
         IMPORTANT: Ensure all mathematical expressions use proper LaTeX syntax.
         Analysis text:
         {analysis}"""
-
+        
+        prompt = ChatPromptTemplate.from_template(structure_prompt)
+        chain = prompt | self.llm | JsonOutputParser()
+        return self.llm_client.invoke(chain, {"analysis": raw_analysis})
+    
+    @property
+    def cache_namespace(self) -> str:
+        """Settings that shape analysis results; cached results are only reused when they match"""
+        # Results of other backends are kept apart from real model answers
+        model = self.model_name if self.llm_backend == "openai" else f"{self.llm_backend}:{self.model_name}"
+        return f"{model}|{self.temperature}|{PROMPT_VERSION}|{self.preprocessing.fingerprint}"
+    
+    def _page_cache_key(self, task: PageTask) -> str:
+        """Cache key of a page: its image hash and the analyzer settings"""
+        # Imported here: page caches come from the backend, which imports this module
+        from agent.backend.services.conversion_cache import cache_key
+        
+        # The position is left out so a page is reused when it shows up in another upload
+        return cache_key("page", self.cache_namespace, [task["image_digest"]])
+    
+    def _analyze_page_node(self, task: PageTask) -> Dict[str, Any]:
+        """Analyze and structure a single page (runs in parallel with the other pages)"""
+        page_index = task["page_index"]
+        
+        cache_key = None
+        if self.page_cache is not None:
+            cache_key = self._page_cache_key(task)
+            cached = self.page_cache.get(cache_key)
+            if cached is not None:
+                return {"page_results": [dict(cached, page_index=page_index)]}
+        
+        result = self._analyze_page(task)
+        if cache_key is not None and result["error"] is None:
+            self.page_cache.put(cache_key, result)
+        return {"page_results": [result]}
+    
+    def _analyze_page(self, task: PageTask) -> Dict[str, Any]:
+        """Run the model calls for one page and return its page result"""
+        page_index = task["page_index"]
+        result = {"page_index": page_index, "raw_analysis": None, "structured_analysis": None, "error": None}
+        
+        if self.structured_output:
+            try:
+                structured = self._extract_page_analysis(task)
+                result["raw_analysis"] = json.dumps(structured, ensure_ascii=False)
+                result["structured_analysis"] = structured
+                return result
+            except (ValueError, ValidationError) as e:
+                # Invalid one-shot output: fall back to the analyze + structure round-trips
+                logger.warning(f"Structured extraction failed for image {page_index + 1}, falling back: {e}")
+            except Exception as e:
+                # Provider errors (retries exhausted, circuit open) would only fail again in the fallback
+                result["error"] = f"Failed to analyze image {page_index + 1}: {str(e)}"
+                return result
+        
         try:
-            prompt = ChatPromptTemplate.from_template(structure_prompt)
-            chain = prompt | self.llm | JsonOutputParser()
-            
-            structured = chain.invoke({"analysis": raw_analysis})
-            state["structured_analyses"].append(structured)
-            
+            result["raw_analysis"] = self._analyze_image(task)
         except Exception as e:
-            state["error"] = f"Failed to structure analysis for image {current_index + 1}: {str(e)}"
+            result["error"] = f"Failed to analyze image {page_index + 1}: {str(e)}"
+            return result
         
-        return state
-    
-    def _check_more_images_node(self, state: AnalysisState) -> AnalysisState:
-        """Check if there are more images to process"""
-        current_index = state["current_image_index"]
-        total_images = len(state["image_paths"])
-        
-        if current_index + 1 < total_images:
-            # Move to next image
-            state["current_image_index"] = current_index + 1
-        else:
-            # All images processed, ready to combine
-            pass
+        try:
+            result["structured_analysis"] = self._structure_analysis(result["raw_analysis"])
+        except Exception as e:
+            result["error"] = f"Failed to structure analysis for image {page_index + 1}: {str(e)}"
         
-        return state
+        return result
     
-    def _route_after_check(self, state: AnalysisState) -> str:
-        """Route to next step based on whether more images need processing"""
-        current_index = state["current_image_index"]
-        total_images = len(state["image_paths"])
-        
-        if current_index + 1 < total_images:
-            return "continue"
-        else:
-            return "combine"
+    def _gather_pages_node(self, state: AnalysisState) -> Dict[str, Any]:
+        """Collect the page branches back into page order"""
+        if state["error"] is not None:
+            return {}
+        
+        results = state.get("page_results", [])
+        for result in results:
+            if result["error"] is not None:
+                return {"error": result["error"]}
+        
+        return {
+            "raw_analyses": [result["raw_analysis"] for result in results],
+            "structured_analyses": [result["structured_analysis"] for result in results],
+        }
     
     def _combine_analyses_node(self, state: AnalysisState) -> AnalysisState:
         """Combine analyses from multiple images into a single coherent exercise"""
         if state["error"] is not None or "structured_analyses" not in state:
             return state
-            
+        
         try:
             analyses = state["structured_analyses"]
             
@@ -237,7 +437,7 @@ class MathExerciseAnalyzer:
                 # Multiple images, need to combine intelligently
                 combine_prompt = """You are an expert at combining mathematical exercise analyses from multiple pages. 
                 Given analyses from multiple pages of the same exercise, create a unified analysis with proper LaTeX notation.
-
+                
                 Guidelines:
                 - If the first page contains the problem statement, use that for the title and statement
                 - If subsequent pages contain solutions, combine them into a complete response
@@ -246,7 +446,7 @@ class MathExerciseAnalyzer:
                 - Ensure the final statement and response are coherent and complete
                 - Preserve all LaTeX notation from individual analyses
                 - Create a descriptive title that captures the essence of the exercise
-
+                
                 Return the combined analysis as JSON:
                 {{
                     "title": "descriptive title for the complete exercise",
@@ -256,18 +456,18 @@ class MathExerciseAnalyzer:
                     "level": "difficulty level", 
                     "confidence_score": overall score between 0 and 1
                 }}
-
+                
                 IMPORTANT: Maintain all LaTeX syntax and mathematical notation from the original analyses.
                 Individual analyses:
                 {analyses}"""
-
+                
                 prompt = ChatPromptTemplate.from_template(combine_prompt)
                 chain = prompt | self.llm | JsonOutputParser()
                 
-                combined = chain.invoke({"analyses": analyses})
+                combined = self.llm_client.invoke(chain, {"analyses": analyses})
             
             state["combined_analysis"] = combined
-            
+        
         except Exception as e:
             state["error"] = f"Failed to combine analyses: {str(e)}"
         
@@ -277,7 +477,7 @@ class MathExerciseAnalyzer:
         """Validate and create the final MathExercise object"""
         if state["error"] is not None or "combined_analysis" not in state:
             return state
-            
+        
         try:
             analysis = state["combined_analysis"]
             
@@ -305,25 +505,44 @@ class MathExerciseAnalyzer:
             )
             
             state["exercise"] = exercise
-            
+        
         except Exception as e:
             state["error"] = f"Failed to validate results: {str(e)}"
         
         return state
     
-    def analyze_exercise(self, image_paths: List[str], thread_id: str = None) -> MathExercise:
-        """
-        Analyze a mathematical exercise from multiple images
+    def _prepare_run(
+        self,
+        images: List[ImageSource],
+        thread_id: Optional[str],
+        image_names: Optional[List[str]] = None,
+        completed_pages: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Build the initial state and run config of a workflow run"""
+        if not images:
+            raise ValueError("At least one image must be provided")
+        if image_names is not None and len(image_names) != len(images):
+            raise ValueError("image_names must name every image")
+        completed_pages = [
+            result for result in completed_pages or []
+            if result.get("error") is None and 0 <= result["page_index"] < len(images)
+        ]
         
-        Args:
-            image_paths: List of paths to images containing the exercise
-            thread_id: Optional thread ID for checkpointing. If None, a unique ID will be generated.
-            
-        Returns:
-            MathExercise object with combined analysis
-        """
-        if not image_paths:
-            raise ValueError("At least one image path must be provided")
+        image_paths = []
+        image_bytes = []
+        for index, source in enumerate(images):
+            if isinstance(source, (str, os.PathLike)):
+                # Files on disk are read once, by the encode node
+                image_paths.append(os.fspath(source))
+                image_bytes.append(None)
+                continue
+            if not isinstance(source, bytes):
+                # File objects are read here; they cannot be stored in checkpoints
+                if source.seekable():
+                    source.seek(0)
+                source = source.read()
+            image_paths.append(f"<image {index + 1}>")
+            image_bytes.append(source)
         
         # Generate thread_id if not provided
         if thread_id is None:
@@ -332,41 +551,136 @@ class MathExerciseAnalyzer:
         
         # Initialize state with image paths
         initial_state = {
-            "image_paths": image_paths,
+            "image_paths": image_names if image_names is not None else image_paths,
+            "image_bytes": image_bytes,
             "base64_images": [],
+            "image_digests": [],
+            "image_mime_types": [],
             "raw_analyses": [],
             "structured_analyses": [],
             "combined_analysis": None,
             "exercise": None,
             "error": None,
-            "current_image_index": 0
+            "page_results": completed_pages
         }
         
-        # Create config with thread_id for the checkpointer
-        config = {"configurable": {"thread_id": thread_id}}
-        
-        # Run the workflow
-        result = self.workflow.invoke(initial_state, config=config)
-        
+        # Create config with thread_id for the checkpointer; max_concurrency caps parallel pages.
+        # The nodes add their time and token usage to conversion_metrics, which is not checkpointed
+        config = {
+            "configurable": {"thread_id": thread_id, "conversion_metrics": ConversionMetrics()},
+            "max_concurrency": self.max_concurrency
+        }
+        return initial_state, config
+    
+    def _exercise_from_result(self, result: Dict[str, Any], config: Dict[str, Any]) -> MathExercise:
+        """Get the exercise out of a final workflow state, raising if the analysis failed"""
+        conversion = config["configurable"]["conversion_metrics"]
         if result["error"] is not None:
+            logger.info(f"Failed analysis metrics: {conversion.snapshot()}")
             raise Exception(f"Analysis failed: {result['error']}")
         
         if "exercise" not in result or result["exercise"] is None:
             raise Exception("Failed to create exercise object")
         
-        return result["exercise"]
+        exercise = result["exercise"]
+        exercise.metrics = conversion.snapshot()
+        return exercise
+    
+    def analyze_exercise(
+        self,
+        images: List[ImageSource],
+        thread_id: str = None,
+        on_progress: Optional[Callable[[str, Optional[int]], None]] = None,
+        image_names: Optional[List[str]] = None,
+        completed_pages: Optional[List[Dict[str, Any]]] = None,
+        on_page_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> MathExercise:
+        """
+        Analyze a mathematical exercise from multiple images
+        
+        Args:
+            images: Images containing the exercise, in page order: file paths, or
+                contents (bytes or binary file objects) analyzed without touching disk
+            thread_id: Optional thread ID for checkpointing. If None, a unique ID will be generated.
+            on_progress: Optional callback invoked as on_progress(node_name, page_index) each
+                time a workflow node finishes; page_index is set for analyze_page only
+            image_names: Optional names reported in MathExercise.image_paths instead of
+                the file paths (in-memory images are otherwise numbered)
+            completed_pages: Page results saved from an earlier run of the same images;
+                only the other pages are analyzed again before combining
+            on_page_result: Optional callback receiving each successful page result as
+                soon as it is available, so it can be saved for a retry
+        
+        Returns:
+            MathExercise object with combined analysis
+        """
+        if on_progress is not None or on_page_result is not None:
+            for node_name, update in self.stream_exercise(
+                images, thread_id=thread_id, image_names=image_names, completed_pages=completed_pages
+            ):
+                if node_name == RESULT_EVENT:
+                    return update["exercise"]
+                page_index = None
+                if node_name == "analyze_page":
+                    page_result = update["page_results"][0]
+                    page_index = page_result["page_index"]
+                    if on_page_result is not None and page_result["error"] is None:
+                        on_page_result(page_result)
+                if on_progress is not None:
+                    on_progress(node_name, page_index)
+        
+        initial_state, config = self._prepare_run(images, thread_id, image_names, completed_pages)
+        
+        # Run the workflow
+        result = self.workflow.invoke(initial_state, config=config)
+        return self._exercise_from_result(result, config)
+    
+    def stream_exercise(
+        self,
+        images: List[ImageSource],
+        thread_id: str = None,
+        image_names: Optional[List[str]] = None,
+        completed_pages: Optional[List[Dict[str, Any]]] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Analyze a mathematical exercise, yielding progress as each workflow node finishes
+        
+        Args:
+            images: Images containing the exercise, in page order (see analyze_exercise)
+            thread_id: Optional thread ID for checkpointing. If None, a unique ID will be generated.
+            image_names: Optional names reported in MathExercise.image_paths
+            completed_pages: Page results saved from an earlier run (see analyze_exercise)
+        
+        Yields:
+            (node_name, state_update) for every finished node (one analyze_page per page,
+            in completion order), then (RESULT_EVENT, {"exercise": MathExercise})
+        
+        Raises:
+            Exception: If the analysis failed
+        """
+        initial_state, config = self._prepare_run(images, thread_id, image_names, completed_pages)
+        
+        result = None
+        for mode, chunk in self.workflow.stream(initial_state, config=config, stream_mode=["updates", "values"]):
+            if mode == "values":
+                result = chunk
+                continue
+            for node_name, update in chunk.items():
+                yield node_name, update or {}
+        
+        yield RESULT_EVENT, {"exercise": self._exercise_from_result(result, config)}
     
-    def analyze_single_image(self, image_path: str, thread_id: str = None) -> MathExercise:
+    def analyze_single_image(self, image_path: ImageSource, thread_id: str = None) -> MathExercise:
         """
         Convenience method to analyze a single image
         
         Args:
-            image_path: Path to the image containing the exercise
+            image_path: Path or contents of the image containing the exercise
             thread_id: Optional thread ID for checkpointing. If None, a unique ID will be generated.
-            
+        
         Returns:
             MathExercise object with analysis
         """
         return self.analyze_exercise([image_path], thread_id=thread_id)
-    
-    
+
+
@@ -0,0 +1,312 @@
+"""
+Process-wide metrics in the Prometheus text format, plus per-conversion stage accounting
+
+Metrics are kept in REGISTRY and rendered with REGISTRY.render(). While a
+workflow node runs inside node_scope(), the model calls it makes record
+their tokens, retries and image bytes against that node, both in the
+conversion's ConversionMetrics and in the process-wide metrics.
+
+Token prices used for cost estimates are read from the environment:
+    
+    AI_PROMPT_TOKEN_PRICE       USD per million prompt tokens (default 2.50)
+    AI_COMPLETION_TOKEN_PRICE   USD per million completion tokens (default 10.00)
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+class _Metric(ABC):
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(suffix, formatted labels, value) of every sample"""
+    
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{suffix}{labels} {_format_value(value)}" for suffix, labels, value in self.samples()]
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+    kind = "counter"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+    
+    def samples(self):
+        with self._lock:
+            return [("", _format_labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a function when rendered"""
+    kind = "gauge"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+    
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+    
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """Read the value from function each time the metric is rendered"""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+    
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        with self._lock:
+            function = self._functions.get(key)
+            if function is None:
+                return self._values.get(key, 0.0)
+        return function()
+    
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        values.update((key, function()) for key, function in functions.items())
+        return [("", _format_labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count per bucket (the last one is +Inf), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+    
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+    
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the wall time of the block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def count(self, **labels) -> int:
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], [0.0]))
+            return sum(counts)
+    
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, math.inf), counts):
+                    cumulative += count
+                    labels = _format_labels((*self.labelnames, "le"), (*key, _format_value(bound)))
+                    samples.append(("_bucket", labels, cumulative))
+                labels = _format_labels(self.labelnames, key)
+                samples.append(("_sum", labels, total[0]))
+                samples.append(("_count", labels, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """Named metrics rendered together; asking for an existing name returns the same metric"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+    
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+NODE_DURATION = REGISTRY.histogram(
+    "ai_node_duration_seconds", "Wall time of analysis workflow nodes", ["node"]
+)
+LLM_CALLS = REGISTRY.counter("ai_llm_calls_total", "Model requests made, including retries", ["node"])
+LLM_RETRIES = REGISTRY.counter("ai_llm_retries_total", "Model requests retried after a transient error", ["node"])
+LLM_TOKENS = REGISTRY.counter("ai_llm_tokens_total", "Tokens used by model requests", ["node", "kind"])
+IMAGE_BYTES = REGISTRY.counter("ai_image_bytes_sent_total", "Base64 image bytes sent to the model", ["node"])
+LLM_COST = REGISTRY.counter("ai_llm_cost_usd_total", "Estimated model cost in USD", ["node"])
+
+def token_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated cost in USD of a number of tokens"""
+    prompt_price = float(os.getenv("AI_PROMPT_TOKEN_PRICE", "2.50"))
+    completion_price = float(os.getenv("AI_COMPLETION_TOKEN_PRICE", "10.00"))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+@dataclass
+class NodeMetrics:
+    """What one workflow node spent during a conversion"""
+    wallTime: float = 0.0
+    runs: int = 0
+    llmCalls: int = 0
+    retries: int = 0
+    promptTokens: int = 0
+    completionTokens: int = 0
+    imageBytes: int = 0
+    estimatedCost: float = 0.0
+
+class ConversionMetrics:
+    """Per-node accounting of one conversion; page branches add to it concurrently"""
+    
+    def __init__(self):
+        self.nodes: Dict[str, NodeMetrics] = {}
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+    
+    def _update(self, node: str, **amounts) -> None:
+        with self._lock:
+            metrics = self.nodes.setdefault(node, NodeMetrics())
+            for field, amount in amounts.items():
+                setattr(metrics, field, getattr(metrics, field) + amount)
+    
+    def snapshot(self) -> dict:
+        """Totals and per-node figures, shaped like the ConversionMetrics API model"""
+        with self._lock:
+            nodes = {node: asdict(metrics) for node, metrics in self.nodes.items()}
+        return {
+            "totalTime": time.perf_counter() - self._started,
+            "promptTokens": sum(node["promptTokens"] for node in nodes.values()),
+            "completionTokens": sum(node["completionTokens"] for node in nodes.values()),
+            "estimatedCost": sum(node["estimatedCost"] for node in nodes.values()),
+            "nodes": nodes,
+        }
+
+# Node being run by the current thread, and the conversion it belongs to
+_current_node: ContextVar[Optional[Tuple[str, Optional[ConversionMetrics]]]] = ContextVar("current_node", default=None)
+
+@contextmanager
+def node_scope(node: str, conversion: Optional[ConversionMetrics] = None) -> Iterator[None]:
+    """Time a workflow node and attribute the model calls made inside it"""
+    token = _current_node.set((node, conversion))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_node.reset(token)
+        NODE_DURATION.observe(elapsed, node=node)
+        if conversion is not None:
+            conversion._update(node, wallTime=elapsed, runs=1)
+
+def _record(**amounts) -> None:
+    current = _current_node.get()
+    if current is None:
+        return
+    node, conversion = current
+    if conversion is not None:
+        conversion._update(node, **amounts)
+
+def record_llm_call() -> None:
+    """Count a model request made by the current node"""
+    current = _current_node.get()
+    LLM_CALLS.inc(node=current[0] if current else "none")
+    _record(llmCalls=1)
+
+def record_retry() -> None:
+    """Count a retried model request of the current node"""
+    current = _current_node.get()
+    LLM_RETRIES.inc(node=current[0] if current else "none")
+    _record(retries=1)
+
+def record_tokens(prompt_tokens: int, completion_tokens: int) -> None:
+    """Add the token usage reported by a model response to the current node"""
+    node = _current_node.get()[0] if _current_node.get() else "none"
+    cost = token_cost(prompt_tokens, completion_tokens)
+    LLM_TOKENS.inc(prompt_tokens, node=node, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, node=node, kind="completion")
+    LLM_COST.inc(cost, node=node)
+    _record(promptTokens=prompt_tokens, completionTokens=completion_tokens, estimatedCost=cost)
+
+def record_image_bytes(size: int) -> None:
+    """Add the size of an image sent to the model by the current node"""
+    node = _current_node.get()[0] if _current_node.get() else "none"
+    IMAGE_BYTES.inc(size, node=node)
+    _record(imageBytes=size)
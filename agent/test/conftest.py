@@ -1,11 +1,143 @@
+import json
+import re
+import threading
+import time
 import pytest
 import tempfile
 import shutil
 from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from PIL import Image, ImageDraw
 
 from agent.backend.main import app
 from agent.backend.services.storage_service import FileStorageService
+from agent.backend.services.sqlite_storage_service import SQLiteStorageService
 from agent.backend.models import ExerciseCreate, Category
+from agent.math_agent_v0 import MathExerciseAnalyzer, PageAnalysis
+
+class FakeClock:
+    """Manually advanced clock; sleep() advances it too"""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class FakeVisionModel:
+    """Stand-in chat model that answers each prompt of the workflow"""
+    
+    def __init__(self, delay: float = 0.0, fail_page: int = None, invalid_structured_output: bool = False):
+        self.delay = delay
+        self.fail_page = fail_page
+        self.invalid_structured_output = invalid_structured_output
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+    
+    def __call__(self, prompt):
+        with self.lock:
+            self.calls += 1
+        if isinstance(prompt, list):
+            return self._analyze(prompt)
+        
+        text = prompt.to_string()
+        if "Individual analyses:" in text:
+            pages = re.findall(r"Page (\d+) statement", text)
+            return AIMessage(content=json.dumps({
+                "title": "Combined", "statement": " + ".join(pages), "response": "done",
+                "domain": "Algebra", "level": "College", "confidence_score": 0.8
+            }))
+        page = re.search(r"page (\d+) of", text).group(1)
+        return AIMessage(content=json.dumps({
+            "title": f"Page {page}", "statement": f"Page {page} statement", "response": "r",
+            "domain": "Algebra", "level": "College", "confidence_score": 0.9
+        }))
+    
+    def extract(self, messages):
+        """Answer a structured-output vision call"""
+        with self.lock:
+            self.calls += 1
+        self._analyze(messages)
+        page = self._page(messages)
+        return PageAnalysis(
+            title=f"Page {page}", statement="" if self.invalid_structured_output else f"Page {page} statement",
+            response="r", domain="Algebra", level="College", confidence_score=0.9, is_continuation=page > 1
+        )
+    
+    def _page(self, messages) -> int:
+        return int(re.search(r"page (\d+) of", messages[1].content[0]["text"]).group(1))
+    
+    def _analyze(self, messages):
+        page = self._page(messages)
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delay)
+            if page == self.fail_page:
+                raise RuntimeError("vision call failed")
+            return AIMessage(content=f"Transcription of page {page} of the exercise")
+        finally:
+            with self.lock:
+                self.running -= 1
+
+class FakeChatRunnable(RunnableLambda):
+    """Runnable wrapper exposing the chat model API the analyzer uses"""
+    
+    def __init__(self, model: FakeVisionModel):
+        super().__init__(model)
+        self.model = model
+    
+    def with_structured_output(self, schema):
+        return RunnableLambda(self.model.extract)
+
+@pytest.fixture
+def clock():
+    """Fake clock starting at 0"""
+    return FakeClock()
+
+@pytest.fixture
+def vision_model():
+    """Factory of fake vision models, e.g. vision_model(delay=0.1, fail_page=2)"""
+    return FakeVisionModel
+
+@pytest.fixture
+def make_analyzer(monkeypatch):
+    """Factory of analyzers answered by a fake vision model"""
+    def make(model: FakeVisionModel, max_concurrency: int = 4, **kwargs) -> MathExerciseAnalyzer:
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        analyzer = MathExerciseAnalyzer(max_concurrency=max_concurrency, **kwargs)
+        analyzer.llm = FakeChatRunnable(model)
+        return analyzer
+    return make
+
+@pytest.fixture
+def image_paths(tmp_path):
+    """Five small page images with different content"""
+    paths = []
+    for index in range(5):
+        path = tmp_path / f"page{index}.png"
+        image = Image.new("RGB", (200, 100), "white")
+        ImageDraw.Draw(image).rectangle((10 + 20 * index, 20, 40 + 20 * index, 60), fill="black")
+        image.save(path)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture(autouse=True)
+def app_data_dir(tmp_path, monkeypatch):
+    """Point the files the app creates at startup to a temporary directory instead of ./data"""
+    from agent.backend import main
+    monkeypatch.setattr(main, "data_dir", tmp_path / "data")
+    return main.data_dir
 
 @pytest.fixture
 def test_app():
@@ -20,8 +152,11 @@ def client(test_app, temp_data_dir):
     from agent.backend.services.ai_service import AIService
     from unittest.mock import MagicMock
     
+    from agent.backend.services.conversion_jobs import ConversionJobStore, ConversionJobQueue
+    
     original_storage_service = routers.storage_service
     original_ai_service = routers.ai_service
+    original_conversion_jobs = routers.conversion_jobs
     
     routers.storage_service = FileStorageService(data_dir=temp_data_dir)
     
@@ -29,6 +164,9 @@ def client(test_app, temp_data_dir):
     mock_ai_service = MagicMock(spec=AIService)
     mock_ai_service.validate_image.return_value = True
     routers.ai_service = mock_ai_service
+    routers.conversion_jobs = ConversionJobQueue(
+        ConversionJobStore(f"{temp_data_dir}/conversion_jobs.db"), mock_ai_service
+    )
     
     client = TestClient(test_app)
     
@@ -37,6 +175,8 @@ def client(test_app, temp_data_dir):
     # Restore original services
     routers.storage_service = original_storage_service
     routers.ai_service = original_ai_service
+    routers.conversion_jobs.store.close()
+    routers.conversion_jobs = original_conversion_jobs
 
 @pytest.fixture
 def temp_data_dir():
@@ -86,4 +226,11 @@ def mock_exercise_files():
             "filename": "test_exercise_2.jpg", 
             "content": b"fake_image_content_2"
         }
-    ] 
\ No newline at end of file
+    ] 
+
+@pytest.fixture
+def sqlite_storage_service(temp_data_dir):
+    """Create a SQLite storage service with temporary data directory"""
+    service = SQLiteStorageService(data_dir=temp_data_dir)
+    yield service
+    service.close()
@@ -71,6 +71,126 @@ class TestAIService:
         # Verify analyzer was called
         mock_analyzer.analyze_exercise.assert_called_once()
     
+    @patch('agent.backend.services.ai_service.MathExerciseAnalyzer')
+    def test_process_images_uses_cache(self, mock_analyzer_class, temp_data_dir):
+        """Test that a repeated upload is answered from the conversion cache"""
+        from agent.backend.services.conversion_cache import ConversionCache
+        
+        mock_analyzer = MagicMock()
+        mock_analyzer.cache_namespace = "gpt-4o|0.0|2"
+        mock_analyzer.analyze_exercise.return_value = MagicMock(
+            title="Cached", statement="s", response="r", domain="Algebra", confidence_score=0.8,
+            metrics={"totalTime": 1.5}
+        )
+        mock_analyzer_class.return_value = mock_analyzer
+        
+        cache = ConversionCache(f"{temp_data_dir}/cache.db")
+        service = AIService(cache=cache)
+        assert mock_analyzer_class.call_args.kwargs["page_cache"] is cache
+        
+        def upload(content):
+            mock_file = MagicMock()
+            mock_file.file.read.return_value = content
+            return mock_file
+        
+        first = service.process_images([upload(b"page")], ["test.jpg"])
+        second = service.process_images([upload(b"page")], ["test.jpg"])
+        assert first[0]["metrics"] == {"totalTime": 1.5}
+        # A cache hit made no model calls, so it reports no metrics
+        assert second[0] == dict(first[0], metrics=None)
+        assert second[0]["title"] == "Cached"
+        mock_analyzer.analyze_exercise.assert_called_once()
+        
+        # Other images, or other analyzer settings, miss the cache
+        service.process_images([upload(b"other page")], ["test.jpg"])
+        mock_analyzer.cache_namespace = "gpt-4o|0.5|2"
+        service.process_images([upload(b"page")], ["test.jpg"])
+        assert mock_analyzer.analyze_exercise.call_count == 3
+        cache.close()
+    
+    @patch('agent.backend.services.ai_service.MathExerciseAnalyzer')
+    def test_rejected_results_are_not_cached(self, mock_analyzer_class, temp_data_dir):
+        """Test that incomplete results and unknown categories raise and are analyzed again next time"""
+        from pydantic import ValidationError
+        from agent.backend.services import ai_service
+        from agent.backend.services.ai_service import IncompleteConversionError
+        from agent.backend.services.conversion_cache import ConversionCache
+        
+        mock_analyzer = MagicMock()
+        mock_analyzer.cache_namespace = "gpt-4o|0.0|2"
+        mock_analyzer_class.return_value = mock_analyzer
+        cache = ConversionCache(f"{temp_data_dir}/cache.db")
+        service = AIService(cache=cache)
+        
+        mock_analyzer.analyze_exercise.return_value = MagicMock(
+            title="T", statement="", response="r", domain="Algebra", confidence_score=0.8, metrics=None
+        )
+        with pytest.raises(IncompleteConversionError):
+            service.process_image_bytes([b"page"], ["test.jpg"])
+        
+        mock_analyzer.analyze_exercise.return_value = MagicMock(
+            title="T", statement="s", response="r", domain="Astrology", confidence_score=0.8, metrics=None
+        )
+        with pytest.raises(ValidationError):
+            service.process_image_bytes([b"page"], ["test.jpg"])
+        mock_analyzer.stream_exercise.return_value = iter([
+            (ai_service.RESULT_EVENT, {"exercise": mock_analyzer.analyze_exercise.return_value})
+        ])
+        with pytest.raises(ValidationError):
+            list(service.stream_image_bytes([b"page"], ["test.jpg"]))
+        
+        mock_analyzer.analyze_exercise.return_value = MagicMock(
+            title="T", statement="s", response="r", domain="Algebra", confidence_score=0.8, metrics=None
+        )
+        assert service.process_image_bytes([b"page"], ["test.jpg"])[0]["category"] == "Algebra"
+        assert mock_analyzer.analyze_exercise.call_count == 3
+        cache.close()
+    
+    @patch('agent.backend.services.ai_service.MathExerciseAnalyzer')
+    def test_stream_image_bytes(self, mock_analyzer_class, temp_data_dir):
+        """Test that analyzer updates become progress events and the result is cached"""
+        from agent.backend.services import ai_service
+        from agent.backend.services.conversion_cache import ConversionCache
+        
+        exercise = MagicMock(
+            title="Combined", statement="a + b", response="r", domain="Algebra", confidence_score=0.8, metrics=None
+        )
+        mock_analyzer = MagicMock()
+        mock_analyzer.cache_namespace = "gpt-4o|0.0|2"
+        mock_analyzer.stream_exercise.return_value = iter([
+            ("encode_images", {}),
+            ("analyze_page", {"page_results": [
+                {"page_index": 1, "structured_analysis": {"title": "Part b", "statement": "b"}}
+            ]}),
+            ("analyze_page", {"page_results": [
+                {"page_index": 0, "structured_analysis": {"title": "Part a", "statement": "a"}}
+            ]}),
+            ("gather_pages", {}),
+            ("combine_analyses", {"combined_analysis": {"title": "Combined", "statement": "a + b"}}),
+            ("validate_results", {}),
+            (ai_service.RESULT_EVENT, {"exercise": exercise})
+        ])
+        mock_analyzer_class.return_value = mock_analyzer
+        
+        cache = ConversionCache(f"{temp_data_dir}/cache.db")
+        service = AIService(cache=cache)
+        events = list(service.stream_image_bytes([b"a", b"b"], ["a.jpg", "b.jpg"]))
+        
+        assert events[:4] == [
+            ("encoded", {"pages": 2}),
+            ("page_analyzed", {"page": 2}),
+            ("page_structured", {"page": 2, "title": "Part b", "statement": "b"}),
+            ("page_analyzed", {"page": 1})
+        ]
+        assert events[-2] == ("combined", {"title": "Combined", "statement": "a + b"})
+        assert events[-1][0] == "validated"
+        assert events[-1][1]["solution"] == "r"
+        
+        # The same upload is answered from the cache with the final event only
+        assert list(service.stream_image_bytes([b"a", b"b"], ["a.jpg", "b.jpg"])) == [events[-1]]
+        mock_analyzer.stream_exercise.assert_called_once()
+        cache.close()
+    
     def test_process_images_no_analyzer(self):
         """Test image processing when analyzer is not available"""
         service = AIService()
@@ -129,6 +249,28 @@ class TestAIService:
             result = service.validate_image(mock_file, "valid.jpg")
             assert result is True
     
+    def test_validate_image_reads_only_the_header(self):
+        """Test that validation leaves decoding the image to preprocessing"""
+        import io
+        from PIL import Image
+        
+        content = io.BytesIO()
+        Image.effect_noise((512, 512), 64).save(content, format="PNG")
+        content.seek(0)
+        
+        read_sizes = []
+        original_read = content.read
+        def read(size=-1):
+            data = original_read(size)
+            read_sizes.append(len(data))
+            return data
+        content.read = read
+        
+        mock_file = MagicMock()
+        mock_file.file = content
+        assert AIService().validate_image(mock_file, "page.png") is True
+        assert sum(read_sizes) < len(content.getvalue()) // 10
+    
     def test_validate_image_invalid_extension(self):
         """Test validation of file with invalid extension"""
         service = AIService()
@@ -176,20 +318,13 @@ class TestAIService:
         assert health["service"] == "AI Math Exercise Analyzer"
     
     @patch('agent.backend.services.ai_service.MathExerciseAnalyzer')
-    def test_process_images_cleanup_temp_files(self, mock_analyzer_class):
-        """Test that temporary files are cleaned up after processing"""
-        # Mock the analyzer
+    def test_process_images_without_temp_files(self, mock_analyzer_class):
+        """Test that uploads are handed to the analyzer in memory, without temporary files"""
         mock_analyzer = MagicMock()
         mock_analyzer_class.return_value = mock_analyzer
-        
-        mock_exercise = MagicMock()
-        mock_exercise.title = "Cleanup Test"
-        mock_exercise.statement = "Test"
-        mock_exercise.response = "Test"
-        mock_exercise.domain = "Algebra"
-        mock_exercise.confidence_score = 0.9
-        
-        mock_analyzer.analyze_exercise.return_value = mock_exercise
+        mock_analyzer.analyze_exercise.return_value = MagicMock(
+            title="In Memory", statement="Test", response="Test", domain="Algebra", confidence_score=0.9
+        )
         
         service = AIService()
         
@@ -197,18 +332,14 @@ class TestAIService:
         mock_file.file.read.return_value = b"test_image"
         mock_file.filename = "test.jpg"
         
-        # Mock tempfile.NamedTemporaryFile
         with patch('tempfile.NamedTemporaryFile') as mock_temp_file:
-            mock_temp = MagicMock()
-            mock_temp.name = "/tmp/test_temp_file"
-            mock_temp_file.return_value = mock_temp
-            
-            # Mock os.unlink for cleanup verification
-            with patch('os.unlink') as mock_unlink:
-                service.process_images([mock_file], ["test.jpg"])
-                
-                # Verify cleanup was attempted
-                mock_unlink.assert_called()
+            exercise_data, _ = service.process_images([mock_file], ["test.jpg"])
+            mock_temp_file.assert_not_called()
+        
+        assert exercise_data["title"] == "In Memory"
+        args, kwargs = mock_analyzer.analyze_exercise.call_args
+        assert args[0] == [b"test_image"]
+        assert kwargs["image_names"] == ["test.jpg"]
     
     def test_validate_image_allowed_extensions(self):
         """Test that all allowed image extensions are accepted"""
@@ -1,5 +1,9 @@
 from unittest.mock import patch
 import io
+import json
+import os
+
+from agent.backend.models import DEFAULT_PAGE_SIZE, Category
 
 class TestAPIEndpoints:
     """Test cases for FastAPI endpoints"""
@@ -19,6 +23,58 @@ class TestAPIEndpoints:
         data = response.json()
         assert data["status"] == "healthy"
     
+    def test_metrics_endpoint(self, client, sample_exercise_data):
+        """Test that requests, storage operations and pools show up in /metrics"""
+        created = client.post("/api/exercises", json=sample_exercise_data).json()
+        client.get(f"/api/exercises/{created['id']}")
+        client.get("/no-such-page")
+        
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        # Routes are labelled by template, not by the requested path
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/exercises/{exercise_id}",status="200"}' in text
+        assert 'route="unmatched",status="404"' in text
+        assert 'http_response_size_bytes_count{method="POST",route="/api/exercises"}' in text
+        # The /metrics request itself is in progress
+        assert 'http_requests_in_progress{method="GET"} 1' in text
+        assert 'storage_operation_duration_seconds_count{operation="write"}' in text
+        assert 'storage_operation_duration_seconds_count{operation="glob"}' in text
+        assert 'executor_queue_depth{pool="ai"} 0' in text
+    
+    def test_importing_the_app_writes_no_files(self, tmp_path):
+        """Test that data files are only created when the app starts"""
+        import subprocess
+        import sys
+        from pathlib import Path
+        
+        root = Path(__file__).resolve().parents[2]
+        subprocess.run(
+            [sys.executable, "-c", "import agent.backend.main"],
+            cwd=tmp_path, env={"PYTHONPATH": f"{root}{os.pathsep}{root / 'agent' / 'backend'}", "PATH": os.environ["PATH"]},
+            check=True
+        )
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_startup_creates_services_in_data_dir(self, test_app, tmp_path, monkeypatch):
+        """Test that the lifespan handler puts every data file under the data directory"""
+        from fastapi.testclient import TestClient
+        from agent.backend import main, routers
+        
+        assert main.data_dir == tmp_path / "data"
+        for name in ("storage_service", "ai_service", "conversion_jobs"):
+            monkeypatch.setattr(routers, name, None)
+        
+        with TestClient(test_app) as started:
+            assert started.get("/api/exercises").status_code == 200
+        routers.conversion_jobs.store.close()
+        if routers.ai_service.cache is not None:
+            routers.ai_service.cache.close()
+        
+        files = {path.name for path in (tmp_path / "data").iterdir()}
+        assert {"exercises", "images", "conversion_jobs.db"} <= files
+    
     def test_get_categories(self, client):
         """Test getting all available categories"""
         response = client.get("/api/exercises/categories")
@@ -70,7 +126,7 @@ class TestAPIEndpoints:
         assert data["exercises"] == []
         assert data["total"] == 0
         assert data["page"] == 1
-        assert data["size"] == 0
+        assert data["size"] == DEFAULT_PAGE_SIZE
     
     def test_get_exercises_with_data(self, client, sample_exercise_data):
         """Test getting exercises when some exist"""
@@ -150,6 +206,29 @@ class TestAPIEndpoints:
         assert data["solution"] == sample_exercise_data["solution"]
         assert data["category"] == sample_exercise_data["category"]
     
+    def test_update_with_if_match(self, client, sample_exercise_data):
+        """Test that updates and deletes based on a stale ETag are rejected"""
+        create_response = client.post("/api/exercises", json=sample_exercise_data)
+        exercise_id = create_response.json()["id"]
+        etag = create_response.headers["ETag"]
+        assert etag == '"1"'
+        assert client.get(f"/api/exercises/{exercise_id}").headers["ETag"] == etag
+        
+        response = client.put(f"/api/exercises/{exercise_id}", json={"title": "First"}, headers={"If-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"2"'
+        
+        response = client.put(f"/api/exercises/{exercise_id}", json={"title": "Second"}, headers={"If-Match": etag})
+        assert response.status_code == 412
+        assert response.headers["ETag"] == '"2"'
+        
+        response = client.delete(f"/api/exercises/{exercise_id}", headers={"If-Match": etag})
+        assert response.status_code == 412
+        assert client.get(f"/api/exercises/{exercise_id}").json()["title"] == "First"
+        
+        response = client.delete(f"/api/exercises/{exercise_id}", headers={"If-Match": 'W/"2"'})
+        assert response.status_code == 200
+    
     def test_update_nonexistent_exercise(self, client):
         """Test updating a non-existent exercise"""
         update_data = {"title": "Updated Title"}
@@ -190,6 +269,8 @@ class TestAPIEndpoints:
         assert data["total_exercises"] == 1
         assert "Algebra" in data["category_distribution"]
         assert data["category_distribution"]["Algebra"] == 1
+        assert sum(data["confidence_histogram"].values()) == 1
+        assert sum(data["created_per_day"].values()) == 1
     
     def test_ai_conversion_success(self, client):
         """Test successful AI image conversion"""
@@ -222,6 +303,209 @@ class TestAPIEndpoints:
         assert data["confidenceScore"] == 0.95
         assert data["message"] == "AI conversion completed successfully"
     
+    def test_ai_conversion_with_fake_backend(self, client, monkeypatch):
+        """Test that the offline model backend gives accepted conversions, synchronously, streamed and as a job"""
+        from agent.backend import routers
+        from agent.backend.services.ai_service import AIService
+        from PIL import Image
+        
+        monkeypatch.setenv("AI_LLM_BACKEND", "fake")
+        monkeypatch.setenv("AI_FAKE_OUTPUT_TOKENS", "20")
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        routers.ai_service = routers.conversion_jobs.ai_service = AIService()
+        
+        image = io.BytesIO()
+        Image.new("RGB", (64, 64), "white").save(image, format="PNG")
+        files = [("files", ("page.png", image.getvalue(), "image/png"))]
+        
+        response = client.post("/api/exercises/ai-conversion", files=files)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["title"] and data["statement"] and data["solution"]
+        assert data["category"] in [category.value for category in Category]
+        
+        with client.stream("POST", "/api/exercises/ai-conversion/stream", files=files) as streamed:
+            events = [line.split(": ", 1)[1] for line in streamed.iter_lines() if line.startswith("event: ")]
+        assert events[-1] == "validated"
+        
+        submitted = client.post("/api/exercises/ai-conversion/jobs", files=files).json()
+        job = self.wait_for_job(client, submitted["id"])
+        assert job["status"] == "succeeded"
+        assert job["result"]["category"] == data["category"]
+    
+    def test_ai_conversion_does_not_block_other_requests(self, test_app, client):
+        """Test that health and list requests are served while a conversion is running"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from fastapi.testclient import TestClient
+        from agent.backend import routers
+        
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow_conversion(files, filenames):
+            started.set()
+            release.wait(timeout=10)
+            return {"title": "T", "statement": "S", "solution": "R", "category": "Algebra"}, 0.9
+        
+        routers.ai_service.process_images.side_effect = slow_conversion
+        files = [("files", ("test.jpg", io.BytesIO(b"fake_image"), "image/jpeg"))]
+        
+        # A single client context shares one event loop between both threads
+        with TestClient(test_app) as shared_client, ThreadPoolExecutor(max_workers=1) as pool:
+            conversion = pool.submit(shared_client.post, "/api/exercises/ai-conversion", files=files)
+            assert started.wait(timeout=10)
+            
+            assert shared_client.get("/health").status_code == 200
+            assert shared_client.get("/api/exercises").status_code == 200
+            assert not conversion.done()
+            
+            release.set()
+            assert conversion.result(timeout=10).status_code == 200
+    
+    def read_events(self, response):
+        """Parse a server-sent event stream into (event, data) pairs"""
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            event, data = block.split("\n")
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+        return events
+    
+    def test_ai_conversion_stream(self, client):
+        """Test that conversion progress and partial results are streamed as events"""
+        from agent.backend import routers
+        
+        def stream_image_bytes(images, filenames):
+            assert images == [b"fake_image_1", b"fake_image_2"]
+            yield "encoded", {"pages": 2}
+            yield "page_analyzed", {"page": 2}
+            yield "page_structured", {"page": 2, "title": "Part b", "statement": "Second part"}
+            yield "combined", {"title": "AI Generated Exercise", "statement": "AI generated statement"}
+            yield "validated", {
+                "title": "AI Generated Exercise",
+                "statement": "AI generated statement",
+                "solution": "AI generated solution",
+                "category": "Algebra",
+                "confidenceScore": 0.9
+            }
+        
+        routers.ai_service.stream_image_bytes.side_effect = stream_image_bytes
+        files = [
+            ("files", ("test1.jpg", io.BytesIO(b"fake_image_1"), "image/jpeg")),
+            ("files", ("test2.jpg", io.BytesIO(b"fake_image_2"), "image/jpeg"))
+        ]
+        
+        response = client.post("/api/exercises/ai-conversion/stream", files=files)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        
+        events = self.read_events(response)
+        assert [event for event, data in events] == [
+            "encoded", "page_analyzed", "page_structured", "combined", "validated"
+        ]
+        assert events[2][1]["title"] == "Part b"
+        assert events[-1][1]["confidenceScore"] == 0.9
+        assert events[-1][1]["message"] == "AI conversion completed successfully"
+    
+    def test_ai_conversion_stream_failure(self, client):
+        """Test that a failure during a streamed conversion is sent as an error event"""
+        from agent.backend import routers
+        
+        def stream_image_bytes(images, filenames):
+            yield "encoded", {"pages": 1}
+            raise RuntimeError("model unavailable")
+        
+        routers.ai_service.stream_image_bytes.side_effect = stream_image_bytes
+        files = [("files", ("test.jpg", io.BytesIO(b"fake_image"), "image/jpeg"))]
+        
+        events = self.read_events(client.post("/api/exercises/ai-conversion/stream", files=files))
+        assert events == [("encoded", {"pages": 1}), ("error", {"detail": "AI conversion failed"})]
+    
+    def wait_for_job(self, client, job_id):
+        """Poll a conversion job until it finishes"""
+        import time
+        for _ in range(200):
+            job = client.get(f"/api/exercises/ai-conversion/{job_id}").json()
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.01)
+        raise AssertionError(f"Job {job_id} did not finish")
+    
+    def test_ai_conversion_job(self, client):
+        """Test submitting a conversion job and polling its progress and result"""
+        from agent.backend import routers
+        
+        def process_image_bytes(images, filenames, on_progress=None, on_page_result=None, **kwargs):
+            assert images == [b"fake_image_1", b"fake_image_2"]
+            on_progress("encode_images", None)
+            for page_index in (1, 0):
+                on_page_result({"page_index": page_index, "raw_analysis": "a", "structured_analysis": {}, "error": None})
+                on_progress("analyze_page", page_index)
+            on_progress("gather_pages", None)
+            return {
+                "title": "AI Generated Exercise",
+                "statement": "AI generated statement",
+                "solution": "AI generated solution",
+                "category": "Algebra"
+            }, 0.9
+        
+        routers.ai_service.process_image_bytes.side_effect = process_image_bytes
+        files = [
+            ("files", ("test1.jpg", io.BytesIO(b"fake_image_1"), "image/jpeg")),
+            ("files", ("test2.jpg", io.BytesIO(b"fake_image_2"), "image/jpeg"))
+        ]
+        
+        response = client.post("/api/exercises/ai-conversion/jobs", files=files)
+        assert response.status_code == 202
+        submitted = response.json()
+        assert submitted["status"] in ("queued", "running", "succeeded")
+        assert submitted["pagesTotal"] == 2
+        
+        job = self.wait_for_job(client, submitted["id"])
+        assert job["status"] == "succeeded"
+        assert job["pagesCompleted"] == 2
+        assert job["completedNodes"] == ["encode_images", "analyze_page", "analyze_page", "gather_pages"]
+        assert job["result"]["title"] == "AI Generated Exercise"
+        assert job["result"]["confidenceScore"] == 0.9
+    
+    def test_ai_conversion_job_failure(self, client):
+        """Test that a failing conversion is reported on the job"""
+        from agent.backend import routers
+        routers.ai_service.process_image_bytes.side_effect = Exception("model unavailable")
+        
+        files = [("files", ("test.jpg", io.BytesIO(b"fake_image"), "image/jpeg"))]
+        job_id = client.post("/api/exercises/ai-conversion/jobs", files=files).json()["id"]
+        
+        job = self.wait_for_job(client, job_id)
+        assert job["status"] == "failed"
+        assert job["error"] == "model unavailable"
+        assert job["result"] is None
+    
+    def test_retry_conversion_job(self, client):
+        """Test retrying failed, finished and unknown jobs"""
+        from agent.backend import routers
+        routers.ai_service.process_image_bytes.side_effect = Exception("model unavailable")
+        
+        files = [("files", ("test.jpg", io.BytesIO(b"fake_image"), "image/jpeg"))]
+        job_id = client.post("/api/exercises/ai-conversion/jobs", files=files).json()["id"]
+        assert self.wait_for_job(client, job_id)["status"] == "failed"
+        
+        routers.ai_service.process_image_bytes.side_effect = None
+        routers.ai_service.process_image_bytes.return_value = (
+            {"title": "T", "statement": "S", "solution": "R", "category": "Algebra"}, 0.9
+        )
+        response = client.post(f"/api/exercises/ai-conversion/{job_id}/retry")
+        assert response.status_code == 202
+        assert self.wait_for_job(client, job_id)["status"] == "succeeded"
+        
+        assert client.post(f"/api/exercises/ai-conversion/{job_id}/retry").status_code == 409
+        assert client.post("/api/exercises/ai-conversion/job_missing/retry").status_code == 404
+    
+    def test_get_nonexistent_conversion_job(self, client):
+        """Test polling an unknown job"""
+        response = client.get("/api/exercises/ai-conversion/job_missing")
+        assert response.status_code == 404
+    
     def test_ai_conversion_no_files(self, client):
         """Test AI conversion with no files"""
         response = client.post("/api/exercises/ai-conversion", files=[])
@@ -242,17 +526,76 @@ class TestAPIEndpoints:
     def test_ai_conversion_incomplete_data(self, client):
         """Test AI conversion that returns incomplete data"""
         from agent.backend import routers
-        # Mock AI service returning incomplete data
-        routers.ai_service.process_images.return_value = (
-            {
-                "title": "Incomplete Exercise",
-                # Missing statement and solution
-            },
-            0.8
+        from agent.backend.services.ai_service import IncompleteConversionError
+        # Mock AI service rejecting incomplete data
+        routers.ai_service.process_images.side_effect = IncompleteConversionError(
+            "AI processing failed to extract complete exercise data"
         )
         
         files = [("files", ("test.jpg", io.BytesIO(b"fake_image"), "image/jpeg"))]
         
         response = client.post("/api/exercises/ai-conversion", files=files)
         assert response.status_code == 422
-        assert "AI processing failed" in response.json()["detail"] 
\ No newline at end of file
+        assert "AI processing failed" in response.json()["detail"]
+    
+    def test_get_exercises_pagination_and_sorting(self, client, sample_exercise_data):
+        """Test paging through exercises sorted by title"""
+        for letter in "CAEBD":
+            client.post("/api/exercises", json={**sample_exercise_data, "title": f"{letter} Exercise"})
+        
+        response = client.get("/api/exercises?page=1&size=2&sort=title&order=asc")
+        assert response.status_code == 200
+        data = response.json()
+        assert [ex["title"] for ex in data["exercises"]] == ["A Exercise", "B Exercise"]
+        assert data["total"] == 5
+        assert data["page"] == 1
+        assert data["size"] == 2
+        
+        response = client.get("/api/exercises?page=3&size=2&sort=title&order=asc")
+        assert [ex["title"] for ex in response.json()["exercises"]] == ["E Exercise"]
+        
+        response = client.get("/api/exercises?page=1&size=1&sort=title&order=desc")
+        assert [ex["title"] for ex in response.json()["exercises"]] == ["E Exercise"]
+    
+    def test_get_exercises_invalid_pagination(self, client):
+        """Test that invalid page parameters are rejected"""
+        assert client.get("/api/exercises?page=0").status_code == 422
+        assert client.get("/api/exercises?size=1000").status_code == 422
+        assert client.get("/api/exercises?sort=statement").status_code == 422
+    
+    def test_get_exercises_summary_view(self, client, sample_exercise_data):
+        """Test that the summary view omits statement and solution"""
+        client.post("/api/exercises", json=sample_exercise_data)
+        
+        response = client.get("/api/exercises?view=summary")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["total"] == 1
+        summary = data["exercises"][0]
+        assert set(summary) == {"id", "title", "category", "createdAt", "confidenceScore"}
+        assert summary["category"] == sample_exercise_data["category"]
+        assert summary["confidenceScore"] == 1.0
+    
+    def test_get_exercises_full_text_search(self, client, sample_exercise_data):
+        """Test ranked full-text search with the q parameter"""
+        client.post("/api/exercises", json=sample_exercise_data)
+        client.post("/api/exercises", json={
+            **sample_exercise_data,
+            "title": "Circle Area",
+            "statement": "Find the area of a circle of radius 5",
+            "solution": "The area is $25\\pi$",
+            "category": "Geometry"
+        })
+        
+        response = client.get("/api/exercises?q=factor")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        assert data["exercises"][0]["title"].startswith(sample_exercise_data["title"])
+        
+        response = client.get("/api/exercises?q=circ&category=Geometry")
+        assert [ex["title"] for ex in response.json()["exercises"]] == ["Circle Area"]
+        
+        response = client.get("/api/exercises?q=circle factor")
+        assert response.json()["total"] == 0
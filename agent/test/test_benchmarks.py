@@ -0,0 +1,68 @@
+import json
+from collections import Counter
+from pathlib import Path
+
+from agent.backend.models import Category, Exercise
+from agent.benchmarks.__main__ import main
+from agent.benchmarks.corpus import CATEGORY_WEIGHTS, generate_corpus, write_corpus
+from agent.benchmarks.harness import BenchmarkConfig, compare, percentile, run_in_process
+
+class TestBenchmarks:
+    """Test cases for the benchmark corpus and driver"""
+    
+    def test_corpus_is_reproducible_and_valid(self):
+        """Test that a seed gives the same valid exercises, with skewed categories and unique titles"""
+        corpus = list(generate_corpus(500, seed=1))
+        assert corpus == list(generate_corpus(500, seed=1))
+        assert corpus != list(generate_corpus(500, seed=2))
+        
+        exercises = [Exercise(**exercise) for exercise in corpus]
+        assert set(CATEGORY_WEIGHTS) == {category.value for category in Category}
+        counts = Counter(exercise.category.value for exercise in exercises)
+        assert counts["Algebra"] > counts["Differential Equations"]
+        assert len({exercise.title for exercise in exercises}) == 500
+        assert any("$" in exercise.solution and "\\" in exercise.solution for exercise in exercises)
+    
+    def test_write_corpus(self, temp_data_dir):
+        """Test that the corpus is written in the stored file layout"""
+        exercises_dir = write_corpus(temp_data_dir, 20)
+        files = sorted(exercises_dir.glob("*.json"))
+        assert len(files) == 20
+        assert Exercise(**json.loads(files[0].read_text(encoding="utf-8"))).id == files[0].stem
+    
+    def test_in_process_run_reports_every_scenario(self, temp_data_dir):
+        """Test a small in-process run end to end"""
+        config = BenchmarkConfig(corpus_size=60, concurrency=3, requests=12, warmup=2)
+        report = run_in_process(config, f"{temp_data_dir}/data")
+        
+        assert report["meta"]["config"]["corpus_size"] == 60
+        assert set(report["results"]) == set(config.scenarios)
+        for name, result in report["results"].items():
+            assert result["errors"] == 0, name
+            assert result["requests"] == 12
+            assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"] <= result["max_ms"]
+            assert result["throughput"] > 0
+    
+    def test_command_line_writes_relative_output(self, tmp_path, monkeypatch):
+        """Test that --output is relative to the directory the command was started in"""
+        monkeypatch.chdir(tmp_path)
+        status = main([
+            "run", "--size", "20", "--concurrency", "2", "--requests", "4", "--warmup", "1",
+            "--scenarios", "get", "--output", "before.json"
+        ])
+        
+        assert status == 0
+        assert Path.cwd() == tmp_path
+        assert set(json.loads((tmp_path / "before.json").read_text(encoding="utf-8"))["results"]) == {"get"}
+    
+    def test_percentiles_and_comparison(self):
+        """Test percentile interpolation and regression detection between reports"""
+        assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+        assert percentile([5.0], 0.99) == 5.0
+        
+        baseline = {"results": {"get": {"p95_ms": 10.0, "throughput": 100.0}, "list": {"p95_ms": 10.0, "throughput": 100.0}}}
+        current = {"results": {"get": {"p95_ms": 10.5, "throughput": 98.0}, "list": {"p95_ms": 15.0, "throughput": 70.0}}}
+        rows = {row["scenario"]: row for row in compare(baseline, current, tolerance=0.1)}
+        assert not rows["get"]["regression"]
+        assert rows["list"]["regression"]
+        assert rows["list"]["p95_ratio"] == 1.5
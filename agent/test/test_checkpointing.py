@@ -0,0 +1,62 @@
+import sys
+import pytest
+
+from agent.checkpointing import BoundedMemorySaver, create_checkpointer
+
+class TestCheckpointing:
+    """Test cases for the analyzer checkpointing policies"""
+    
+    def test_checkpoints_are_off_by_default(self, monkeypatch, vision_model, make_analyzer):
+        """Test that one-shot conversions keep no workflow state"""
+        monkeypatch.delenv("AI_CHECKPOINTS", raising=False)
+        assert create_checkpointer() is None
+        
+        analyzer = make_analyzer(vision_model())
+        assert analyzer.checkpointer is None
+        assert analyzer.workflow.checkpointer is None
+    
+    def test_policy_from_environment(self, monkeypatch):
+        """Test that the memory policy is bounded by the environment settings"""
+        monkeypatch.setenv("AI_CHECKPOINTS", "memory")
+        monkeypatch.setenv("AI_CHECKPOINT_MAX_THREADS", "7")
+        checkpointer = create_checkpointer()
+        
+        assert isinstance(checkpointer, BoundedMemorySaver)
+        assert checkpointer.max_threads == 7
+        with pytest.raises(ValueError, match="Unknown checkpoint policy"):
+            create_checkpointer("redis")
+    
+    def test_sqlite_policy_names_missing_package(self, monkeypatch, tmp_path):
+        """Test that the sqlite policy explains which package to install"""
+        # None in sys.modules makes the import fail whether or not the package is installed
+        monkeypatch.setitem(sys.modules, "langgraph.checkpoint.sqlite", None)
+        with pytest.raises(ImportError, match="langgraph-checkpoint-sqlite"):
+            create_checkpointer("sqlite", data_dir=str(tmp_path))
+    
+    def test_memory_stays_bounded_under_load(self, image_paths, vision_model, make_analyzer):
+        """Test that only the most recent runs keep their checkpoints"""
+        checkpointer = BoundedMemorySaver(max_threads=2)
+        analyzer = make_analyzer(vision_model(), checkpointer=checkpointer)
+        
+        for run in range(5):
+            analyzer.analyze_exercise(image_paths[:2], thread_id=f"run-{run}")
+        
+        assert checkpointer.thread_count() == 2
+        assert set(checkpointer.storage) == {"run-3", "run-4"}
+        assert {key[0] for key in checkpointer.blobs} == {"run-3", "run-4"}
+        assert {key[0] for key in checkpointer.writes} <= {"run-3", "run-4"}
+        
+        state = analyzer.workflow.get_state({"configurable": {"thread_id": "run-4"}})
+        assert state.values["exercise"].statement == "1 + 2"
+    
+    def test_idle_threads_expire(self, image_paths, vision_model, make_analyzer, clock):
+        """Test that threads unused for longer than the TTL are dropped"""
+        checkpointer = BoundedMemorySaver(max_threads=10, ttl=60.0, clock=clock)
+        analyzer = make_analyzer(vision_model(), checkpointer=checkpointer)
+        
+        analyzer.analyze_exercise(image_paths[:1], thread_id="old")
+        clock.now = 120.0
+        assert analyzer.workflow.get_state({"configurable": {"thread_id": "old"}}).values == {}
+        
+        analyzer.analyze_exercise(image_paths[:1], thread_id="new")
+        assert set(checkpointer.storage) == {"new"}
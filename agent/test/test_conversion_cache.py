@@ -0,0 +1,77 @@
+from pathlib import Path
+from agent.backend.services.conversion_cache import (
+    ConversionCache, cache_key, create_conversion_cache, image_digest
+)
+
+class TestConversionCache:
+    """Test cases for ConversionCache"""
+    
+    def test_put_and_get_persist_across_instances(self, temp_data_dir):
+        """Test that entries survive a restart"""
+        db_path = Path(temp_data_dir) / "cache.db"
+        cache = ConversionCache(db_path)
+        cache.put("conversion:a", {"exercise_data": {"title": "Limits"}, "confidence_score": 0.9})
+        cache.close()
+        
+        reopened = ConversionCache(db_path)
+        assert reopened.get("conversion:a") == {"exercise_data": {"title": "Limits"}, "confidence_score": 0.9}
+        assert reopened.get("conversion:missing") is None
+        reopened.close()
+    
+    def test_entries_expire(self, temp_data_dir, clock):
+        """Test age-based eviction"""
+        cache = ConversionCache(Path(temp_data_dir) / "cache.db", max_age=60, clock=clock)
+        cache.put("page:a", {"value": 1})
+        
+        clock.now += 30
+        assert cache.get("page:a") == {"value": 1}
+        clock.now += 31
+        assert cache.get("page:a") is None
+        assert len(cache) == 0
+    
+    def test_least_recently_used_entries_are_evicted(self, temp_data_dir, clock):
+        """Test count- and size-based eviction"""
+        cache = ConversionCache(Path(temp_data_dir) / "cache.db", max_entries=2, clock=clock)
+        cache.put("page:a", "a")
+        clock.now += 1
+        cache.put("page:b", "b")
+        clock.now += 1
+        cache.get("page:a")
+        clock.now += 1
+        cache.put("page:c", "c")
+        
+        assert cache.get("page:b") is None
+        assert cache.get("page:a") == "a"
+        assert cache.get("page:c") == "c"
+        
+        # Entries larger than the whole cache are not stored
+        cache.max_bytes = 10
+        cache.put("page:big", "x" * 20)
+        assert cache.get("page:big") is None
+        assert len(cache) == 2
+        
+        clock.now += 1
+        cache.put("page:d", "dddd")
+        assert cache.get("page:a") is None
+        assert len(cache) == 2
+    
+    def test_cache_key(self):
+        """Test that keys depend on the images, their order and the analyzer settings"""
+        first, second = image_digest(b"page one"), image_digest(b"page two")
+        key = cache_key("conversion", "gpt-4o|0.0|2", [first, second])
+        
+        assert key == cache_key("conversion", "gpt-4o|0.0|2", [first, second])
+        assert key != cache_key("conversion", "gpt-4o|0.0|2", [second, first])
+        assert key != cache_key("conversion", "gpt-4o|0.5|2", [first, second])
+        assert key.startswith("conversion:")
+    
+    def test_create_conversion_cache(self, temp_data_dir, monkeypatch):
+        """Test configuring the cache from the environment"""
+        monkeypatch.setenv("AI_CACHE_MAX_ENTRIES", "5")
+        cache = create_conversion_cache(data_dir=temp_data_dir)
+        assert cache.max_entries == 5
+        assert (Path(temp_data_dir) / "conversion_cache.db").exists()
+        cache.close()
+        
+        monkeypatch.setenv("AI_CACHE_ENABLED", "false")
+        assert create_conversion_cache(data_dir=temp_data_dir) is None
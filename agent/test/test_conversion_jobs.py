@@ -0,0 +1,166 @@
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+from agent.backend.models import AIConversionResponse, JobStatus
+from agent.backend.services.ai_service import IncompleteConversionError
+from agent.backend.services.conversion_jobs import ConversionJobStore, ConversionJobQueue
+
+def wait_for(store, job_id):
+    """Wait until a job reaches a final status"""
+    for _ in range(200):
+        job = store.get(job_id)
+        if job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+class TestConversionJobs:
+    """Test cases for the conversion job store and queue"""
+    
+    def test_unfinished_jobs_survive_restart(self, temp_data_dir):
+        """Test that queued and interrupted jobs are resumed by a new process"""
+        db_path = f"{temp_data_dir}/jobs.db"
+        store = ConversionJobStore(db_path)
+        queued = store.create([b"page 1", b"page 2"], ["a.jpg", "b.jpg"])
+        interrupted = store.create([b"page 3"], ["c.jpg"])
+        store.mark_running(interrupted.id)
+        store.record_progress(interrupted.id, "encode_images", None)
+        store.close()
+        
+        ai_service = MagicMock()
+        ai_service.process_image_bytes.return_value = (
+            {"title": "T", "statement": "S", "solution": "R", "category": "Algebra"}, 0.7
+        )
+        restarted = ConversionJobStore(db_path)
+        queue = ConversionJobQueue(restarted, ai_service)
+        assert queue.resume() == 2
+        
+        for job_id in (queued.id, interrupted.id):
+            job = wait_for(restarted, job_id)
+            assert job.status == JobStatus.SUCCEEDED
+            assert job.result.title == "T"
+            assert job.completedNodes == []
+        
+        processed = sorted(call.args[0] for call in ai_service.process_image_bytes.call_args_list)
+        assert processed == [[b"page 1", b"page 2"], [b"page 3"]]
+        
+        # Finished jobs are not resumed again and no longer keep their images
+        assert queue.resume() == 0
+        assert restarted.load_images(queued.id) == ([], [])
+        restarted.close()
+    
+    def test_incomplete_result_fails_job(self, temp_data_dir):
+        """Test that a result rejected by the AI service is reported as a failure"""
+        store = ConversionJobStore(f"{temp_data_dir}/jobs.db")
+        ai_service = MagicMock()
+        ai_service.process_image_bytes.side_effect = IncompleteConversionError(
+            "AI processing failed to extract complete exercise data"
+        )
+        
+        job = ConversionJobQueue(store, ai_service).submit([b"page"], ["a.jpg"])
+        job = wait_for(store, job.id)
+        assert job.status == JobStatus.FAILED
+        assert "complete exercise data" in job.error
+        store.close()
+    
+    def test_failed_job_is_retried_from_saved_pages(self, temp_data_dir):
+        """Test that a retry gets the pages analyzed before the failure"""
+        store = ConversionJobStore(f"{temp_data_dir}/jobs.db")
+        ai_service = MagicMock()
+        calls = []
+        
+        def process_image_bytes(images, filenames, on_progress=None, completed_pages=None, on_page_result=None):
+            calls.append(completed_pages)
+            if len(calls) == 1:
+                on_page_result({"page_index": 0, "raw_analysis": "a", "structured_analysis": {"title": "A"}, "error": None})
+                raise RuntimeError("page 2 failed")
+            return {"title": "T", "statement": "S", "solution": "R", "category": "Algebra"}, 0.7
+        
+        ai_service.process_image_bytes.side_effect = process_image_bytes
+        queue = ConversionJobQueue(store, ai_service)
+        job = wait_for(store, queue.submit([b"page 1", b"page 2"], ["a.jpg", "b.jpg"]).id)
+        assert job.status == JobStatus.FAILED
+        assert queue.resume() == 0
+        
+        retried = queue.retry(job.id)
+        assert retried.status in (JobStatus.QUEUED, JobStatus.RUNNING, JobStatus.SUCCEEDED)
+        job = wait_for(store, job.id)
+        assert job.status == JobStatus.SUCCEEDED
+        assert job.error is None
+        assert calls[1] == [{"page_index": 0, "raw_analysis": "a", "structured_analysis": {"title": "A"}, "error": None}]
+        
+        # Only failed jobs can be retried; finished ones no longer keep pages
+        assert queue.retry(job.id) is None
+        assert store.load_page_results(job.id) == []
+        store.close()
+    
+    def test_jobs_are_claimed_by_one_worker(self, temp_data_dir):
+        """Test that workers sharing the database never run a job twice"""
+        db_path = f"{temp_data_dir}/jobs.db"
+        store = ConversionJobStore(db_path)
+        other_worker = ConversionJobStore(db_path)
+        running = store.create([b"page 1"], ["a.jpg"])
+        orphaned = store.create([b"page 2"], ["b.jpg"])
+        
+        assert store.mark_running(running.id)
+        assert not other_worker.mark_running(running.id)
+        # Hand both jobs to other workers, one of which is gone
+        live_pid, gone_pid = os.getppid(), 2 ** 22 + 1
+        for job_id, pid in ((running.id, live_pid), (orphaned.id, gone_pid)):
+            store._conn.execute(
+                "UPDATE conversion_jobs SET status = 'running', worker_pid = ? WHERE id = ?", (pid, job_id)
+            )
+        
+        # Only the job of the worker that is gone is picked up again
+        with patch("agent.backend.services.conversion_jobs._process_alive", side_effect=lambda pid: pid == live_pid):
+            assert other_worker.unfinished_job_ids() == [orphaned.id]
+        assert store.get(running.id).status == JobStatus.RUNNING
+        assert store.get(orphaned.id).status == JobStatus.QUEUED
+        store.close()
+        other_worker.close()
+    
+    def test_only_successful_pages_count_as_completed(self, temp_data_dir):
+        """Test that a page whose analysis failed is not reported as done"""
+        store = ConversionJobStore(f"{temp_data_dir}/jobs.db")
+        job = store.create([b"page 1", b"page 2"], ["a.jpg", "b.jpg"])
+        store.mark_running(job.id)
+        
+        store.save_page_result(job.id, {"page_index": 0, "raw_analysis": "a", "structured_analysis": {}, "error": None})
+        store.record_progress(job.id, "analyze_page", 0)
+        # The failed page only reports progress; its result is not saved
+        store.record_progress(job.id, "analyze_page", 1)
+        
+        job = store.get(job.id)
+        assert job.pagesCompleted == 1
+        assert job.completedNodes == ["analyze_page", "analyze_page"]
+        store.close()
+    
+    def test_old_finished_jobs_are_purged(self, temp_data_dir):
+        """Test that finished jobs and their stored images are deleted once expired"""
+        store = ConversionJobStore(f"{temp_data_dir}/jobs.db", max_age=3600)
+        succeeded = store.create([b"page 1"], ["a.jpg"])
+        failed = store.create([b"page 2"], ["b.jpg"])
+        queued = store.create([b"page 3"], ["c.jpg"])
+        recent = store.create([b"page 4"], ["d.jpg"])
+        store.complete(succeeded.id, AIConversionResponse(
+            title="T", statement="S", solution="R", category="Algebra", confidenceScore=0.5
+        ))
+        store.save_page_result(failed.id, {"page_index": 0, "raw_analysis": "a", "structured_analysis": {}, "error": None})
+        store.fail(failed.id, "page 2 failed")
+        store.fail(recent.id, "page 4 failed")
+        store._conn.execute(
+            "UPDATE conversion_jobs SET updated_at = '2000-01-01T00:00:00' WHERE id IN (?, ?, ?)",
+            (succeeded.id, failed.id, queued.id)
+        )
+        
+        assert store.purge_expired() == 2
+        assert store.get(succeeded.id) is None
+        assert store.get(failed.id) is None
+        assert store.load_images(failed.id) == ([], [])
+        assert store.load_page_results(failed.id) == []
+        # Unfinished jobs are kept however old, finished ones until they expire
+        assert store.get(queued.id).status == JobStatus.QUEUED
+        assert store.load_images(queued.id) == ([b"page 3"], ["c.jpg"])
+        assert store.get(recent.id).status == JobStatus.FAILED
+        store.close()
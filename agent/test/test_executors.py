@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import pytest
+
+from agent.backend import executors
+
+class TestExecutors:
+    """Test cases for the blocking-work thread pools"""
+    
+    @pytest.fixture(autouse=True)
+    def fresh_executors(self):
+        """Start and end every test with unconfigured pools"""
+        executors.shutdown_executors()
+        yield
+        executors.shutdown_executors()
+    
+    def test_pool_sizes_come_from_environment(self, monkeypatch):
+        """Test that pool sizes are configurable"""
+        monkeypatch.setenv("STORAGE_MAX_WORKERS", "3")
+        monkeypatch.setenv("AI_MAX_CONCURRENCY", "1")
+        
+        assert executors.get_storage_executor()._max_workers == 3
+        assert executors.get_ai_executor()._max_workers == 1
+    
+    def test_invalid_pool_size(self, monkeypatch):
+        """Test that a bad pool size is reported clearly"""
+        monkeypatch.setenv("AI_MAX_CONCURRENCY", "0")
+        with pytest.raises(ValueError, match="AI_MAX_CONCURRENCY"):
+            executors.get_ai_executor()
+    
+    def test_ai_concurrency_is_capped(self, monkeypatch):
+        """Test that conversions beyond the limit wait for a free worker"""
+        monkeypatch.setenv("AI_MAX_CONCURRENCY", "2")
+        lock = threading.Lock()
+        running = []
+        peak = []
+        
+        def conversion(index):
+            with lock:
+                running.append(index)
+                peak.append(len(running))
+            threading.Event().wait(0.05)
+            with lock:
+                running.remove(index)
+            return index
+        
+        async def convert_all():
+            return await asyncio.gather(*(executors.run_ai(conversion, index) for index in range(6)))
+        
+        assert asyncio.run(convert_all()) == list(range(6))
+        assert max(peak) == 2
+    
+    def test_shutdown_cancels_waiting_conversions(self, monkeypatch):
+        """Test that shutdown finishes the running conversion but does not start queued ones"""
+        monkeypatch.setenv("AI_MAX_CONCURRENCY", "1")
+        started = threading.Event()
+        release = threading.Event()
+        
+        def conversion():
+            started.set()
+            release.wait(5)
+        
+        running = executors.get_ai_executor().submit(conversion)
+        queued = [executors.get_ai_executor().submit(conversion) for _ in range(3)]
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+        executors.shutdown_executors(wait=True)
+        
+        assert running.done() and not running.cancelled()
+        assert all(future.cancelled() for future in queued)
+    
+    def test_run_storage_passes_arguments(self):
+        """Test that positional and keyword arguments reach the call"""
+        result = asyncio.run(executors.run_storage(lambda a, b=0: (a, b, threading.current_thread().name), 1, b=2))
+        assert result[:2] == (1, 2)
+        assert result[2].startswith("storage")
+    
+    def test_iterate_ai_forwards_items_and_errors(self):
+        """Test that generator items arrive in order and its exception is re-raised"""
+        def pages():
+            yield threading.current_thread().name
+            yield 1
+            raise RuntimeError("page failed")
+        
+        async def collect(items):
+            async for item in executors.iterate_ai(pages):
+                items.append(item)
+        
+        items = []
+        with pytest.raises(RuntimeError, match="page failed"):
+            asyncio.run(collect(items))
+        assert items[0].startswith("ai")
+        assert items[1:] == [1]
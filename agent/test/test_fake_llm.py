@@ -0,0 +1,79 @@
+import time
+import pytest
+from langchain_core.messages import HumanMessage
+from PIL import Image
+
+from agent.backend.models import Category
+from agent.fake_llm import LEVELS, FakeChatModel, FakeLLMConfig, FakeLLMError
+from agent.math_agent_v0 import MathExerciseAnalyzer, PageAnalysis, create_chat_model
+
+class TestFakeChatModel:
+    """Test cases for the offline stand-in chat model"""
+    
+    def test_answers_are_deterministic(self):
+        """Test that the same prompt always gets the same answer, with token usage"""
+        model = FakeChatModel(config=FakeLLMConfig(output_tokens=50))
+        first = model.invoke([HumanMessage(content="Transcribe page 1")])
+        second = FakeChatModel(config=FakeLLMConfig(output_tokens=50)).invoke([HumanMessage(content="Transcribe page 1")])
+        other = model.invoke([HumanMessage(content="Transcribe page 2")])
+        
+        assert first.content == second.content != other.content
+        assert len(first.content.split()) == 50
+        assert first.usage_metadata["output_tokens"] > 0
+    
+    def test_structured_output_is_schema_valid(self):
+        """Test that structured calls return instances of the requested schema"""
+        structured = FakeChatModel().with_structured_output(PageAnalysis)
+        analysis = structured.invoke([HumanMessage(content="page 1 of 2")])
+        
+        assert isinstance(analysis, PageAnalysis)
+        assert analysis.statement
+        # Domains must be categories the backend accepts
+        assert analysis.domain in [category.value for category in Category]
+        assert analysis.level in LEVELS
+        assert 0.0 <= analysis.confidence_score <= 1.0
+    
+    def test_error_rate_and_latency(self):
+        """Test that configured failures and latency are simulated"""
+        failing = FakeChatModel(config=FakeLLMConfig(error_rate=1.0))
+        with pytest.raises(FakeLLMError):
+            failing.invoke("hello")
+        
+        slow = FakeChatModel(config=FakeLLMConfig(latency=0.05, latency_spread=0.01, latency_distribution="uniform", seed=1))
+        started = time.monotonic()
+        slow.invoke("hello")
+        assert time.monotonic() - started >= 0.04
+    
+    def test_invalid_config(self):
+        """Test that bad settings are rejected"""
+        with pytest.raises(ValueError):
+            FakeLLMConfig(latency_distribution="pareto")
+        with pytest.raises(ValueError):
+            FakeLLMConfig(error_rate=1.5)
+    
+    def test_backend_selected_from_environment(self, monkeypatch, tmp_path):
+        """Test that AI_LLM_BACKEND=fake runs the whole workflow offline"""
+        monkeypatch.setenv("AI_LLM_BACKEND", "fake")
+        monkeypatch.setenv("AI_FAKE_OUTPUT_TOKENS", "20")
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        
+        paths = []
+        for index in range(2):
+            path = tmp_path / f"page{index}.png"
+            Image.new("RGB", (64, 64), (index * 100, 0, 0)).save(path)
+            paths.append(str(path))
+        
+        analyzer = MathExerciseAnalyzer()
+        assert isinstance(analyzer.llm, FakeChatModel)
+        assert analyzer.cache_namespace.startswith("fake:")
+        
+        exercise = analyzer.analyze_exercise(paths)
+        assert exercise.statement
+        # Token usage of the structured page calls and the combine call is reported
+        assert exercise.metrics["nodes"]["analyze_page"]["promptTokens"] > 0
+        assert exercise.metrics["nodes"]["combine_analyses"]["completionTokens"] > 0
+        assert exercise.metrics["estimatedCost"] > 0
+        assert exercise.title == analyzer.analyze_exercise(paths).title
+        
+        with pytest.raises(ValueError, match="Unknown LLM backend"):
+            create_chat_model("other")
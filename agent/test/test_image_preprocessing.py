@@ -0,0 +1,117 @@
+import io
+import pytest
+from PIL import Image, ImageDraw
+
+from agent.image_preprocessing import ImagePreprocessingConfig, preprocess_image
+
+def make_image(size=(400, 300), box=(100, 100, 200, 150), format="PNG", exif=None) -> bytes:
+    """White page with a black block of "ink" """
+    image = Image.new("RGB", size, "white")
+    if box is not None:
+        ImageDraw.Draw(image).rectangle(box, fill="black")
+    output = io.BytesIO()
+    if exif is not None:
+        image.save(output, format=format, exif=exif)
+    else:
+        image.save(output, format=format)
+    return output.getvalue()
+
+def open_result(result) -> Image.Image:
+    return Image.open(io.BytesIO(result[0]))
+
+class TestImagePreprocessing:
+    """Test cases for preprocess_image"""
+    
+    def test_grayscale_jpeg_output(self):
+        """Test that any input becomes a grayscale JPEG labelled with its MIME type"""
+        result = preprocess_image(make_image(format="PNG"), ImagePreprocessingConfig(crop=False))
+        
+        image = open_result(result)
+        assert result[1] == "image/jpeg"
+        assert image.format == "JPEG"
+        assert image.mode == "L"
+        assert image.size == (400, 300)
+    
+    def test_crop_to_content(self):
+        """Test cropping to the written area plus a margin"""
+        result = preprocess_image(make_image(), ImagePreprocessingConfig(crop_margin=0.05))
+        
+        # 101x51 block plus 5% of 400 (20px) and of 300 (15px) on each side
+        assert open_result(result).size == (141, 81)
+    
+    @pytest.mark.parametrize("mode", ["RGBA", "LA", "P"])
+    def test_transparent_background_becomes_white(self, mode):
+        """Test that transparent areas are treated as paper rather than ink"""
+        image = Image.new("RGBA", (400, 300), (0, 0, 0, 0))
+        ImageDraw.Draw(image).rectangle((100, 100, 200, 150), fill=(0, 0, 0, 255))
+        if mode == "P":
+            image = image.convert("P")
+            image.info["transparency"] = image.getpixel((0, 0))
+        else:
+            image = image.convert(mode)
+        output = io.BytesIO()
+        image.save(output, format="PNG")
+        
+        result = open_result(preprocess_image(output.getvalue(), ImagePreprocessingConfig(crop_margin=0.05)))
+        
+        assert result.size == (141, 81)
+        assert result.getpixel((5, 5)) > 245
+        assert result.getpixel((70, 40)) < 10
+    
+    def test_blank_page_is_not_cropped(self):
+        """Test that a page without content keeps its size"""
+        result = preprocess_image(make_image(size=(50, 40), box=None), ImagePreprocessingConfig())
+        assert open_result(result).size == (50, 40)
+    
+    def test_downscale_to_max_edge(self):
+        """Test that large photos are downscaled keeping their aspect ratio"""
+        result = preprocess_image(
+            make_image(size=(4000, 1000), box=(0, 0, 3999, 999)),
+            ImagePreprocessingConfig(max_edge=1600)
+        )
+        assert open_result(result).size == (1600, 400)
+    
+    def test_exif_orientation_is_applied(self):
+        """Test that photos are rotated upright from their EXIF orientation"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotate 90 degrees clockwise to display
+        source = make_image(size=(400, 300), format="JPEG", exif=exif)
+        
+        result = preprocess_image(source, ImagePreprocessingConfig(crop=False))
+        assert open_result(result).size == (300, 400)
+    
+    def test_webp_output(self):
+        """Test the alternative output format"""
+        result = preprocess_image(make_image(), ImagePreprocessingConfig(output_format="WEBP", grayscale=False))
+        assert result[1] == "image/webp"
+        assert open_result(result).format == "WEBP"
+    
+    def test_disabled_returns_original_bytes(self):
+        """Test that preprocessing can be turned off"""
+        source = make_image(format="PNG")
+        assert preprocess_image(source, ImagePreprocessingConfig(enabled=False)) == (source, "image/png")
+    
+    @pytest.mark.parametrize("format", ["TIFF", "BMP"])
+    def test_disabled_reencodes_unsupported_formats(self, format):
+        """Test that formats the vision API rejects are sent as JPEG even without preprocessing"""
+        result = preprocess_image(make_image(format=format), ImagePreprocessingConfig(enabled=False))
+        
+        image = open_result(result)
+        assert result[1] == "image/jpeg"
+        assert image.format == "JPEG"
+        assert image.size == (400, 300)
+    
+    def test_config_from_env(self, monkeypatch):
+        """Test reading settings from the environment"""
+        monkeypatch.setenv("AI_IMAGE_MAX_EDGE", "1024")
+        monkeypatch.setenv("AI_IMAGE_GRAYSCALE", "false")
+        monkeypatch.setenv("AI_IMAGE_FORMAT", "webp")
+        
+        config = ImagePreprocessingConfig.from_env()
+        assert config.max_edge == 1024
+        assert config.grayscale is False
+        assert config.output_format == "WEBP"
+        assert config.fingerprint != ImagePreprocessingConfig().fingerprint
+        
+        with pytest.raises(ValueError):
+            ImagePreprocessingConfig(output_format="TIFF")
@@ -0,0 +1,34 @@
+from agent.backend.services.invalidation import InvalidationLog
+
+class TestInvalidationLog:
+    """Test cases for the shared invalidation log"""
+    
+    def test_changes_are_seen_by_other_instances(self, temp_data_dir):
+        """Test that a change published through one mapping is read through another"""
+        writer = InvalidationLog(f"{temp_data_dir}/changes")
+        reader = InvalidationLog(f"{temp_data_dir}/changes")
+        assert reader.changes_since(0) == (0, [])
+        
+        writer.publish("exercise_a")
+        writer.publish("exercise_b")
+        writer.publish("exercise_a")
+        assert reader.generation() == 3
+        assert reader.changes_since(1) == (3, ["exercise_b", "exercise_a"])
+        
+        # Reopening keeps the published generation
+        writer.close()
+        assert InvalidationLog(f"{temp_data_dir}/changes").generation() == 3
+        reader.close()
+    
+    def test_readers_too_far_behind_must_reload_everything(self, temp_data_dir):
+        """Test that keys overwritten in the ring or too long to record are reported unknown"""
+        log = InvalidationLog(f"{temp_data_dir}/changes", capacity=4)
+        for index in range(6):
+            log.publish(f"exercise_{index}")
+        
+        assert log.changes_since(1) == (6, None)
+        assert log.changes_since(2) == (6, ["exercise_2", "exercise_3", "exercise_4", "exercise_5"])
+        
+        log.publish("x" * 100)
+        assert log.changes_since(5) == (7, None)
+        log.close()
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+from agent.backend.services.latex_tokenizer import tokenize_latex
+from agent.backend.services.search_index import SearchIndex
+
+class TestLatexTokenizer:
+    """Test cases for the LaTeX-aware search tokenizer"""
+    
+    def test_commands_are_normalized(self):
+        """Test that math commands become search words"""
+        assert tokenize_latex(r"$\int_{0}^{1} \frac{1}{x} dx$")[:1] == ["integral"]
+        assert "fraction" in tokenize_latex(r"\frac{a}{b}")
+        assert tokenize_latex(r"\sqrt{2}") == ["sqrt", "root", "2"]
+        assert tokenize_latex(r"\alpha + \Delta") == ["alpha", "delta"]
+        assert tokenize_latex(r"\lim_{n \to \infty}") == ["limit", "n", "to", "infinity"]
+    
+    def test_formatting_macros_are_stripped(self):
+        """Test that formatting and spacing macros produce no tokens"""
+        assert tokenize_latex(r"\left( \mathbf{v} \right) \quad \displaystyle") == ["v"]
+        assert tokenize_latex(r"\text{if } x") == ["if", "x"]
+        assert tokenize_latex(r"\begin{pmatrix} 1 & 2 \end{pmatrix}") == ["matrix", "1", "2"]
+        assert tokenize_latex(r"\begin{align} y \end{align}") == ["y"]
+    
+    def test_scripts_are_canonicalized(self):
+        """Test that equivalent superscript and subscript notations give the same tokens"""
+        expected = ["x", "2", "x_pow_2"]
+        assert tokenize_latex("x^2") == expected
+        assert tokenize_latex("x^{2}") == expected
+        assert tokenize_latex("x²") == expected
+        assert tokenize_latex("x_{i}") == ["x", "i", "x_sub_i"]
+        assert tokenize_latex("x^23") == ["x", "2", "x_pow_2", "3"]
+        assert tokenize_latex(r"\sin^2 \theta") == ["sin", "2", "sin_pow_2", "theta"]
+        assert tokenize_latex("x^{y^{2}}") == ["x", "y", "2", "y_pow_2"]
+        assert tokenize_latex("x^{2") == expected
+    
+    def test_deeply_nested_braces(self):
+        """Test that nesting depth is not limited by the interpreter stack"""
+        assert tokenize_latex("{" * 5000 + "x" + "}" * 5000) == ["x"]
+    
+    def test_words_are_lowercased_without_accents(self):
+        """Test prose normalization"""
+        assert tokenize_latex("Résoudre l'Équation") == ["resoudre", "l", "equation"]
+        assert tokenize_latex("5x + 3") == ["5", "x", "3"]
+        assert tokenize_latex("") == []
+    
+    def test_unicode_symbols(self):
+        """Test that unicode math symbols match their LaTeX commands"""
+        assert tokenize_latex("∫ f") == tokenize_latex(r"\int f")
+        assert tokenize_latex("2π") == ["2", "pi"]
+    
+    def test_search_matches_latex_notation(self):
+        """Test that word and LaTeX queries hit the same exercises"""
+        index = SearchIndex()
+        index.add("integral", {"title": "Area", "statement": r"Compute $\int_{a}^{b} x^{2} dx$", "solution": ""})
+        index.add("square", {"title": "Roots", "statement": r"Solve $x^3 = 8$", "solution": ""})
+        
+        assert [doc_id for doc_id, _ in index.search("integral")] == ["integral"]
+        assert [doc_id for doc_id, _ in index.search(r"\int")] == ["integral"]
+        assert [doc_id for doc_id, _ in index.search("x^2")] == ["integral"]
+        assert [doc_id for doc_id, _ in index.search("x²")] == ["integral"]
+    
+    def test_unchanged_text_is_not_retokenized(self):
+        """Test that token streams are computed once per text version"""
+        index = SearchIndex()
+        fields = {"title": "Area", "statement": r"$\int x$", "solution": ""}
+        index.add("a", fields)
+        
+        with patch("agent.backend.services.search_index.tokenize") as mock_tokenize:
+            index.add("a", dict(fields))
+            mock_tokenize.assert_not_called()
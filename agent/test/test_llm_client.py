@@ -0,0 +1,157 @@
+import random
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from agent.llm_client import (
+    CircuitBreaker, LLMClient, LLMClientConfig, LLMUnavailableError, TokenBucket, is_retryable, retry_after
+)
+from agent.metrics import ConversionMetrics, node_scope
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class ProviderError(Exception):
+    """Error shaped like the OpenAI SDK's APIStatusError"""
+    
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers)
+
+def flaky(errors, result="ok"):
+    """Runnable raising the given errors in turn, then returning result"""
+    remaining = list(errors)
+    calls = []
+    
+    def call(input):
+        calls.append(input)
+        if remaining:
+            raise remaining.pop(0)
+        return result
+    return RunnableLambda(call), calls
+
+def make_client(clock, **settings):
+    return LLMClient(LLMClientConfig(**settings), clock=clock, sleep=clock.sleep, rng=random.Random(0))
+
+class TestLLMClient:
+    """Test cases for the shared model call layer"""
+    
+    def test_transient_errors_are_retried_with_backoff(self, clock):
+        """Test that 5xx errors are retried with jittered, growing delays"""
+        client = make_client(clock, backoff_base=1.0, backoff_max=3.0)
+        runnable, calls = flaky([ProviderError(500), ProviderError(502), TimeoutError()])
+        
+        assert client.invoke(runnable, "prompt") == "ok"
+        assert len(calls) == 4
+        assert len(clock.sleeps) == 3
+        assert all(0 <= delay <= ceiling for delay, ceiling in zip(clock.sleeps, [1.0, 2.0, 3.0]))
+    
+    def test_calls_and_retries_are_counted(self, clock):
+        """Test that every attempt and retry is charged to the running node"""
+        client = make_client(clock)
+        runnable, calls = flaky([ProviderError(503)])
+        conversion = ConversionMetrics()
+        
+        with node_scope("combine_analyses", conversion):
+            client.invoke(runnable, "prompt")
+        metrics = conversion.snapshot()["nodes"]["combine_analyses"]
+        assert metrics["llmCalls"] == 2
+        assert metrics["retries"] == 1
+    
+    def test_retry_after_is_honored(self, clock):
+        """Test that the provider's requested wait replaces the backoff"""
+        client = make_client(clock, rate=10.0)
+        runnable, calls = flaky([ProviderError(429, {"retry-after": "2"})])
+        
+        assert client.invoke(runnable, "prompt") == "ok"
+        assert clock.sleeps[0] == 2.0
+        assert retry_after(ProviderError(429, {"retry-after-ms": "250"})) == 0.25
+        # Throttling says nothing about the provider's health
+        assert client.breaker.state == "closed"
+    
+    def test_retry_after_is_capped(self, clock):
+        """Test that a very long requested wait is cut to backoff_max"""
+        client = make_client(clock, rate=10.0, backoff_max=5.0)
+        runnable, calls = flaky([ProviderError(429, {"retry-after": "86400"})])
+        
+        assert client.invoke(runnable, "prompt") == "ok"
+        assert clock.sleeps[0] == 5.0
+    
+    def test_permanent_errors_are_not_retried(self, clock):
+        """Test that bad requests and invalid output fail right away"""
+        client = make_client(clock)
+        runnable, calls = flaky([ProviderError(400)])
+        
+        with pytest.raises(ProviderError):
+            client.invoke(runnable, "prompt")
+        assert len(calls) == 1
+        assert not is_retryable(ValueError("invalid JSON"))
+    
+    def test_gives_up_after_max_attempts(self, clock):
+        """Test that the last error is raised once attempts are exhausted"""
+        client = make_client(clock, max_attempts=2)
+        runnable, calls = flaky([ProviderError(503)] * 5)
+        
+        with pytest.raises(ProviderError):
+            client.invoke(runnable, "prompt")
+        assert len(calls) == 2
+    
+    def test_circuit_breaker_fails_fast_and_recovers(self, clock):
+        """Test that the circuit opens after repeated failures and closes after a good trial call"""
+        client = make_client(clock, max_attempts=1, breaker_threshold=2, breaker_reset=30.0)
+        runnable, calls = flaky([ProviderError(503)] * 2)
+        
+        for _ in range(2):
+            with pytest.raises(ProviderError):
+                client.invoke(runnable, "prompt")
+        with pytest.raises(LLMUnavailableError):
+            client.invoke(runnable, "prompt")
+        assert len(calls) == 2
+        
+        clock.now += 30.0
+        assert client.breaker.state == "half-open"
+        assert client.invoke(runnable, "prompt") == "ok"
+        assert client.breaker.state == "closed"
+    
+    def test_failed_trial_call_reopens_circuit(self, clock):
+        """Test that a failing half-open trial opens the circuit again"""
+        breaker = CircuitBreaker(threshold=1, reset_timeout=10.0, clock=clock)
+        breaker.record_failure()
+        clock.now = 10.0
+        breaker.before_call()
+        with pytest.raises(LLMUnavailableError):
+            breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == "open"
+    
+    def test_throttled_trial_call_does_not_wedge_circuit(self, clock):
+        """Test that a trial call answered with 429 re-opens the circuit instead of blocking it for good"""
+        client = make_client(clock, max_attempts=1, breaker_threshold=1, breaker_reset=30.0)
+        runnable, calls = flaky([ProviderError(503), ProviderError(429)])
+        
+        with pytest.raises(ProviderError):
+            client.invoke(runnable, "prompt")
+        clock.now += 30.0
+        with pytest.raises(ProviderError):
+            client.invoke(runnable, "prompt")
+        assert client.breaker.state == "open"
+        
+        clock.now += 30.0
+        assert client.invoke(runnable, "prompt") == "ok"
+        assert client.breaker.state == "closed"
+        assert len(calls) == 3
+    
+    def test_token_bucket_spaces_requests(self, clock):
+        """Test that requests beyond the burst wait for the configured rate"""
+        bucket = TokenBucket(rate=2.0, capacity=2, clock=clock, sleep=clock.sleep)
+        
+        for _ in range(6):
+            bucket.acquire()
+        # Two immediately, then one every half second
+        assert clock.now == pytest.approx(2.0)
+        
+        bucket.pause(5.0)
+        bucket.acquire()
+        assert clock.now == pytest.approx(7.0)
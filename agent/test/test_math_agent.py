@@ -0,0 +1,180 @@
+import time
+import pytest
+
+from agent.math_agent_v0 import RESULT_EVENT
+
+class TestMathExerciseAnalyzer:
+    """Test cases for the page fan-out of MathExerciseAnalyzer"""
+    
+    def test_pages_are_analyzed_concurrently_and_gathered_in_order(self, image_paths, vision_model, make_analyzer):
+        """Test that pages run in parallel up to the cap and are combined in page order"""
+        model = vision_model(delay=0.2)
+        analyzer = make_analyzer(model, max_concurrency=5)
+        
+        started = time.monotonic()
+        exercise = analyzer.analyze_exercise(image_paths)
+        elapsed = time.monotonic() - started
+        
+        assert exercise.statement == "1 + 2 + 3 + 4 + 5"
+        assert model.peak == 5
+        assert elapsed < 0.2 * 5
+    
+    def test_concurrency_cap(self, image_paths, vision_model, make_analyzer):
+        """Test that no more than max_concurrency pages are analyzed at once"""
+        model = vision_model(delay=0.05)
+        analyzer = make_analyzer(model, max_concurrency=2)
+        
+        analyzer.analyze_exercise(image_paths)
+        assert model.peak == 2
+    
+    def test_failed_page_fails_the_analysis(self, image_paths, vision_model, make_analyzer):
+        """Test that an error on any page is reported"""
+        analyzer = make_analyzer(vision_model(fail_page=3))
+        
+        with pytest.raises(Exception, match="Failed to analyze image 3"):
+            analyzer.analyze_exercise(image_paths)
+    
+    def test_retry_only_redoes_failed_pages(self, image_paths, vision_model, make_analyzer):
+        """Test that a failed run stops early and a retry reuses the pages that succeeded"""
+        model = vision_model(fail_page=4)
+        analyzer = make_analyzer(model)
+        saved = []
+        progress = []
+        
+        with pytest.raises(Exception, match="Failed to analyze image 4"):
+            analyzer.analyze_exercise(
+                image_paths, on_progress=lambda node, page: progress.append(node), on_page_result=saved.append
+            )
+        # The failure short-circuits to the end: nothing is combined or validated
+        assert progress[-1] == "gather_pages"
+        assert sorted(result["page_index"] for result in saved) == [0, 1, 2, 4]
+        
+        model.fail_page = None
+        model.calls = 0
+        exercise = analyzer.analyze_exercise(image_paths, completed_pages=saved)
+        assert exercise.statement == "1 + 2 + 3 + 4 + 5"
+        # Page 4 and the combine call only
+        assert model.calls == 2
+    
+    def test_single_page_skips_combine_call(self, image_paths, vision_model, make_analyzer):
+        """Test the single image path"""
+        analyzer = make_analyzer(vision_model())
+        
+        exercise = analyzer.analyze_single_image(image_paths[0])
+        assert exercise.title == "Page 1"
+        assert exercise.image_paths == image_paths[:1]
+    
+    def test_metrics_are_recorded_per_node(self, image_paths, vision_model, make_analyzer):
+        """Test that every node is timed and charged for its model calls and image bytes"""
+        analyzer = make_analyzer(vision_model(), structured_output=False)
+        
+        exercise = analyzer.analyze_exercise(image_paths[:3])
+        nodes = exercise.metrics["nodes"]
+        
+        assert set(nodes) == {"encode_images", "analyze_page", "gather_pages", "combine_analyses", "validate_results"}
+        assert nodes["analyze_page"]["runs"] == 3
+        # Two-step mode: a vision call and a structuring call per page
+        assert nodes["analyze_page"]["llmCalls"] == 6
+        assert nodes["analyze_page"]["imageBytes"] > 0
+        assert nodes["combine_analyses"]["llmCalls"] == 1
+        assert nodes["encode_images"]["llmCalls"] == 0
+        assert exercise.metrics["totalTime"] >= nodes["combine_analyses"]["wallTime"] > 0
+    
+    def test_structured_output_uses_one_call_per_page(self, image_paths, vision_model, make_analyzer):
+        """Test that one-shot extraction skips the structuring round-trip"""
+        model = vision_model()
+        analyzer = make_analyzer(model)
+        
+        exercise = analyzer.analyze_exercise(image_paths)
+        assert exercise.statement == "1 + 2 + 3 + 4 + 5"
+        # One call per page plus the combine call
+        assert model.calls == len(image_paths) + 1
+    
+    def test_invalid_structured_output_falls_back_to_two_step(self, image_paths, vision_model, make_analyzer):
+        """Test that invalid one-shot output is retried through analyze + structure"""
+        model = vision_model(invalid_structured_output=True)
+        analyzer = make_analyzer(model)
+        
+        exercise = analyzer.analyze_exercise(image_paths)
+        assert exercise.statement == "1 + 2 + 3 + 4 + 5"
+        assert model.calls == 3 * len(image_paths) + 1
+    
+    def test_provider_error_does_not_fall_back(self, image_paths, vision_model, make_analyzer):
+        """Test that a failed one-shot call is reported instead of being retried through two more calls"""
+        model = vision_model(fail_page=3)
+        analyzer = make_analyzer(model)
+        
+        with pytest.raises(Exception, match="Failed to analyze image 3: vision call failed"):
+            analyzer.analyze_exercise(image_paths)
+        # One call per page, nothing more for page 3, and no combine call
+        assert model.calls == len(image_paths)
+    
+    def test_two_step_mode(self, image_paths, vision_model, make_analyzer):
+        """Test that structured output can be turned off"""
+        model = vision_model()
+        analyzer = make_analyzer(model, structured_output=False)
+        
+        analyzer.analyze_exercise(image_paths)
+        assert model.calls == 2 * len(image_paths) + 1
+    
+    def test_page_cache_reuses_overlapping_pages(self, image_paths, tmp_path, vision_model, make_analyzer):
+        """Test that pages already analyzed are not sent to the model again"""
+        from agent.backend.services.conversion_cache import ConversionCache, cache_key, image_digest
+        
+        cache = ConversionCache(tmp_path / "cache.db")
+        model = vision_model()
+        analyzer = make_analyzer(model, page_cache=cache)
+        
+        analyzer.analyze_exercise(image_paths[:3])
+        assert model.calls == 3 + 1
+        # Pages are keyed with the same scheme as whole uploads
+        with open(image_paths[0], "rb") as image:
+            assert cache.get(cache_key("page", analyzer.cache_namespace, [image_digest(image.read())])) is not None
+        
+        # Pages 1-3 come from the cache; only pages 4-5 and the combine step hit the model
+        exercise = analyzer.analyze_exercise(image_paths)
+        assert exercise.statement == "1 + 2 + 3 + 4 + 5"
+        assert model.calls == (3 + 1) + (2 + 1)
+        cache.close()
+    
+    def test_images_can_be_given_in_memory(self, monkeypatch, image_paths, vision_model, make_analyzer):
+        """Test that bytes and file objects are analyzed like files, without writing to disk"""
+        import io
+        analyzer = make_analyzer(vision_model())
+        contents = [open(path, "rb").read() for path in image_paths[:3]]
+        from_files = analyzer.analyze_exercise(image_paths[:3])
+        
+        monkeypatch.setattr("tempfile.NamedTemporaryFile", None)
+        exercise = analyzer.analyze_exercise(
+            [contents[0], io.BytesIO(contents[1]), contents[2]], image_names=["a.png", "b.png", "c.png"]
+        )
+        
+        assert exercise.statement == from_files.statement == "1 + 2 + 3"
+        assert exercise.image_paths == ["a.png", "b.png", "c.png"]
+        assert analyzer.analyze_exercise([contents[0]]).image_paths == ["<image 1>"]
+    
+    def test_stream_exercise_yields_updates_then_result(self, image_paths, vision_model, make_analyzer):
+        """Test that each page's analysis is streamed before the exercise is combined"""
+        analyzer = make_analyzer(vision_model())
+        
+        events = list(analyzer.stream_exercise(image_paths[:2]))
+        names = [name for name, update in events]
+        
+        assert names[0] == "encode_images"
+        assert names[-2:] == ["validate_results", RESULT_EVENT]
+        pages = [update["page_results"][0] for name, update in events if name == "analyze_page"]
+        assert sorted(page["structured_analysis"]["title"] for page in pages) == ["Page 1", "Page 2"]
+        assert names.index("combine_analyses") > max(i for i, name in enumerate(names) if name == "analyze_page")
+        assert events[-1][1]["exercise"].statement == "1 + 2"
+    
+    def test_progress_callback_reports_each_node(self, image_paths, vision_model, make_analyzer):
+        """Test that streaming runs report every finished node"""
+        analyzer = make_analyzer(vision_model())
+        progress = []
+        
+        exercise = analyzer.analyze_exercise(image_paths[:3], on_progress=lambda node, page: progress.append((node, page)))
+        
+        assert exercise.statement == "1 + 2 + 3"
+        assert progress[0] == ("encode_images", None)
+        assert sorted(page for node, page in progress if node == "analyze_page") == [0, 1, 2]
+        assert progress[-3:] == [("gather_pages", None), ("combine_analyses", None), ("validate_results", None)]
@@ -0,0 +1,79 @@
+import threading
+import pytest
+
+from agent.metrics import ConversionMetrics, MetricsRegistry, node_scope, record_image_bytes, record_tokens, token_cost
+
+class TestMetricsRegistry:
+    """Test cases for the Prometheus-style metrics"""
+    
+    def test_render_text_format(self):
+        """Test that counters, gauges and histograms render in the exposition format"""
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests served", ["path"])
+        in_flight = registry.gauge("in_flight", "Requests in progress")
+        latency = registry.histogram("latency_seconds", "Request latency", buckets=(0.1, 1.0))
+        
+        requests.inc(path="/a")
+        requests.inc(2, path='/b"c')
+        in_flight.set_function(lambda: 3)
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+        
+        text = registry.render()
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{path="/a"} 1' in text
+        assert 'requests_total{path="/b\\"c"} 2' in text
+        assert "in_flight 3" in text
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert "latency_seconds_count 3" in text
+        assert "latency_seconds_sum 5.55" in text
+    
+    def test_metrics_are_registered_once(self):
+        """Test that asking for a metric twice returns it, and labels are checked"""
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Calls", ["node"])
+        assert registry.counter("calls_total", "Calls", ["node"]) is counter
+        
+        with pytest.raises(ValueError):
+            registry.gauge("calls_total", "Calls")
+        with pytest.raises(ValueError):
+            counter.inc(other="x")
+        with pytest.raises(ValueError):
+            counter.inc(-1, node="x")
+
+class TestConversionMetrics:
+    """Test cases for the per-node accounting of a conversion"""
+    
+    def test_usage_is_charged_to_the_running_node(self, monkeypatch):
+        """Test that tokens, bytes and cost go to the node in scope, from any thread"""
+        monkeypatch.setenv("AI_PROMPT_TOKEN_PRICE", "1.0")
+        monkeypatch.setenv("AI_COMPLETION_TOKEN_PRICE", "2.0")
+        conversion = ConversionMetrics()
+        
+        def page():
+            with node_scope("analyze_page", conversion):
+                record_image_bytes(100)
+                record_tokens(1000, 500)
+        
+        threads = [threading.Thread(target=page) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with node_scope("combine_analyses", conversion):
+            record_tokens(10, 5)
+        # Usage outside any node is only counted process-wide
+        record_tokens(99, 99)
+        
+        snapshot = conversion.snapshot()
+        page_metrics = snapshot["nodes"]["analyze_page"]
+        assert page_metrics["runs"] == 4
+        assert page_metrics["imageBytes"] == 400
+        assert page_metrics["promptTokens"] == 4000
+        assert page_metrics["estimatedCost"] == pytest.approx(4 * token_cost(1000, 500))
+        assert snapshot["promptTokens"] == 4010
+        assert snapshot["completionTokens"] == 2005
+        assert snapshot["estimatedCost"] == pytest.approx((4010 * 1.0 + 2005 * 2.0) / 1_000_000)
@@ -0,0 +1,70 @@
+from agent.backend.services.search_index import SearchIndex, tokenize, tokenize_query
+
+class TestSearchIndex:
+    """Test cases for the inverted search index"""
+    
+    def _build_index(self):
+        index = SearchIndex()
+        index.add("quadratic", {
+            "title": "Solving Quadratic Equations",
+            "statement": "Solve $x^2 - 5x + 6 = 0$ by factoring.",
+            "solution": "Factor the equation into $(x - 2)(x - 3)$."
+        })
+        index.add("circle", {
+            "title": "Circle Area",
+            "statement": "Find the area of a circle of radius 5.",
+            "solution": "The area is $25\\pi$."
+        })
+        index.add("linear", {
+            "title": "Linear Equation",
+            "statement": "Solve $2x + 1 = 5$.",
+            "solution": "Subtract 1 then divide by 2."
+        })
+        return index
+    
+    def test_tokenize(self):
+        """Test word tokenization and query prefix flags"""
+        assert tokenize("Solve $x^2 - 5x$") == ["solve", "x", "2", "x_pow_2", "5", "x"]
+        assert tokenize_query("quad* equa") == [("quad", True), ("equa", True)]
+        assert tokenize_query("area circle") == [("area", False), ("circle", True)]
+    
+    def test_multi_term_query_requires_every_term(self):
+        """Test that all query terms must match"""
+        index = self._build_index()
+        
+        assert {doc_id for doc_id, _ in index.search("solve equation")} == {"linear", "quadratic"}
+        assert [doc_id for doc_id, _ in index.search("solve area")] == []
+    
+    def test_ranking_prefers_title_matches(self):
+        """Test that BM25 ranks title hits above body hits"""
+        index = self._build_index()
+        
+        results = index.search("area")
+        assert [doc_id for doc_id, _ in results] == ["circle"]
+        
+        results = index.search("equation")
+        assert results[0][0] in {"linear", "quadratic"}
+        assert results[0][1] >= results[-1][1]
+    
+    def test_prefix_matching(self):
+        """Test that the last term is matched as a prefix"""
+        index = self._build_index()
+        
+        assert [doc_id for doc_id, _ in index.search("quadr")] == ["quadratic"]
+        assert [doc_id for doc_id, _ in index.search("fact* quadratic")] == ["quadratic"]
+        assert index.search("fact quadratic") == []
+    
+    def test_incremental_updates(self):
+        """Test re-indexing and removing documents"""
+        index = self._build_index()
+        
+        index.add("circle", {"title": "Sphere Volume", "statement": "Find the volume.", "solution": "$V$"})
+        assert index.search("circle") == []
+        assert [doc_id for doc_id, _ in index.search("sphere")] == ["circle"]
+        
+        index.remove("circle")
+        assert index.search("sphere") == []
+        assert len(index) == 2
+        
+        index.clear()
+        assert index.search("solve") == []
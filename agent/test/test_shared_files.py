@@ -0,0 +1,46 @@
+import threading
+
+from agent.backend.services.exercise_locks import ExerciseLocks
+from agent.backend.services.invalidation import InvalidationLog
+
+class TestSharedFiles:
+    """Test cases for lock and log files used by several instances in one process"""
+    
+    def test_instances_on_one_path_block_each_other(self, temp_data_dir):
+        """Test that exercise locks of one lock file exclude each other within a process"""
+        first = ExerciseLocks(f"{temp_data_dir}/locks")
+        second = ExerciseLocks(f"{temp_data_dir}/locks")
+        acquired = threading.Event()
+        
+        def hold_second():
+            with second.hold("exercise_1"):
+                acquired.set()
+        
+        with first.hold("exercise_1"):
+            thread = threading.Thread(target=hold_second)
+            thread.start()
+            assert not acquired.wait(0.1)
+        thread.join(5)
+        assert acquired.is_set()
+        first.close()
+        second.close()
+    
+    def test_closing_one_instance_keeps_the_others_working(self, temp_data_dir):
+        """Test that the shared file stays open until its last user closes it"""
+        first = ExerciseLocks(f"{temp_data_dir}/locks")
+        second = ExerciseLocks(f"{temp_data_dir}/locks")
+        first.close()
+        with second.hold("exercise_1"):
+            pass
+        second.close()
+        
+        writer = InvalidationLog(f"{temp_data_dir}/changes")
+        reader = InvalidationLog(f"{temp_data_dir}/changes")
+        writer.close()
+        assert reader.changes_since(0) == (0, [])
+        reader.close()
+        
+        # A path whose users all closed it is opened afresh
+        log = InvalidationLog(f"{temp_data_dir}/changes")
+        assert log.publish("exercise_1") == 1
+        log.close()
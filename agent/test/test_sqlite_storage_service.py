@@ -0,0 +1,243 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import pytest
+from agent.backend.services.sqlite_storage_service import SQLiteStorageService
+from agent.backend.services.storage_service import FileStorageService, VersionConflictError, create_storage_service
+from agent.backend.models import ExerciseCreate, ExerciseUpdate, ExerciseSummary, Category, SortField, SortOrder
+
+class TestSQLiteStorageService:
+    """Test cases for SQLiteStorageService"""
+    
+    def test_init_creates_database_in_wal_mode(self, sqlite_storage_service):
+        """Test that the database is created in WAL mode with the expected indexes"""
+        assert sqlite_storage_service.db_path.exists()
+        
+        conn = sqlite3.connect(sqlite_storage_service.db_path)
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        finally:
+            conn.close()
+        
+        assert {"idx_exercises_category", "idx_exercises_created_at", "idx_exercises_title"} <= indexes
+    
+    def test_create_and_get_exercise(self, sqlite_storage_service, sample_exercise_create):
+        """Test creating and retrieving an exercise"""
+        exercise = sqlite_storage_service.create_exercise(sample_exercise_create, confidence_score=0.9)
+        retrieved = sqlite_storage_service.get_exercise(exercise.id)
+        
+        assert retrieved == exercise
+        assert sqlite_storage_service.get_exercise("nonexistent_id") is None
+    
+    def test_create_exercise_with_duplicate_title(self, sqlite_storage_service, sample_exercise_create):
+        """Test that duplicate titles get increasing suffixes"""
+        first = sqlite_storage_service.create_exercise(sample_exercise_create)
+        second = sqlite_storage_service.create_exercise(sample_exercise_create)
+        sqlite_storage_service.delete_exercise(second.id)
+        third = sqlite_storage_service.create_exercise(sample_exercise_create)
+        
+        assert first.title == sample_exercise_create.title
+        assert second.title == f"{sample_exercise_create.title} (1)"
+        assert third.title == f"{sample_exercise_create.title} (2)"
+    
+    def test_search_exercises(self, sqlite_storage_service, sample_exercise_create):
+        """Test searching by title and category, newest first"""
+        algebra = sqlite_storage_service.create_exercise(sample_exercise_create)
+        geometry = sqlite_storage_service.create_exercise(ExerciseCreate(
+            title="Circle Area 100%",
+            statement="Find the area of a circle with radius 5",
+            solution="Area = 25π",
+            category=Category.GEOMETRY
+        ))
+        
+        assert [ex.id for ex in sqlite_storage_service.get_all_exercises()] == [geometry.id, algebra.id]
+        assert [ex.id for ex in sqlite_storage_service.search_exercises(title="quadratic")] == [algebra.id]
+        assert [ex.id for ex in sqlite_storage_service.search_exercises(title="100%")] == [geometry.id]
+        assert [ex.id for ex in sqlite_storage_service.search_exercises(category="Geometry")] == [geometry.id]
+        assert sqlite_storage_service.search_exercises(title="Quadratic", category="Geometry") == []
+    
+    def test_update_and_delete_exercise(self, sqlite_storage_service, sample_exercise_create, sample_exercise_update):
+        """Test updating then deleting an exercise"""
+        exercise = sqlite_storage_service.create_exercise(sample_exercise_create)
+        
+        updated = sqlite_storage_service.update_exercise(exercise.id, ExerciseUpdate(**sample_exercise_update))
+        assert updated.title == sample_exercise_update["title"]
+        assert updated.solution == exercise.solution
+        assert sqlite_storage_service.get_exercise(exercise.id) == updated
+        assert sqlite_storage_service.update_exercise("nonexistent_id", ExerciseUpdate(title="x")) is None
+        
+        assert sqlite_storage_service.get_exercise_count() == 1
+        assert sqlite_storage_service.delete_exercise(exercise.id) is True
+        assert sqlite_storage_service.delete_exercise(exercise.id) is False
+        assert sqlite_storage_service.get_exercise_count() == 0
+    
+    def test_exercise_stats_are_maintained_incrementally(self, temp_data_dir, sample_exercise_create):
+        """Test that the stored aggregates follow writes and are reconciled on startup"""
+        service = SQLiteStorageService(data_dir=temp_data_dir)
+        first = service.create_exercise(sample_exercise_create, confidence_score=0.95)
+        second = service.create_exercise(sample_exercise_create, confidence_score=0.3)
+        service.update_exercise(second.id, ExerciseUpdate(category=Category.GEOMETRY))
+        
+        stats = service.get_exercise_stats()
+        assert stats == {
+            "total_exercises": 2,
+            "category_distribution": {"Algebra": 1, "Geometry": 1},
+            "confidence_histogram": {"0.3-0.4": 1, "0.9-1.0": 1},
+            "created_per_day": {first.createdAt.date().isoformat(): 2},
+        }
+        
+        service.delete_exercise(first.id)
+        assert service.get_exercise_stats()["category_distribution"] == {"Geometry": 1}
+        
+        # Drifted aggregates are recomputed when the service starts
+        with service._transaction() as conn:
+            conn.execute("UPDATE exercise_stats SET count = 42")
+        service.close()
+        
+        restarted = SQLiteStorageService(data_dir=temp_data_dir)
+        assert restarted.get_exercise_stats() == {
+            "total_exercises": 1,
+            "category_distribution": {"Geometry": 1},
+            "confidence_histogram": {"0.3-0.4": 1},
+            "created_per_day": {second.createdAt.date().isoformat(): 1},
+        }
+        restarted.close()
+    
+    def test_migrates_json_exercises_once(self, temp_data_dir, sample_exercise_create):
+        """Test the one-shot import of existing JSON exercise files"""
+        file_service = FileStorageService(data_dir=temp_data_dir)
+        first = file_service.create_exercise(sample_exercise_create)
+        second = file_service.create_exercise(sample_exercise_create)
+        (Path(temp_data_dir) / "exercises" / "broken.json").write_text("{", encoding="utf-8")
+        
+        service = SQLiteStorageService(data_dir=temp_data_dir)
+        assert service.get_exercise_count() == 2
+        assert service.get_exercise(first.id) == first
+        assert service.get_exercise(second.id) == second
+        
+        # Migration is not re-applied, and suffixes continue after imported ones
+        assert service.migrate_from_json() == 0
+        assert service.create_exercise(sample_exercise_create).title == f"{sample_exercise_create.title} (2)"
+        service.close()
+    
+    def test_create_storage_service(self, temp_data_dir, monkeypatch):
+        """Test selecting the storage backend"""
+        assert isinstance(create_storage_service("file", data_dir=temp_data_dir), FileStorageService)
+        
+        monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+        service = create_storage_service(data_dir=temp_data_dir)
+        assert isinstance(service, SQLiteStorageService)
+        service.close()
+    
+    def test_list_exercises_pagination_and_sorting(self, sqlite_storage_service, sample_exercise_data):
+        """Test that paging and sorting are pushed down to SQL"""
+        for index, letter in enumerate("CAEBD"):
+            sqlite_storage_service.create_exercise(
+                ExerciseCreate(**{**sample_exercise_data, "title": f"{letter} Exercise"}),
+                confidence_score=index / 10
+            )
+        
+        page, total = sqlite_storage_service.list_exercises(page=2, size=2, sort=SortField.TITLE, order=SortOrder.ASC)
+        assert [ex.title for ex in page] == ["C Exercise", "D Exercise"]
+        assert total == 5
+        
+        page, _ = sqlite_storage_service.list_exercises(size=1, sort=SortField.CONFIDENCE, order=SortOrder.DESC)
+        assert [ex.title for ex in page] == ["D Exercise"]
+        
+        page, total = sqlite_storage_service.list_exercises(title="a exercise", page=1, size=10)
+        assert [ex.title for ex in page] == ["A Exercise"]
+        assert total == 1
+    
+    def test_list_exercise_summaries(self, sqlite_storage_service, sample_exercise_create):
+        """Test listing summaries without loading the text columns"""
+        exercise = sqlite_storage_service.create_exercise(sample_exercise_create, confidence_score=0.5)
+        
+        summaries, total = sqlite_storage_service.list_exercise_summaries()
+        assert total == 1
+        assert summaries[0] == ExerciseSummary.from_exercise(exercise)
+        assert summaries[0].model_dump(mode="json")["createdAt"] == exercise.model_dump(mode="json")["createdAt"]
+    
+    def test_list_exercises_full_text_search(self, sqlite_storage_service, sample_exercise_create, sample_exercise_data):
+        """Test FTS5 search kept in sync with writes"""
+        quadratic = sqlite_storage_service.create_exercise(sample_exercise_create)
+        circle = sqlite_storage_service.create_exercise(ExerciseCreate(**{
+            **sample_exercise_data,
+            "title": "Circle Area",
+            "statement": "Find the area of a circle",
+            "category": Category.GEOMETRY
+        }))
+        
+        page, total = sqlite_storage_service.list_exercises(q="factor", sort=SortField.RELEVANCE)
+        assert total == 2
+        
+        page, total = sqlite_storage_service.list_exercises(q="circ", sort=SortField.RELEVANCE)
+        assert [ex.id for ex in page] == [circle.id]
+        
+        sqlite_storage_service.update_exercise(circle.id, ExerciseUpdate(title="Sphere Volume", statement="Volume"))
+        assert sqlite_storage_service.list_exercises(q="circle")[1] == 0
+        assert sqlite_storage_service.list_exercise_summaries(q="sphere")[0][0].id == circle.id
+        
+        sqlite_storage_service.delete_exercise(quadratic.id)
+        assert sqlite_storage_service.list_exercises(q="quadratic")[1] == 0
+    
+    def test_full_text_search_understands_latex(self, sqlite_storage_service, sample_exercise_data):
+        """Test that FTS5 stores LaTeX-normalized tokens"""
+        exercise = sqlite_storage_service.create_exercise(ExerciseCreate(**{
+            **sample_exercise_data,
+            "title": "Definite Integral",
+            "statement": r"Compute $\int_{0}^{1} x^{2} \, dx$",
+            "category": Category.CALCULUS
+        }))
+        
+        for query in ("integral", r"\int", "x^2"):
+            page, total = sqlite_storage_service.list_exercises(q=query)
+            assert [ex.id for ex in page] == [exercise.id], query
+    
+    def test_versions_detect_lost_updates(self, sqlite_storage_service, sample_exercise_create):
+        """Test that updates bump the version and stale versions are rejected"""
+        exercise = sqlite_storage_service.create_exercise(sample_exercise_create)
+        assert exercise.version == 1
+        
+        updated = sqlite_storage_service.update_exercise(exercise.id, ExerciseUpdate(title="New"), expected_version=1)
+        assert updated.version == 2
+        assert sqlite_storage_service.get_exercise(exercise.id).version == 2
+        
+        with pytest.raises(VersionConflictError):
+            sqlite_storage_service.update_exercise(exercise.id, ExerciseUpdate(title="Stale"), expected_version=1)
+        with pytest.raises(VersionConflictError):
+            sqlite_storage_service.delete_exercise(exercise.id, expected_version=1)
+        assert sqlite_storage_service.delete_exercise(exercise.id, expected_version=2)
+    
+    def test_close_closes_connections_of_all_threads(self, temp_data_dir, sample_exercise_create):
+        """Test that close() also closes the connections opened by other threads"""
+        service = SQLiteStorageService(data_dir=temp_data_dir)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            exercise = pool.submit(service.create_exercise, sample_exercise_create).result()
+            worker_conn = pool.submit(service._connect).result()
+        
+        service.close()
+        
+        with pytest.raises(sqlite3.ProgrammingError):
+            worker_conn.execute("SELECT 1")
+        # Connections are reopened on demand after close()
+        assert service.get_exercise(exercise.id).title == exercise.title
+        service.close()
+    
+    def test_version_column_is_added_to_existing_databases(self, temp_data_dir):
+        """Test that databases created before versioning are upgraded"""
+        conn = sqlite3.connect(Path(temp_data_dir) / "exercises.db")
+        conn.execute(
+            "CREATE TABLE exercises (id TEXT PRIMARY KEY, title TEXT NOT NULL, statement TEXT NOT NULL, "
+            "solution TEXT NOT NULL, category TEXT NOT NULL, level TEXT NOT NULL, status TEXT NOT NULL, "
+            "created_at TEXT NOT NULL, image_paths TEXT NOT NULL, confidence_score REAL NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO exercises VALUES ('exercise_1', 'Old', 'S', 'Sol', 'Algebra', 'advanced', "
+            "'finished', '2025-01-01T00:00:00', '[]', 0.5)"
+        )
+        conn.commit()
+        conn.close()
+        
+        service = SQLiteStorageService(data_dir=temp_data_dir)
+        assert service.get_exercise("exercise_1").version == 1
@@ -1,7 +1,33 @@
+import json
+import multiprocessing
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from agent.backend.services.storage_service import FileStorageService
+from unittest.mock import patch
+import pytest
+from agent.backend.services.storage_service import FileStorageService, VersionConflictError
 from agent.backend.models import ExerciseCreate, ExerciseUpdate, Category
 
+def _update_repeatedly(data_dir: str, exercise_id: str, updates: int) -> None:
+    """Worker process appending to an exercise's solution, one update at a time"""
+    service = FileStorageService(data_dir=data_dir, revalidate_interval=0)
+    for _ in range(updates):
+        while True:
+            exercise = service.get_exercise(exercise_id)
+            try:
+                service.update_exercise(
+                    exercise_id, ExerciseUpdate(solution=exercise.solution + "+"), expected_version=exercise.version
+                )
+                break
+            except VersionConflictError:
+                continue
+
+def _create_many(data_dir: str, exercise_data: ExerciseCreate, count: int) -> None:
+    """Worker process creating exercises with the same title"""
+    service = FileStorageService(data_dir=data_dir, revalidate_interval=3600)
+    for _ in range(count):
+        service.create_exercise(exercise_data)
+
 class TestFileStorageService:
     """Test cases for FileStorageService"""
     
@@ -189,4 +215,250 @@ class TestFileStorageService:
         # Check file was actually saved
         full_path = Path(storage_service.data_dir) / image_path
         assert full_path.exists()
-        assert full_path.read_bytes() == b"fake_image_content" 
\ No newline at end of file
+        assert full_path.read_bytes() == b"fake_image_content"
+    
+    def test_index_picks_up_external_edits(self, temp_data_dir, sample_exercise_create):
+        """Test that files changed outside the API are revalidated into the index"""
+        service = FileStorageService(data_dir=temp_data_dir, revalidate_interval=0)
+        exercise = service.create_exercise(sample_exercise_create)
+        
+        # Edit the file directly, bypassing the service
+        exercise_file = Path(temp_data_dir) / "exercises" / f"{exercise.id}.json"
+        data = json.loads(exercise_file.read_text(encoding="utf-8"))
+        data["title"] = "Edited Outside The API"
+        exercise_file.write_text(json.dumps(data), encoding="utf-8")
+        
+        assert service.get_exercise(exercise.id).title == "Edited Outside The API"
+        
+        # Remove the file directly
+        exercise_file.unlink()
+        assert service.get_exercise(exercise.id) is None
+        assert service.get_exercise_count() == 0
+    
+    def test_index_only_parses_changed_files(self, temp_data_dir, sample_exercise_create):
+        """Test that revalidation does not re-parse unchanged files"""
+        service = FileStorageService(data_dir=temp_data_dir, revalidate_interval=0)
+        service.create_exercise(sample_exercise_create)
+        service.create_exercise(sample_exercise_create)
+        
+        with patch.object(service, "_read_exercise_file", wraps=service._read_exercise_file) as mock_read:
+            service.get_all_exercises()
+            service.search_exercises(title="Quadratic")
+            assert mock_read.call_count == 0
+    
+    def test_rescan_does_not_block_reads(self, temp_data_dir, sample_exercise_create):
+        """Test that reads and writes proceed while the directory is being rescanned"""
+        import threading
+        service = FileStorageService(data_dir=temp_data_dir, revalidate_interval=0)
+        exercise = service.create_exercise(sample_exercise_create)
+        
+        scanning = threading.Event()
+        release = threading.Event()
+        scan = service._scan_exercise_files
+        
+        def slow_scan():
+            file_stats = scan()
+            scanning.set()
+            release.wait(timeout=10)
+            return file_stats
+        
+        with patch.object(service, "_scan_exercise_files", side_effect=slow_scan), ThreadPoolExecutor(max_workers=1) as pool:
+            rescan = pool.submit(service.get_exercise_count)
+            assert scanning.wait(timeout=10)
+            
+            assert service.get_exercise(exercise.id).title == exercise.title
+            # Created after the scan listed the directory; the rescan must not drop it
+            created = service.create_exercise(sample_exercise_create)
+            assert not rescan.done()
+            release.set()
+            rescan.result(timeout=10)
+        
+        assert service.get_exercise(created.id) is not None
+        assert service.get_exercise_count() == 2
+    
+    def test_index_is_built_on_startup(self, temp_data_dir, sample_exercise_create):
+        """Test that a new service instance loads existing exercises"""
+        exercise = FileStorageService(data_dir=temp_data_dir).create_exercise(sample_exercise_create)
+        
+        service = FileStorageService(data_dir=temp_data_dir)
+        assert service.get_exercise_count() == 1
+        assert service.get_exercise(exercise.id).title == exercise.title
+    
+    def test_duplicate_titles_use_next_highest_suffix(self, storage_service, sample_exercise_create):
+        """Test that suffixes keep increasing after duplicates are deleted"""
+        storage_service.create_exercise(sample_exercise_create)
+        second = storage_service.create_exercise(sample_exercise_create)
+        third = storage_service.create_exercise(sample_exercise_create)
+        
+        assert second.title == f"{sample_exercise_create.title} (1)"
+        assert third.title == f"{sample_exercise_create.title} (2)"
+        
+        storage_service.delete_exercise(second.id)
+        fourth = storage_service.create_exercise(sample_exercise_create)
+        assert fourth.title == f"{sample_exercise_create.title} (3)"
+    
+    def test_update_exercise_keeps_own_title(self, storage_service, sample_exercise_create):
+        """Test that re-submitting an exercise's own title does not add a suffix"""
+        exercise = storage_service.create_exercise(sample_exercise_create)
+        
+        updated = storage_service.update_exercise(exercise.id, ExerciseUpdate(title=exercise.title))
+        assert updated.title == exercise.title
+        
+        # The old title is released once renamed
+        storage_service.update_exercise(exercise.id, ExerciseUpdate(title="Renamed Exercise"))
+        recreated = storage_service.create_exercise(sample_exercise_create)
+        assert recreated.title == sample_exercise_create.title
+    
+    def test_concurrent_creates_get_unique_titles(self, storage_service, sample_exercise_create):
+        """Test that racing creates with the same title never share a title"""
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            exercises = list(executor.map(
+                lambda _: storage_service.create_exercise(sample_exercise_create), range(20)
+            ))
+        
+        titles = [exercise.title for exercise in exercises]
+        assert len(set(titles)) == 20
+        assert sample_exercise_create.title in titles
+    
+    def test_exercise_stats_are_maintained_incrementally(self, storage_service, sample_exercise_create):
+        """Test that stats follow creates, updates, deletes and external edits"""
+        first = storage_service.create_exercise(sample_exercise_create, confidence_score=0.95)
+        second = storage_service.create_exercise(sample_exercise_create, confidence_score=0.3)
+        day = first.createdAt.date().isoformat()
+        
+        stats = storage_service.get_exercise_stats()
+        assert stats["total_exercises"] == 2
+        assert stats["category_distribution"] == {"Algebra": 2}
+        assert stats["confidence_histogram"] == {"0.3-0.4": 1, "0.9-1.0": 1}
+        assert stats["created_per_day"] == {day: 2}
+        
+        storage_service.update_exercise(second.id, ExerciseUpdate(category=Category.GEOMETRY))
+        storage_service.delete_exercise(first.id)
+        stats = storage_service.get_exercise_stats()
+        assert stats["total_exercises"] == 1
+        assert stats["category_distribution"] == {"Geometry": 1}
+        assert stats["confidence_histogram"] == {"0.3-0.4": 1}
+        
+        # Files removed outside the API are reconciled on revalidation
+        (Path(storage_service.data_dir) / "exercises" / f"{second.id}.json").unlink()
+        storage_service._refresh_index(force=True)
+        assert storage_service.get_exercise_stats()["total_exercises"] == 0
+        assert storage_service.get_exercise_stats()["created_per_day"] == {}
+    
+    def test_updates_increment_version(self, storage_service, sample_exercise_create):
+        """Test that every update bumps the version and stale versions are rejected"""
+        exercise = storage_service.create_exercise(sample_exercise_create)
+        assert exercise.version == 1
+        
+        updated = storage_service.update_exercise(exercise.id, ExerciseUpdate(title="New"), expected_version=1)
+        assert updated.version == 2
+        assert storage_service.get_exercise(exercise.id).version == 2
+        
+        with pytest.raises(VersionConflictError) as conflict:
+            storage_service.update_exercise(exercise.id, ExerciseUpdate(title="Stale"), expected_version=1)
+        assert conflict.value.current_version == 2
+        with pytest.raises(VersionConflictError):
+            storage_service.delete_exercise(exercise.id, expected_version=1)
+        
+        assert storage_service.get_exercise(exercise.id).title == "New"
+        assert storage_service.delete_exercise(exercise.id, expected_version=2)
+    
+    def test_returned_exercises_are_copies(self, storage_service, sample_exercise_create):
+        """Test that mutating a created or updated exercise does not change the index"""
+        created = storage_service.create_exercise(sample_exercise_create)
+        created.title = "Mutated"
+        assert storage_service.get_exercise(created.id).title == sample_exercise_create.title
+        
+        updated = storage_service.update_exercise(created.id, ExerciseUpdate(statement="New statement"))
+        updated.statement = "Mutated"
+        assert storage_service.get_exercise(created.id).statement == "New statement"
+        assert storage_service.search_exercises(title="Mutated") == []
+    
+    def test_writes_leave_no_temporary_files(self, storage_service, sample_exercise_create):
+        """Test that files are replaced atomically without leftovers, even when a write fails"""
+        exercise = storage_service.create_exercise(sample_exercise_create)
+        storage_service.update_exercise(exercise.id, ExerciseUpdate(title="Renamed"))
+        
+        exercise_file = Path(storage_service.data_dir) / "exercises" / f"{exercise.id}.json"
+        with patch("agent.backend.services.storage_service.os.replace", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                storage_service.update_exercise(exercise.id, ExerciseUpdate(title="Lost"))
+        
+        # The previous content is intact
+        assert json.loads(exercise_file.read_text(encoding="utf-8"))["title"] == "Renamed"
+        assert list(exercise_file.parent.glob("*.tmp")) == []
+    
+    def test_updates_see_changes_from_other_instances(self, temp_data_dir, sample_exercise_create):
+        """Test that an update is applied to the file on disk, not to a stale index entry"""
+        first = FileStorageService(data_dir=temp_data_dir)
+        second = FileStorageService(data_dir=temp_data_dir)
+        exercise = first.create_exercise(sample_exercise_create)
+        
+        second.update_exercise(exercise.id, ExerciseUpdate(title="From Second"))
+        updated = first.update_exercise(exercise.id, ExerciseUpdate(statement="From First"))
+        
+        assert updated.title == "From Second"
+        assert updated.version == 3
+    
+    @pytest.mark.skipif(sys.platform == "win32", reason="Needs fork and POSIX record locks")
+    def test_concurrent_updates_from_processes_are_not_lost(self, temp_data_dir, sample_exercise_create):
+        """Test that workers updating the same exercise serialize on its lock"""
+        exercise = FileStorageService(data_dir=temp_data_dir).create_exercise(sample_exercise_create)
+        
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_update_repeatedly, args=(temp_data_dir, exercise.id, 10))
+            for _ in range(2)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+        
+        final = FileStorageService(data_dir=temp_data_dir).get_exercise(exercise.id)
+        assert final.version == 21
+        assert final.solution == exercise.solution + "+" * 20
+    
+    def test_workers_see_each_others_writes(self, temp_data_dir, sample_exercise_create):
+        """Test that caches stay coherent across instances without waiting for revalidation"""
+        first = FileStorageService(data_dir=temp_data_dir, revalidate_interval=3600)
+        second = FileStorageService(data_dir=temp_data_dir, revalidate_interval=3600)
+        
+        exercise = first.create_exercise(sample_exercise_create)
+        assert second.get_exercise(exercise.id).title == exercise.title
+        duplicate = second.create_exercise(sample_exercise_create)
+        assert duplicate.title == f"{sample_exercise_create.title} (1)"
+        
+        second.update_exercise(exercise.id, ExerciseUpdate(category=Category.GEOMETRY))
+        assert first.get_exercise(exercise.id).category == Category.GEOMETRY
+        assert first.get_exercise_stats()["category_distribution"] == {"Algebra": 1, "Geometry": 1}
+        assert [ex.id for ex in first.search_exercises(category="Geometry")] == [exercise.id]
+        
+        first.delete_exercise(duplicate.id)
+        assert second.get_exercise(duplicate.id) is None
+        assert second.get_exercise_count() == 1
+        
+        # Nothing is re-read while no other instance writes
+        with patch.object(first, "_read_exercise_file", wraps=first._read_exercise_file) as mock_read:
+            first.get_all_exercises()
+            first.get_exercise_stats()
+            assert mock_read.call_count == 0
+    
+    @pytest.mark.skipif(sys.platform == "win32", reason="Needs fork and POSIX record locks")
+    def test_titles_are_unique_across_processes(self, temp_data_dir, sample_exercise_create):
+        """Test that worker processes creating the same title never hand out the same suffix"""
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=_create_many, args=(temp_data_dir, sample_exercise_create, 10))
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            assert worker.exitcode == 0
+        
+        titles = [exercise.title for exercise in FileStorageService(data_dir=temp_data_dir).get_all_exercises()]
+        assert len(titles) == 30
+        assert len(set(titles)) == 30